@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+#
+# diffoscope: in-depth comparison of files, archives, and directories
+#
+# Copyright © 2026 agent <agent@local>
+#
+# diffoscope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# diffoscope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import stat
+import pickle
+import hashlib
+import logging
+import tempfile
+import importlib
+import threading
+
+from . import VERSION
+from .tools import tool_required, find_executable
+from .config import Config
+from .profiling import profile
+from .comparators.utils.file import hash_file
+
+logger = logging.getLogger(__name__)
+
+# Sentinel as ``None`` is a valid (and very common) cached result
+MISSING = object()
+
+# Optional Python modules changing how files are compared when available
+PYTHON_MODULES = ('debian', 'guestfs', 'numpy', 'rpm', 'tlsh')
+
+
+class CacheManager(object):
+    """
+    Persistent, content-addressed cache of comparison results.
+
+    Entries are pickled ``Difference`` trees (or ``None`` if there were no
+    differences) stored under a key derived from the contents and names of
+    both files, the diffoscope version, the comparators, external tools and
+    Python modules available and the configuration options that affect the
+    resulting tree. The modification time of each entry is used to evict the
+    least recently used ones once the cache grows above ``max_size``.
+
+    As entries are unpickled, which can run arbitrary code, the cache
+    directory must not be writable by anyone else.
+    """
+
+    _singleton = {}
+
+    def __init__(self):
+        self.__dict__ = self._singleton
+
+        if not self._singleton:
+            self.reset()
+
+    def reset(self):
+        self.path = None
+        self.max_size = Config().max_cache_size
+        self._size = None
+        self._lock = threading.Lock()
+        self._modules = None
+
+    def setup(self, parsed_args):
+        self.reset()
+
+        if parsed_args.no_cache or parsed_args.cache_dir is None:
+            return
+
+        self.path = parsed_args.cache_dir
+        if parsed_args.max_cache_size is not None:
+            self.max_size = parsed_args.max_cache_size or float("inf")
+
+        os.makedirs(self.path, mode=0o700, exist_ok=True)
+        st = os.stat(self.path)
+        if st.st_uid != os.getuid() or st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+            raise ValueError(
+                "{}: cache directory must be owned by the current user and "
+                "not writable by others".format(self.path),
+            )
+        logger.debug("Using comparison cache in %s", self.path)
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    @property
+    def modules(self):
+        if self._modules is None:
+            self._modules = ' '.join(
+                x for x in PYTHON_MODULES if python_module_available(x)
+            )
+        return self._modules
+
+    def key(self, file1, file2, source):
+        from .comparators import ComparatorManager
+
+        h = hashlib.sha256()
+
+        for x in (
+            VERSION,
+            file1.name,
+            file2.name,
+            repr(source),
+            hash_file(file1.path),
+            hash_file(file2.path),
+            ' '.join(
+                '{}.{}'.format(x.__module__, x.__name__)
+                for x in ComparatorManager().classes
+            ),
+            ' '.join(sorted(
+                x for x in getattr(tool_required, 'all', ())
+                if find_executable(x)
+            )),
+            self.modules,
+            repr(Config().max_diff_block_lines_saved),
+            repr(Config().max_diff_input_lines),
+            repr(Config().fuzzy_threshold),
+            repr(Config().new_file),
+            repr(sorted(Config().excludes)),
+            repr(Config().lazy_extraction),
+        ):
+            h.update(x.encode('utf-8', errors='surrogateescape'))
+            h.update(b'\0')
+
+        return h.hexdigest()
+
+    def filename(self, key):
+        return os.path.join(self.path, key[:2], key)
+
+    def get(self, key):
+        filename = self.filename(key)
+
+        try:
+            with profile('cache', 'get'):
+                with open(filename, 'rb') as f:
+                    result = pickle.load(f)
+        except FileNotFoundError:
+            return MISSING
+        except Exception:
+            logger.exception("Ignoring unreadable cache entry %s", filename)
+            return MISSING
+
+        # Mark entry as recently used
+        try:
+            os.utime(filename)
+        except OSError:
+            pass
+
+        logger.debug("Cache hit for %s", key)
+
+        return result
+
+    def set(self, key, difference):
+        filename = self.filename(key)
+        dirname = os.path.dirname(filename)
+
+        with profile('cache', 'set'):
+            os.makedirs(dirname, mode=0o700, exist_ok=True)
+
+            # Write atomically; other diffoscope processes (or threads) may
+            # be reading this very entry.
+            with tempfile.NamedTemporaryFile(dir=dirname, delete=False) as f:
+                pickle.dump(difference, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(f.name, filename)
+
+            with self._lock:
+                if self._size is None:
+                    self._size = sum(x[2] for x in self.entries())
+                else:
+                    self._size += os.path.getsize(filename)
+
+                if self._size > self.max_size:
+                    self.evict()
+
+    def entries(self):
+        for root, dirs, names in os.walk(self.path):
+            for name in names:
+                filename = os.path.join(root, name)
+                try:
+                    st = os.stat(filename)
+                except FileNotFoundError:
+                    continue
+                yield filename, st.st_mtime, st.st_size
+
+    def evict(self):
+        # Only shrink to 90% of the maximum size to avoid evicting on every
+        # subsequent write.
+        target = self.max_size * 0.9
+
+        with profile('cache', 'evict'):
+            entries = sorted(self.entries(), key=lambda x: x[1])
+            self._size = sum(x[2] for x in entries)
+
+            for filename, _, size in entries:
+                if self._size <= target:
+                    break
+
+                logger.debug("Evicting %s from cache", filename)
+
+                try:
+                    os.unlink(filename)
+                except FileNotFoundError:
+                    pass
+
+                self._size -= size
+
+
+def python_module_available(name):
+    try:
+        importlib.import_module(name)
+    except ImportError:
+        return False
+    return True
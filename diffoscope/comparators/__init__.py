@@ -88,7 +88,9 @@ class ComparatorManager(object):
             self.reload()
 
     def reload(self):
-        self.classes = []
+        # Only publish the complete list, as worker threads (see --jobs) may
+        # look at it while it is being loaded.
+        classes = []
 
         for xs in self.COMPARATORS:
             for x in xs:
@@ -101,11 +103,13 @@ class ComparatorManager(object):
                 except ImportError:
                     continue
 
-                self.classes.append(getattr(mod, klass_name))
+                classes.append(getattr(mod, klass_name))
                 break
             else:  # noqa
                 raise ImportError(
                     "Could not import any of {}".format(', '.join(xs))
                 )
 
+        self.classes = classes
+
         logger.debug("Loaded %d comparator classes", len(self.classes))
@@ -26,7 +26,7 @@ from diffoscope.difference import Difference
 
 from .utils.file import File
 from .utils.command import Command
-from .utils.libarchive import LibarchiveContainer, list_libarchive
+from .utils.libarchive import LibarchiveContainer, list_libarchive_file
 
 logger = logging.getLogger(__name__)
 
@@ -61,6 +61,6 @@ class ArFile(File):
 
     def compare_details(self, other, source=None):
         return [Difference.from_command(ArSymbolTableDumper, self.path, other.path),
-                Difference.from_text_readers(list_libarchive(self.path),
-                                             list_libarchive(other.path),
+                Difference.from_text_readers(list_libarchive_file(self),
+                                             list_libarchive_file(other),
                                              self.path, other.path, source="file list")]
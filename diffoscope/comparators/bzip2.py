@@ -20,13 +20,12 @@
 import re
 import os.path
 import logging
-import subprocess
 import collections
 
 from diffoscope.tools import tool_required
 
 from .utils.file import File
-from .utils.archive import Archive
+from .utils.archive import Archive, write_command_output
 from .utils.filenames import get_compressed_content_name
 
 logger = logging.getLogger(__name__)
@@ -49,10 +48,10 @@ class Bzip2Container(Archive):
     def extract(self, member_name, dest_dir):
         dest_path = os.path.join(dest_dir, member_name)
         logger.debug('bzip2 extracting to %s', dest_path)
-        with open(dest_path, 'wb') as fp:
-            subprocess.check_call(
-                ["bzip2", "--decompress", "--stdout", self.source.path],
-                shell=False, stdout=fp, stderr=None)
+        self.record_digest(member_name, *write_command_output(
+            ["bzip2", "--decompress", "--stdout", self.source.path],
+            dest_path,
+        ))
         return dest_path
 
 
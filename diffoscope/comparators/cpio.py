@@ -23,7 +23,7 @@ import re
 from diffoscope.difference import Difference
 
 from .utils.file import File
-from .utils.libarchive import LibarchiveContainer, list_libarchive
+from .utils.libarchive import LibarchiveContainer, list_libarchive_file
 
 
 class CpioFile(File):
@@ -32,8 +32,8 @@ class CpioFile(File):
 
     def compare_details(self, other, source=None):
         return [Difference.from_text_readers(
-            list_libarchive(self.path),
-            list_libarchive(other.path),
+            list_libarchive_file(self),
+            list_libarchive_file(other),
             self.path,
             other.path,
             source="file list",
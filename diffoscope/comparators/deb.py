@@ -25,7 +25,7 @@ from diffoscope.difference import Difference
 from .tar import TarContainer
 from .utils.file import File
 from .utils.archive import ArchiveMember
-from .utils.libarchive import LibarchiveContainer, list_libarchive
+from .utils.libarchive import LibarchiveContainer, list_libarchive_file
 from .utils.specialize import specialize
 
 try:
@@ -105,8 +105,8 @@ class DebFile(File):
         return self._control
 
     def compare_details(self, other, source=None):
-        return [Difference.from_text_readers(list_libarchive(self.path),
-                                             list_libarchive(other.path),
+        return [Difference.from_text_readers(list_libarchive_file(self),
+                                             list_libarchive_file(other),
                                              self.path, other.path, source="file list")]
 
 
@@ -173,6 +173,6 @@ class DebDataTarFile(File):
                isinstance(file.container.source.container.source, DebFile)
 
     def compare_details(self, other, source=None):
-        return [Difference.from_text_readers(list_libarchive(self.path),
-                                        list_libarchive(other.path),
+        return [Difference.from_text_readers(list_libarchive_file(self),
+                                        list_libarchive_file(other),
                                         self.path, other.path, source="file list")]
@@ -24,7 +24,9 @@ import subprocess
 
 from diffoscope.exc import RequiredToolNotFound
 from diffoscope.tools import tool_required
+from diffoscope.jobserver import check_output
 from diffoscope.progress import Progress
+from diffoscope.parallel import parallel_starmap
 from diffoscope.excludes import filter_excludes
 from diffoscope.difference import Difference
 
@@ -56,20 +58,23 @@ else:
         def cmdline(self):
             return ['stat', self.path]
 
-        FILE_RE = re.compile(r'^\s*File:.*$')
-        DEVICE_RE = re.compile(r'Device: [0-9a-f]+h/[0-9]+d\s+')
-        INODE_RE = re.compile(r'Inode: [0-9]+\s+')
-        ACCESS_TIME_RE = re.compile(r'^Access: [0-9]{4}-[0-9]{2}-[0-9]{2}.*$')
-        CHANGE_TIME_RE = re.compile(r'^Change: [0-9]{4}-[0-9]{2}-[0-9]{2}.*$')
+        # Whitespace up to the end of the line, or within it
+        SPACE = r'(?:[^\S\n]*\n|[^\S\n]+)'
 
-        def filter(self, line):
-            line = line.decode('utf-8')
-            line = Stat.FILE_RE.sub('', line)
-            line = Stat.DEVICE_RE.sub('', line)
-            line = Stat.INODE_RE.sub('', line)
-            line = Stat.ACCESS_TIME_RE.sub('', line)
-            line = Stat.CHANGE_TIME_RE.sub('', line)
-            return line.encode('utf-8')
+        FILE_RE = re.compile(r'^[^\S\n]*File:.*$', re.MULTILINE)
+        DEVICE_RE = re.compile(r'Device: [0-9a-f]+h/[0-9]+d' + SPACE)
+        INODE_RE = re.compile(r'Inode: [0-9]+' + SPACE)
+        ACCESS_TIME_RE = re.compile(r'^Access: [0-9]{4}-[0-9]{2}-[0-9]{2}.*$', re.MULTILINE)
+        CHANGE_TIME_RE = re.compile(r'^Change: [0-9]{4}-[0-9]{2}-[0-9]{2}.*$', re.MULTILINE)
+
+        def filter_block(self, block):
+            block = block.decode('utf-8')
+            block = Stat.FILE_RE.sub('', block)
+            block = Stat.DEVICE_RE.sub('', block)
+            block = Stat.INODE_RE.sub('', block)
+            block = Stat.ACCESS_TIME_RE.sub('', block)
+            block = Stat.CHANGE_TIME_RE.sub('', block)
+            return block.encode('utf-8')
 
 
 @tool_required('lsattr')
@@ -80,7 +85,7 @@ def lsattr(path):
     """
 
     try:
-        output = subprocess.check_output(['lsattr', '-d', path], shell=False, stderr=subprocess.STDOUT).decode('utf-8')
+        output = check_output(['lsattr', '-d', path], shell=False, stderr=subprocess.STDOUT).decode('utf-8')
         return output.split()[0]
     except subprocess.CalledProcessError as e:
         if e.returncode == 1:
@@ -157,42 +162,58 @@ class FilesystemDirectory(object):
         return False
 
     def compare(self, other, source=None):
+        differences = self.compare_details(other)
+        # Only compare up to the first difference now; the rest is compared
+        # as the report is output, see Difference.iter_details
+        first = next(differences, None)
+        if first is None:
+            return None
+        difference = Difference(None, self.path, other.path, source)
+        difference.add_details([first])
+        difference.add_lazy_details(differences)
+        return difference
+
+    def compare_details(self, other):
         from .utils.compare import compare_files
 
-        differences = []
         try:
             listing_diff = Difference.from_text('\n'.join(list_files(self.path)),
                                                 '\n'.join(list_files(other.path)),
                                                 self.path, other.path, source='file list')
             if listing_diff:
-                differences.append(listing_diff)
+                yield listing_diff
         except RequiredToolNotFound:
             logger.info("Unable to find 'getfacl'.")
-        differences.extend(compare_meta(self.name, other.name))
+        for x in compare_meta(self.name, other.name):
+            yield x
         my_container = DirectoryContainer(self)
         other_container = DirectoryContainer(other)
         my_names = my_container.get_member_names()
         other_names = other_container.get_member_names()
         to_compare = set(my_names).intersection(other_names)
         to_compare = set(filter_excludes(to_compare))
+
+        def compare_member(name):
+            my_file = my_container.get_member(name)
+            other_file = other_container.get_member(name)
+            inner_difference = compare_files(
+                                   my_file, other_file, source=name)
+            meta_differences = compare_meta(my_file.name, other_file.name)
+            if meta_differences and not inner_difference:
+                inner_difference = Difference(None, my_file.path, other_file.path)
+            if inner_difference:
+                inner_difference.add_details(meta_differences)
+            return inner_difference
+
         with Progress(len(to_compare)) as p:
-            for name in sorted(to_compare):
-                my_file = my_container.get_member(name)
-                other_file = other_container.get_member(name)
-                inner_difference = compare_files(
-                                       my_file, other_file, source=name)
-                meta_differences = compare_meta(my_file.name, other_file.name)
-                if meta_differences and not inner_difference:
-                    inner_difference = Difference(None, my_file.path, other_file.path)
-                if inner_difference:
-                    inner_difference.add_details(meta_differences)
-                    differences.append(inner_difference)
+            names = sorted(to_compare)
+            for name, inner_difference in zip(names, parallel_starmap(
+                compare_member,
+                ((x,) for x in names),
+            )):
                 p.step(msg=name)
-        if not differences:
-            return None
-        difference = Difference(None, self.path, other.path, source)
-        difference.add_details(differences)
-        return difference
+                if inner_difference:
+                    yield inner_difference
 
 
 class DirectoryContainer(Container):
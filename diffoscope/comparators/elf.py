@@ -25,12 +25,14 @@ import collections
 
 from diffoscope.exc import OutputParsingError
 from diffoscope.tools import tool_required
+from diffoscope.jobserver import check_call, check_output
+from diffoscope.parallel import parallel_starmap
 from diffoscope.tempfiles import get_named_temporary_file
 from diffoscope.difference import Difference
 
 from .deb import DebFile, get_build_id_map
 from .utils.file import File
-from .utils.command import Command
+from .utils.command import Command, sub_line_start
 from .utils.container import Container
 from .utils.libarchive import list_libarchive
 
@@ -57,8 +59,9 @@ logger = logging.getLogger(__name__)
 class Readelf(Command):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self._path_bin = os.fsencode(self.path)
         # we don't care about the name of the archive
-        self._archive_re = re.compile(r'^File: %s\(' % re.escape(self.path))
+        self._archive_re = re.compile(rb'File: ' + re.escape(self._path_bin) + rb'\(')
 
     @tool_required('readelf')
     def cmdline(self):
@@ -67,14 +70,11 @@ class Readelf(Command):
     def readelf_options(self):
         return []  # noqa
 
-    def filter(self, line):
-        try:
-            # we don't care about the name of the archive
-            line = self._archive_re.sub('File: lib.a(', line.decode('utf-8'))
-            # the full path can appear in the output, we need to remove it
-            return line.replace(self.path, '<elf>').encode('utf-8')
-        except UnicodeDecodeError:
-            return line
+    def filter_block(self, block):
+        # we don't care about the name of the archive
+        block = sub_line_start(self._archive_re, b'File: lib.a(', block)
+        # the full path can appear in the output, we need to remove it
+        return block.replace(self._path_bin, b'<elf>')
 
     @staticmethod
     def should_skip_section(section_name, section_type):
@@ -167,7 +167,7 @@ class ReadElfSection(Readelf):
     @staticmethod
     def base_options():
         if not hasattr(ReadElfSection, '_base_options'):
-            output = subprocess.check_output(
+            output = check_output(
                 ['readelf', '--help'],
                 shell=False,
                 stderr=subprocess.DEVNULL,
@@ -198,8 +198,12 @@ class ReadelfStringSection(ReadElfSection):
 class ObjdumpSection(Command):
     def __init__(self, path, section_name, *args, **kwargs):
         self._path = path
-        self._path_bin = path.encode('utf-8')
         self._section_name = section_name
+        # Remove the filename from the output
+        self._header_res = (
+            re.compile(re.escape(os.fsencode(path)) + rb':.*\n?'),
+            re.compile(rb'In archive.*\n?'),
+        )
         super().__init__(path, *args, **kwargs)
 
     def objdump_options(self):
@@ -214,17 +218,15 @@ class ObjdumpSection(Command):
             self.path,
         ]
 
-    def filter(self, line):
-        # Remove the filename from the output
-        if line.startswith(self._path_bin + b':'):
-            return b''
-        if line.startswith(b'In archive'):
-            return b''
-
-        return line
+    def filter_block(self, block):
+        for regex in self._header_res:
+            block = sub_line_start(regex, b'', block)
+        return block
 
 class ObjdumpDisassembleSection(ObjdumpSection):
-    RE_SYMBOL_COMMENT = re.compile(rb'^( +[0-9a-f]+:[^#]+)# [0-9a-f]+ <[^>]+>$')
+    # Comments are searched for first as they only appear on a few lines
+    RE_SYMBOL_COMMENT = re.compile(rb'# [0-9a-f]+ <[^>\n]+>$', re.MULTILINE)
+    RE_INSTRUCTION = re.compile(rb' +[0-9a-f]+:[^#\n]+')
 
     def objdump_options(self):
         # With '--line-numbers' we get the source filename and line within the
@@ -233,9 +235,20 @@ class ObjdumpDisassembleSection(ObjdumpSection):
         # stripped symbols file specified in the .gnu_debuglink section
         return ['--line-numbers', '--disassemble', '--demangle']
 
-    def filter(self, line):
-        line = super().filter(line)
-        return ObjdumpDisassembleSection.RE_SYMBOL_COMMENT.sub(r'\1', line)
+    def filter_block(self, block):
+        block = super().filter_block(block)
+
+        # Remove the comments following instructions
+        result = []
+        pos = 0
+        for m in ObjdumpDisassembleSection.RE_SYMBOL_COMMENT.finditer(block):
+            start = block.rfind(b'\n', 0, m.start()) + 1
+            if ObjdumpDisassembleSection.RE_INSTRUCTION.fullmatch(block, start, m.start()):
+                result.append(block[pos:m.start()])
+                pos = m.end()
+        result.append(block[pos:])
+
+        return b''.join(result)
 
 
 READELF_COMMANDS = (
@@ -250,10 +263,15 @@ READELF_COMMANDS = (
 )
 
 def _compare_elf_data(path1, path2):
-    return [
-        Difference.from_command(x, path1, path2)
-        for x in list(READELF_COMMANDS) + READELF_DEBUG_DUMP_COMMANDS
-    ]
+    # Each of these runs two readelf(1) processes and a diff(1) independently
+    # of each other, so run them in parallel when we have job slots free.
+    return list(parallel_starmap(
+        Difference.from_command,
+        (
+            (x, path1, path2)
+            for x in list(READELF_COMMANDS) + READELF_DEBUG_DUMP_COMMANDS
+        ),
+    ))
 
 
 def _should_skip_section(name, type):
@@ -343,7 +361,7 @@ class ElfStringSection(ElfSection):
 @tool_required('readelf')
 def get_build_id(path):
     try:
-        output = subprocess.check_output(
+        output = check_output(
             ['readelf', '--notes', path],
             stderr=subprocess.DEVNULL,
         )
@@ -361,7 +379,7 @@ def get_build_id(path):
 @tool_required('readelf')
 def get_debug_link(path):
     try:
-        output = subprocess.check_output(
+        output = check_output(
             ['readelf', '--string-dump=.gnu_debuglink', path],
             stderr=subprocess.DEVNULL,
         )
@@ -389,7 +407,7 @@ class ElfContainer(Container):
         logger.debug("Creating ElfContainer for %s", self.source.path)
 
         cmd = ['readelf', '--wide', '--section-headers', self.source.path]
-        output = subprocess.check_output(cmd, shell=False, stderr=subprocess.DEVNULL)
+        output = check_output(cmd, shell=False, stderr=subprocess.DEVNULL)
         has_debug_symbols = False
 
         try:
@@ -488,7 +506,7 @@ class ElfContainer(Container):
         os.makedirs(os.path.dirname(dest_path), exist_ok=True)
 
         def objcopy(*args):
-            subprocess.check_call(
+            check_call(
                 ('objcopy',) + args,
                 shell=False,
                 stderr=subprocess.DEVNULL,
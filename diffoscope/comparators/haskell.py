@@ -24,6 +24,7 @@ import platform
 import subprocess
 
 from diffoscope.tools import tool_required
+from diffoscope.jobserver import check_output
 from diffoscope.profiling import profile
 from diffoscope.difference import Difference
 
@@ -78,7 +79,7 @@ class HiFile(File):
         if not hasattr(HiFile, 'hi_version'):
             try:
                 with profile('command', 'ghc'):
-                    output = subprocess.check_output(
+                    output = check_output(
                         ['ghc', '--numeric-version'],
                     )
             except (OSError, subprocess.CalledProcessError):
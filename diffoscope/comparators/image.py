@@ -21,6 +21,7 @@ import re
 import subprocess
 
 from diffoscope.tools import tool_required
+from diffoscope.jobserver import check_call
 from diffoscope.tempfiles import get_named_temporary_file
 from diffoscope.difference import Difference
 
@@ -119,6 +120,6 @@ class ICOImageFile(File):
     def convert(file):
         result = get_named_temporary_file(suffix='.png').name
 
-        subprocess.check_call(('convert', file.path, result))
+        check_call(('convert', file.path, result))
 
         return result
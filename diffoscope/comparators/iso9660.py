@@ -21,6 +21,7 @@ import re
 import subprocess
 
 from diffoscope.tools import tool_required
+from diffoscope.jobserver import check_output
 from diffoscope.difference import Difference
 
 from .utils.file import File
@@ -33,7 +34,7 @@ def get_iso9660_names(path):
     # We always use RockRidge for names. Let's see if this proves
     # problematic later
     cmd = ['isoinfo', '-R', '-f', '-i', path]
-    return subprocess.check_output(cmd, shell=False).strip().split('\n')
+    return check_output(cmd, shell=False).strip().split('\n')
 
 
 class ISO9660PVD(Command):
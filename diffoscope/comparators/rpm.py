@@ -26,6 +26,7 @@ import binascii
 import subprocess
 
 from diffoscope.tools import tool_required
+from diffoscope.jobserver import check_call
 from diffoscope.tempfiles import get_temporary_directory
 from diffoscope.difference import Difference
 
@@ -99,7 +100,7 @@ class RpmContainer(Archive):
         dest_path = os.path.join(dest_dir, 'content')
         cmd = ['rpm2cpio', self.source.path]
         with open(dest_path, 'wb') as dest:
-            subprocess.check_call(cmd, shell=False, stdout=dest, stderr=subprocess.PIPE)
+            check_call(cmd, shell=False, stdout=dest, stderr=subprocess.PIPE)
         return dest_path
 
 
@@ -25,6 +25,7 @@ import subprocess
 import collections
 
 from diffoscope.tools import tool_required
+from diffoscope.jobserver import check_call, check_output
 from diffoscope.difference import Difference
 
 from .utils.file import File
@@ -201,7 +202,7 @@ class SquashfsContainer(Archive):
         # We pass `-d ''` in order to get a listing with the names we actually
         # need to use when extracting files
         cmd = ['unsquashfs', '-d', '', '-lls', path]
-        output = subprocess.check_output(cmd, shell=False).decode('utf-8')
+        output = check_output(cmd, shell=False).decode('utf-8')
         header = True
         for line in output.rstrip('\n').split('\n'):
             if header:
@@ -232,7 +233,7 @@ class SquashfsContainer(Archive):
             raise ValueError("relative path in squashfs")
         cmd = ['unsquashfs', '-n', '-f', '-d', dest_dir, self.source.path, member_name]
         logger.debug("unsquashfs %s into %s", member_name, dest_dir)
-        subprocess.check_call(cmd, shell=False, stdout=subprocess.PIPE)
+        check_call(cmd, shell=False, stdout=subprocess.PIPE)
         return '%s%s' % (dest_dir, member_name)
 
     def get_member(self, member_name):
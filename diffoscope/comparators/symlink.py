@@ -51,7 +51,11 @@ class Symlink(File):
 
     def cleanup(self):
         if hasattr(self, '_placeholder'):
-            os.remove(self._placeholder)
+            try:
+                os.remove(self._placeholder)
+            except FileNotFoundError:
+                # Already removed by clean_all_temp_files
+                pass
             del self._placeholder
         super().cleanup()
 
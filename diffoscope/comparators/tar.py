@@ -22,7 +22,7 @@ import re
 from diffoscope.difference import Difference
 
 from .utils.file import File
-from .utils.libarchive import LibarchiveContainer, list_libarchive
+from .utils.libarchive import LibarchiveContainer, list_libarchive_file
 
 class TarContainer(LibarchiveContainer):
     pass
@@ -33,6 +33,6 @@ class TarFile(File):
     RE_FILE_TYPE = re.compile(r'\btar archive\b')
 
     def compare_details(self, other, source=None):
-        return [Difference.from_text_readers(list_libarchive(self.path),
-                                        list_libarchive(other.path),
+        return [Difference.from_text_readers(list_libarchive_file(self),
+                                        list_libarchive_file(other),
                                         self.path, other.path, source="file list")]
@@ -19,21 +19,38 @@
 
 import re
 import codecs
+import hashlib
 
 from diffoscope.difference import Difference
 
 from .utils.file import File
 
 
-def order_only_difference(unified_diff):
-    diff_lines = unified_diff.splitlines()
-    added_lines = [line[1:] for line in diff_lines if line.startswith('+')]
-    removed_lines = [line[1:] for line in diff_lines if line.startswith('-')]
+def order_only_difference(blocks):
+    """
+    Return whether the lines removed and added by a unified diff, given as
+    ``DiffBlock``s, only differ in their order.
+
+    The lines are compared by their digests rather than kept in memory, as
+    diffs can be huge.
+    """
+
+    added_lines = []
+    removed_lines = []
+    for block in blocks:
+        for tag, line in block:
+            if tag == '+':
+                added_lines.append(line_digest(line))
+            elif tag == '-':
+                removed_lines.append(line_digest(line))
     # Faster check: does number of lines match?
     if len(added_lines) != len(removed_lines):
         return False
     return sorted(added_lines) == sorted(removed_lines) and added_lines != removed_lines
 
+def line_digest(line):
+    return hashlib.sha256(line[1:].encode('utf-8', errors='surrogatepass')).digest()
+
 
 class TextFile(File):
     RE_FILE_TYPE = re.compile(r'\btext\b')
@@ -52,7 +69,7 @@ class TextFile(File):
                  codecs.open(other.path, 'r', encoding=other_encoding) as other_content:
                 difference = Difference.from_text_readers(my_content, other_content, self.name, other.name, source)
                 # Check if difference is only in line order.
-                if difference and order_only_difference(difference.unified_diff):
+                if difference and order_only_difference(difference.iter_unified_diff()):
                     difference.add_comment("ordering differences only")
                 if my_encoding != other_encoding:
                     if difference is None:
@@ -18,9 +18,13 @@
 # along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
 
 import abc
+import hashlib
 import logging
+import threading
+import subprocess
 
 from diffoscope.profiling import profile
+from diffoscope.jobserver import JobServer
 from diffoscope.tempfiles import get_temporary_directory
 
 from ..missing_file import MissingFile
@@ -40,6 +44,10 @@ class Archive(Container, metaclass=abc.ABCMeta):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        # Members of the same archive may be extracted from different
+        # threads (see --jobs)
+        self._lock = threading.RLock()
+        self._digests = {}
         with profile('open_archive', self):
             self._archive = self.open_archive()
 
@@ -51,6 +59,22 @@ class Archive(Container, metaclass=abc.ABCMeta):
     def archive(self):
         return self._archive
 
+    @property
+    def lock(self):
+        return self._lock
+
+    def record_digest(self, member_name, size, digest):
+        """
+        Record the size and digest of the contents of a member, usually
+        computed whilst extracting it, so that they do not need to be read
+        again to compare them.
+        """
+
+        self._digests[member_name] = (size, digest)
+
+    def get_digest(self, member_name):
+        return self._digests.get(member_name, (None, None))
+
     @abc.abstractmethod
     def open_archive(self):
         raise NotImplementedError()
@@ -80,14 +104,36 @@ class ArchiveMember(File):
 
     @property
     def path(self):
-        if self._path is None:
-            logger.debug("Unpacking %s from %s", self._name, self.container.source.name)
-            assert self._temp_dir is None
-            self._temp_dir = get_temporary_directory()
-            with profile('container_extract', self.container):
-                self._path = self.container.extract(self._name, self._temp_dir.name)
+        with self.container.lock:
+            if self._path is None:
+                logger.debug("Unpacking %s from %s", self._name, self.container.source.name)
+                assert self._temp_dir is None
+                self._temp_dir = get_temporary_directory()
+                with profile('container_extract', self.container):
+                    self._path = self.container.extract(self._name, self._temp_dir.name)
         return self._path
 
+    @property
+    def size(self):
+        return self.container.get_digest(self._name)[0]
+
+    @property
+    def digest(self):
+        return self.container.get_digest(self._name)[1]
+
+    def has_same_content_as(self, other):
+        # Extracting a member records the digest of its contents
+        if self.digest is None:
+            self.path
+        if isinstance(other, ArchiveMember) and other.digest is None and \
+                not (other.is_directory() or other.is_symlink() or other.is_device()):
+            other.path
+
+        if self.digest is not None and getattr(other, 'digest', None) is not None:
+            return (self.size, self.digest) == (other.size, other.digest)
+
+        return super().has_same_content_as(other)
+
     def cleanup(self):
         if self._path is not None:
             self._path = None
@@ -106,6 +152,54 @@ class ArchiveMember(File):
         return False
 
 
+def hash_blocks(blocks):
+    """
+    Return the size and SHA-256 digest of the concatenated blocks.
+    """
+
+    h = hashlib.sha256()
+    size = 0
+
+    for block in blocks:
+        h.update(block)
+        size += len(block)
+
+    return size, h.hexdigest()
+
+def write_blocks(blocks, dst):
+    """
+    Write blocks to dst, returning their size and digest as ``hash_blocks``.
+    """
+
+    with open(dst, 'wb') as f:
+        def tee():
+            for block in blocks:
+                f.write(block)
+                yield block
+
+        return hash_blocks(tee())
+
+def write_command_output(cmdline, dst):
+    """
+    Write the output of cmdline to dst, returning its size and digest as
+    ``hash_blocks``.
+    """
+
+    with JobServer().slot():
+        p = subprocess.Popen(cmdline, shell=False, stdout=subprocess.PIPE)
+
+        try:
+            result = write_blocks(iter(lambda: p.stdout.read(2 ** 20), b''), dst)
+        finally:
+            p.stdout.close()
+            returncode = p.wait()
+
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmdline)
+
+    return result
+
+
 class MissingArchiveLikeObject(object):
     def getnames(self):
         return []
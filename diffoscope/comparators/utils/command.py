@@ -19,35 +19,92 @@
 
 import io
 import abc
+import asyncio
 import logging
-import subprocess
 import threading
+import subprocess
+import concurrent.futures
+
+from diffoscope.jobserver import JobServer
 
 logger = logging.getLogger(__name__)
 
+# Threads running feed_stdin, which may block, eg. reading files
+FEED_STDIN_THREADS = 4
+# What feed_stdin writes is passed to the event loop in blocks of this size
+STDIN_BLOCK_SIZE = 32768
+
+
+class CommandManager(object):
+    """
+    Runs the event loop that feeds the stdin and collects the stderr of all
+    commands in a single background thread. It only does non-blocking I/O;
+    what is fed to commands is produced by a few other threads.
+    """
+
+    _singleton = {}
+
+    def __init__(self):
+        self.__dict__ = self._singleton
+
+        if not self._singleton:
+            self.reset()
+
+    def reset(self):
+        self.lock = threading.Lock()
+        self.loop = None
+
+    def call_soon(self, callback, *args):
+        with self.lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                self.loop.set_default_executor(
+                    concurrent.futures.ThreadPoolExecutor(FEED_STDIN_THREADS),
+                )
+                thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+                thread.start()
+
+        self.loop.call_soon_threadsafe(callback, *args)
+
 
 class Command(object, metaclass=abc.ABCMeta):
     def __init__(self, path):
         self._path = path
-        logger.debug("Executing %s", ' '.join(self.cmdline()))
-        self._process = subprocess.Popen(self.cmdline(),
-                                         shell=False, close_fds=True,
-                                         env=self.env(),
-                                         stdin=subprocess.PIPE,
-                                         stdout=subprocess.PIPE,
-                                         stderr=subprocess.PIPE)
-        if hasattr(self, 'feed_stdin'):
-            self._stdin_feeder = threading.Thread(target=self._feed_stdin, args=(self._process.stdin,))
-            self._stdin_feeder.daemon = True
-            self._stdin_feeder.start()
-        else:
-            self._stdin_feeder = None
-            self._process.stdin.close()
+        self._process = None
         self._stderr = io.BytesIO()
         self._stderr_line_count = 0
-        self._stderr_reader = threading.Thread(target=self._read_stderr)
-        self._stderr_reader.daemon = True
-        self._stderr_reader.start()
+        self._stderr_closed = threading.Event()
+        self._stdin_closed = threading.Event()
+        self._returncode = None
+        # If this thread already runs a command, only start this one now if
+        # there is a free slot; otherwise it is started when needed.
+        if JobServer().acquire(block=not JobServer().held()):
+            self._start()
+
+    def _start(self):
+        if hasattr(self, 'feed_stdin'):
+            stdin = subprocess.PIPE
+        else:
+            stdin = subprocess.DEVNULL
+            self._stdin_closed.set()
+        try:
+            logger.debug("Executing %s", ' '.join(self.cmdline()))
+            self._process = subprocess.Popen(self.cmdline(),
+                                             shell=False, close_fds=True,
+                                             env=self.env(),
+                                             stdin=stdin,
+                                             stdout=subprocess.PIPE,
+                                             stderr=subprocess.PIPE)
+        except Exception:
+            JobServer().release()
+            raise
+        # stdin and stderr are handled by the event loop
+        CommandManager().call_soon(self._connect_pipes)
+
+    def _ensure_started(self):
+        if self._process is None:
+            JobServer().acquire()
+            self._start()
 
     @property
     def path(self):
@@ -60,47 +117,88 @@ class Command(object, metaclass=abc.ABCMeta):
     def env(self):
         return None # inherit parent environment by default
 
-    # Define only if needed. We take care of closing stdin.
+    # Define only if needed. We take care of closing stdin. Called in one of
+    # the FEED_STDIN_THREADS threads: what is written is passed on to the
+    # event loop in blocks, waiting while the command does not read them.
     #def feed_stdin(self, stdin)
 
-    def _feed_stdin(self, stdin):
-        try:
-            self.feed_stdin(stdin)
-        finally:
-            stdin.close()
+    def _connect_pipes(self):
+        loop = CommandManager().loop
+
+        def check(future, event):
+            if future.exception() is not None:
+                logger.error("Unable to connect to %s: %s", ' '.join(self.cmdline()), future.exception())
+                event.set()
+
+        future = loop.create_task(loop.connect_read_pipe(
+            lambda: StderrReader(self),
+            self._process.stderr,
+        ))
+        future.add_done_callback(lambda x: check(x, self._stderr_closed))
+
+        if hasattr(self, 'feed_stdin'):
+            future = loop.create_task(loop.connect_write_pipe(
+                lambda: StdinWriter(self),
+                self._process.stdin,
+            ))
+            future.add_done_callback(lambda x: check(x, self._stdin_closed))
 
     def filter(self, line):
         # Assume command output is utf-8 by default
         return line
 
+    # Define only if needed, instead of filter. Called with blocks of whole
+    # lines, so it can process many of them at once.
+    #def filter_block(self, block)
+
     def poll(self):
+        if self._process is None:
+            return None
         return self._process.poll()
 
     def terminate(self):
-        return self._process.terminate()
+        if self._process is not None:
+            self._process.terminate()
 
     def wait(self):
-        if self._stdin_feeder:
-            self._stdin_feeder.join()
-        self._stderr_reader.join()
+        if self._returncode is not None:
+            return self._returncode
+        self._ensure_started()
+        self._stdin_closed.wait()
+        self._stderr_closed.wait()
         returncode = self._process.wait()
+        self._process.stdout.close()
+        JobServer().release()
         logger.debug(
             "%s returned (exit code: %d)",
             ' '.join(self.cmdline()),
             returncode,
         )
+        self._returncode = returncode
         return returncode
 
+    def close(self):
+        """
+        Stop the command if it is still running and wait for it.
+        """
+
+        if self._process is None:
+            return
+        if self.poll() is None:
+            self.terminate()
+        self.wait()
+
     MAX_STDERR_LINES = 50
 
-    def _read_stderr(self):
-        for line in iter(self._process.stderr.readline, b''):
-            self._stderr_line_count += 1
-            if self._stderr_line_count <= Command.MAX_STDERR_LINES:
-                self._stderr.write(line)
+    def _write_stderr(self, line):
+        self._stderr_line_count += 1
+        if self._stderr_line_count <= Command.MAX_STDERR_LINES:
+            self._stderr.write(line)
+
+    def _close_stderr(self):
         if self._stderr_line_count > Command.MAX_STDERR_LINES:
             self._stderr.write('[ {} lines ignored ]\n'.format(self._stderr_line_count - Command.MAX_STDERR_LINES).encode('utf-8'))
-        self._process.stderr.close()
+        self._stderr_closed.set()
 
     @property
     def stderr_content(self):
@@ -112,4 +210,117 @@ class Command(object, metaclass=abc.ABCMeta):
 
     @property
     def stdout(self):
+        self._ensure_started()
         return self._process.stdout
+
+class StderrReader(asyncio.Protocol):
+    def __init__(self, command):
+        self.command = command
+        self.partial = b''
+
+    def data_received(self, data):
+        lines = (self.partial + data).split(b'\n')
+        self.partial = lines.pop()
+        for line in lines:
+            self.command._write_stderr(line + b'\n')
+
+    def connection_lost(self, exc):
+        if self.partial:
+            self.command._write_stderr(self.partial)
+        self.command._close_stderr()
+
+class StdinWriter(asyncio.Protocol):
+    def __init__(self, command):
+        self.command = command
+        self.transport = None
+        self.closed = False
+        # Cleared while the pipe buffers too much, see pause_writing
+        self.writable = threading.Event()
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.writable.set()
+        # feed_stdin may block, which would stall every other command
+        future = CommandManager().loop.run_in_executor(None, self.run_feed_stdin)
+        future.add_done_callback(self.feed_done)
+
+    def run_feed_stdin(self):
+        stdin = StdinStream(self)
+        self.command.feed_stdin(stdin)
+        stdin.flush()
+
+    def write(self, data):
+        """
+        Write data from a thread other than the one of the event loop,
+        waiting until the pipe can take it.
+        """
+
+        self.writable.wait()
+        done = concurrent.futures.Future()
+        CommandManager().loop.call_soon_threadsafe(self._write, data, done)
+        done.result()
+
+    def _write(self, data, done):
+        if self.closed or self.transport.is_closing():
+            done.set_exception(BrokenPipeError())
+            return
+        # Calls pause_writing if the pipe buffers too much
+        self.transport.write(data)
+        done.set_result(None)
+
+    def feed_done(self, future):
+        try:
+            future.result()
+        except BrokenPipeError:
+            logger.debug("%s closed its stdin", ' '.join(self.command.cmdline()))
+        except Exception:
+            logger.exception("Unable to feed %s", ' '.join(self.command.cmdline()))
+        finally:
+            self.transport.close()
+
+    def pause_writing(self):
+        self.writable.clear()
+
+    def resume_writing(self):
+        self.writable.set()
+
+    def connection_lost(self, exc):
+        self.closed = True
+        self.writable.set()
+        self.command._stdin_closed.set()
+
+class StdinStream(object):
+    """
+    File-like object passed to feed_stdin, handing what is written to a
+    StdinWriter in blocks of STDIN_BLOCK_SIZE rather than making a system
+    call for every (possibly tiny) write.
+    """
+
+    def __init__(self, writer):
+        self._writer = writer
+        self._buf = bytearray()
+
+    def write(self, data):
+        self._buf += data
+        if len(self._buf) >= STDIN_BLOCK_SIZE:
+            self.flush()
+        return len(data)
+
+    def flush(self):
+        if self._buf:
+            data, self._buf = bytes(self._buf), bytearray()
+            self._writer.write(data)
+
+def sub_line_start(regex, repl, block):
+    """
+    Like regex.sub(repl, block) for matches at the start of a line. This is
+    much faster than anchoring regex with '^' in MULTILINE mode when it
+    starts with a literal.
+    """
+
+    def fn(m):
+        if m.start() == 0 or block[m.start() - 1] == ord('\n'):
+            return repl
+        return m.group(0)
+
+    return regex.sub(fn, block)
@@ -23,6 +23,7 @@ import sys
 import logging
 import binascii
 
+from diffoscope.cache import CacheManager, MISSING
 from diffoscope.tools import tool_required
 from diffoscope.exc import RequiredToolNotFound
 from diffoscope.config import Config
@@ -79,6 +80,19 @@ def compare_files(file1, file2, source=None):
         if file1.has_same_content_as(file2):
             logger.debug("has_same_content_as returned True; skipping further comparisons")
             return None
+
+    key = cache_key(file1, file2, source)
+    if key is not None:
+        difference = CacheManager().get(key)
+        if difference is not MISSING:
+            return difference
+        difference = specialize_and_compare_files(file1, file2, source)
+        CacheManager().set(key, difference)
+        return difference
+
+    return specialize_and_compare_files(file1, file2, source)
+
+def specialize_and_compare_files(file1, file2, source=None):
     specialize(file1)
     specialize(file2)
     if isinstance(file1, MissingFile):
@@ -90,6 +104,24 @@ def compare_files(file1, file2, source=None):
     with profile('compare_files (cumulative)', file1):
         return file1.compare(file2, source)
 
+def cache_key(file1, file2, source=None):
+    if not CacheManager().enabled:
+        return None
+
+    # Only cache regular files; directories are compared member by member
+    # (each of which is cached individually) and the rest are cheap.
+    for x in (file1, file2):
+        if isinstance(x, MissingFile) or x.is_directory() or \
+                x.is_symlink() or x.is_device():
+            return None
+
+    try:
+        with profile('cache', 'key'):
+            return CacheManager().key(file1, file2, source)
+    except OSError as e:
+        logger.debug("Not caching comparison of %s and %s: %s", file1, file2, e)
+        return None
+
 def compare_commented_files(file1, file2, comment=None, source=None):
     difference = compare_files(file1, file2, source=source)
     if comment:
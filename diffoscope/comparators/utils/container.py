@@ -19,14 +19,15 @@
 
 import abc
 import logging
-import itertools
 import collections
 
 from diffoscope.config import Config
 from diffoscope.progress import Progress
+from diffoscope.parallel import parallel_starmap
 
 from ..missing_file import MissingFile
 
+from .exact import perform_exact_matching
 from .fuzzy import perform_fuzzy_matching
 
 NO_COMMENT = None
@@ -112,6 +113,11 @@ class Container(object, metaclass=abc.ABCMeta):
                     my_reminders[my_member_name] = my_member
 
             my_members = my_reminders
+            for my_name, other_name in perform_exact_matching(my_members, other_members):
+                comment = 'Files identical despite different names'
+                yield my_members.pop(my_name), other_members.pop(other_name), comment
+                p.step(2, msg=my_name)
+
             for my_name, other_name, score in perform_fuzzy_matching(my_members, other_members):
                 comment = 'Files similar despite different names (difference score: %d)' % score
                 yield my_members.pop(my_name), other_members.pop(other_name), comment
@@ -129,7 +135,7 @@ class Container(object, metaclass=abc.ABCMeta):
     def compare(self, other, source=None):
         from .compare import compare_commented_files
 
-        return itertools.starmap(
+        return parallel_starmap(
             compare_commented_files,
             self.comparisons(other),
         )
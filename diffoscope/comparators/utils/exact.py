@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+#
+# diffoscope: in-depth comparison of files, archives, and directories
+#
+# Copyright © 2026 agent <agent@local>
+#
+# diffoscope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# diffoscope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import logging
+import collections
+
+from diffoscope.config import Config
+from diffoscope.profiling import profile
+
+from ..missing_file import MissingFile
+
+from .file import hash_file
+
+logger = logging.getLogger(__name__)
+
+
+def perform_exact_matching(members1, members2):
+    """
+    Pair members that have identical contents despite different names.
+
+    Members are first grouped by size so that only those that could possibly
+    match are hashed, and each one is hashed at most once. Matches are
+    yielded in the order of members1.
+    """
+
+    if Config().fuzzy_threshold == 0:
+        return
+
+    # Perform local copies because they will be modified by consumer
+    members1 = collections.OrderedDict(members1)
+    members2 = collections.OrderedDict(members2)
+
+    sizes2 = collections.OrderedDict()
+    for name2, file2 in members2.items():
+        size = content_size(file2)
+        if size:
+            sizes2.setdefault(size, []).append(name2)
+
+    # Digests of members2, computed lazily per size
+    digests2 = {}
+
+    for name1, file1 in members1.items():
+        size = content_size(file1)
+        if not size or size not in sizes2:
+            continue
+
+        if size not in digests2:
+            digests2[size] = collections.OrderedDict()
+            for name2 in sizes2[size]:
+                digest = content_digest(members2[name2])
+                if digest is not None:
+                    digests2[size].setdefault(digest, collections.deque()).append(name2)
+
+        candidates = digests2[size].get(content_digest(file1))
+        if candidates:
+            name2 = candidates.popleft()
+            logger.debug("exact match %s %s", name1, name2)
+            yield name1, name2
+
+
+def content_size(file):
+    """
+    Return the size of a regular file, or None if it cannot be matched by
+    contents.
+    """
+
+    if isinstance(file, MissingFile) or file.is_directory() or \
+            file.is_symlink() or file.is_device():
+        return None
+
+    # Some containers already know the size without extracting the member
+    size = getattr(file, 'size', None)
+    if size is not None:
+        return size
+
+    try:
+        return os.path.getsize(file.path)
+    except OSError:
+        return None
+
+
+def content_digest(file):
+    digest = getattr(file, 'digest', None)
+    if digest is not None:
+        return digest
+
+    try:
+        with profile('exact_matching', 'hash_file'):
+            return hash_file(file.path)
+    except OSError:
+        return None
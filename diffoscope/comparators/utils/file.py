@@ -21,12 +21,13 @@ import os
 import re
 import abc
 import magic
+import hashlib
 import logging
+import threading
 import subprocess
 
 from diffoscope.exc import RequiredToolNotFound, OutputParsingError
-from diffoscope.tools import tool_required
-from diffoscope.profiling import profile
+from diffoscope.profiling import profile, count
 from diffoscope.difference import Difference
 
 try:
@@ -34,7 +35,10 @@ try:
 except ImportError:  # noqa
     tlsh = None
 
-SMALL_FILE_THRESHOLD = 65536 # 64 kiB
+CMP_BLOCK_SIZE = 2 ** 20 # 1 MiB
+
+# libmagic handles are not safe to share between threads (see --jobs)
+MAGIC_LOCK = threading.Lock()
 
 logger = logging.getLogger(__name__)
 
@@ -46,29 +50,33 @@ class File(object, metaclass=abc.ABCMeta):
     if hasattr(magic, 'open'): # use Magic-file-extensions from file
         @classmethod
         def guess_file_type(self, path):
-            if not hasattr(self, '_mimedb'):
-                self._mimedb = magic.open(magic.NONE)
-                self._mimedb.load()
-            return self._mimedb.file(path)
+            with MAGIC_LOCK:
+                if not hasattr(self, '_mimedb'):
+                    self._mimedb = magic.open(magic.NONE)
+                    self._mimedb.load()
+                return self._mimedb.file(path)
 
         @classmethod
         def guess_encoding(self, path):
-            if not hasattr(self, '_mimedb_encoding'):
-                self._mimedb_encoding = magic.open(magic.MAGIC_MIME_ENCODING)
-                self._mimedb_encoding.load()
-            return self._mimedb_encoding.file(path)
+            with MAGIC_LOCK:
+                if not hasattr(self, '_mimedb_encoding'):
+                    self._mimedb_encoding = magic.open(magic.MAGIC_MIME_ENCODING)
+                    self._mimedb_encoding.load()
+                return self._mimedb_encoding.file(path)
     else: # use python-magic
         @classmethod
         def guess_file_type(self, path):
-            if not hasattr(self, '_mimedb'):
-                self._mimedb = magic.Magic()
-            return maybe_decode(self._mimedb.from_file(path))
+            with MAGIC_LOCK:
+                if not hasattr(self, '_mimedb'):
+                    self._mimedb = magic.Magic()
+                return maybe_decode(self._mimedb.from_file(path))
 
         @classmethod
         def guess_encoding(self, path):
-            if not hasattr(self, '_mimedb_encoding'):
-                self._mimedb_encoding = magic.Magic(mime_encoding=True)
-            return maybe_decode(self._mimedb_encoding.from_file(path))
+            with MAGIC_LOCK:
+                if not hasattr(self, '_mimedb_encoding'):
+                    self._mimedb_encoding = magic.Magic(mime_encoding=True)
+                return maybe_decode(self._mimedb_encoding.from_file(path))
 
     def __init__(self, container=None):
         self._container = container
@@ -202,33 +210,25 @@ class File(object, metaclass=abc.ABCMeta):
         logger.debug('Binary.has_same_content: %s %s', self, other)
         if os.path.isdir(self.path) or os.path.isdir(other.path):
             return False
-        # try comparing small files directly first
         try:
-            my_size = os.path.getsize(self.path)
-            other_size = os.path.getsize(other.path)
+            my_stat = os.stat(self.path)
+            other_stat = os.stat(other.path)
         except OSError:
             # files not readable (e.g. broken symlinks) or something else,
             # just assume they are different
             return False
-        if my_size == other_size and my_size <= SMALL_FILE_THRESHOLD:
-            try:
-                with profile('command', 'cmp (internal)'):
-                    with open(self.path, 'rb') as file1, open(other.path, 'rb') as file2:
-                        return file1.read() == file2.read()
-            except OSError:
-                # one or both files could not be opened for some reason,
-                # assume they are different
-                return False
-
-        return self.cmp_external(other)
-
-    @tool_required('cmp')
-    def cmp_external(self, other):
-        return subprocess.call(
-            ('cmp', '-s', self.path, other.path),
-            shell=False,
-            close_fds=True,
-        ) == 0
+        if my_stat.st_size != other_stat.st_size:
+            return False
+        if (my_stat.st_dev, my_stat.st_ino) == \
+                (other_stat.st_dev, other_stat.st_ino):
+            return True
+        try:
+            with profile('command', 'cmp (internal)'):
+                return same_contents(self.path, other.path)
+        except OSError:
+            # one or both files could not be opened for some reason,
+            # assume they are different
+            return False
 
     # To be specialized directly, or by implementing compare_details
     def compare(self, other, source=None):
@@ -279,3 +279,39 @@ def maybe_decode(s):
         return s.decode('utf-8')
     else:
         return s
+
+
+def same_contents(path1, path2):
+    """
+    Compare the contents of two files block by block, stopping at the first
+    difference.
+    """
+
+    compared = 0
+
+    try:
+        with open(path1, 'rb') as file1, open(path2, 'rb') as file2:
+            while True:
+                buf1 = file1.read(CMP_BLOCK_SIZE)
+                buf2 = file2.read(CMP_BLOCK_SIZE)
+                compared += len(buf1)
+                if buf1 != buf2:
+                    return False
+                if not buf1:
+                    return True
+    finally:
+        count('has_same_content_as', 'bytes compared', compared)
+
+
+def hash_file(path):
+    """
+    Return the SHA-256 hex digest of the contents of a file.
+    """
+
+    h = hashlib.sha256()
+
+    with open(path, 'rb') as f:
+        for buf in iter(lambda: f.read(CMP_BLOCK_SIZE), b''):
+            h.update(buf)
+
+    return h.hexdigest()
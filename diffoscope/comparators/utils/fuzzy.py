@@ -19,6 +19,7 @@
 
 import logging
 import operator
+import collections
 
 from diffoscope.config import Config
 
@@ -29,6 +30,13 @@ except ImportError:  # noqa
 
 logger = logging.getLogger(__name__)
 
+# Weights used by tlsh.diff for the header of the digests; see
+# TlshImpl::totalDiff in the TLSH sources.
+RANGE_LVALUE = 256
+RANGE_QRATIO = 16
+LENGTH_MULT = 12
+QRATIO_MULT = 12
+
 
 def perform_fuzzy_matching(members1, members2):
     if tlsh == None or Config().fuzzy_threshold == 0:
@@ -37,18 +45,106 @@ def perform_fuzzy_matching(members1, members2):
     # Perform local copies because they will be modified by consumer
     members1 = dict(members1)
     members2 = dict(members2)
+    index = None
     for name1, file1 in members1.items():
         if file1.is_directory() or not file1.fuzzy_hash:
             continue
+        if index is None:
+            index = FuzzyIndex(
+                (name2, file2.fuzzy_hash)
+                for name2, file2 in members2.items()
+                if not file2.is_directory() and file2.fuzzy_hash
+            )
         comparisons = []
-        for name2, file2 in members2.items():
-            if name2 in already_compared or file2.is_directory() or not file2.fuzzy_hash:
+        for position, name2, fuzzy_hash in index.candidates(file1.fuzzy_hash):
+            if name2 in already_compared:
                 continue
-            comparisons.append((tlsh.diff(file1.fuzzy_hash, file2.fuzzy_hash), name2))
+            comparisons.append((tlsh.diff(file1.fuzzy_hash, fuzzy_hash), position, name2))
         if comparisons:
-            comparisons.sort(key=operator.itemgetter(0))
-            score, name2 = comparisons[0]
+            # Break ties by the order of members2, as a stable sort over all
+            # of them would.
+            score, _, name2 = min(comparisons, key=operator.itemgetter(0, 1))
             logger.debug('fuzzy top match %s %s: %d difference score', name1, name2, score)
             if score < Config().fuzzy_threshold:
                 yield name1, name2, score
                 already_compared.add(name2)
+
+
+class FuzzyIndex(object):
+    """
+    Buckets TLSH digests by the length and quartile ratios stored in their
+    header. The header alone gives a lower bound of the distance between
+    two digests, so only buckets where that bound is below the fuzzy
+    threshold can contain a match, and the others are never scored.
+
+    This mostly prunes pairs of members of quite different sizes. Members
+    of similar sizes are still all scored against each other, so matching
+    remains quadratic. Finding candidates in sub-quadratic time, eg. by
+    banding the digest bodies, would miss some of the matches found by
+    scoring every pair.
+    """
+
+    def __init__(self, items):
+        self.buckets = collections.defaultdict(list)
+        for position, (name, fuzzy_hash) in enumerate(items):
+            self.buckets[parse_header(fuzzy_hash)].append((position, name, fuzzy_hash))
+        self._neighbours = {}
+
+    def candidates(self, fuzzy_hash):
+        for key in self.neighbours(parse_header(fuzzy_hash)):
+            yield from self.buckets[key]
+
+    def neighbours(self, key):
+        if key not in self._neighbours:
+            threshold = Config().fuzzy_threshold
+            self._neighbours[key] = [
+                x for x in self.buckets
+                if key is None or x is None or header_distance(key, x) < threshold
+            ]
+        return self._neighbours[key]
+
+
+def parse_header(fuzzy_hash):
+    """
+    Return the (lvalue, q1ratio, q2ratio) triple of a TLSH hex digest, or
+    None if it is not in a known format.
+    """
+
+    # Newer versions of tlsh prefix the digest with a version
+    if len(fuzzy_hash) == 72 and fuzzy_hash.startswith('T1'):
+        fuzzy_hash = fuzzy_hash[2:]
+    if len(fuzzy_hash) != 70:
+        return None
+
+    try:
+        lvalue = swap_nibbles(int(fuzzy_hash[2:4], 16))
+        qratios = swap_nibbles(int(fuzzy_hash[4:6], 16))
+    except ValueError:
+        return None
+
+    return lvalue, qratios & 0xf, qratios >> 4
+
+def header_distance(x, y):
+    ldiff = mod_diff(x[0], y[0], RANGE_LVALUE)
+    if ldiff <= 1:
+        diff = ldiff
+    else:
+        diff = ldiff * LENGTH_MULT
+
+    for qdiff in (
+        mod_diff(x[1], y[1], RANGE_QRATIO),
+        mod_diff(x[2], y[2], RANGE_QRATIO),
+    ):
+        if qdiff <= 1:
+            diff += qdiff
+        else:
+            diff += (qdiff - 1) * QRATIO_MULT
+
+    return diff
+
+def mod_diff(x, y, range_):
+    diff = abs(x - y)
+    return min(diff, range_ - diff)
+
+def swap_nibbles(x):
+    return ((x & 0xf) << 4) | (x >> 4)
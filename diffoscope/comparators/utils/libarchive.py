@@ -25,6 +25,7 @@ import logging
 import libarchive
 import collections
 
+from diffoscope.config import Config
 from diffoscope.excludes import any_excluded
 from diffoscope.tempfiles import get_temporary_directory
 
@@ -32,7 +33,7 @@ from ..device import Device
 from ..symlink import Symlink
 from ..directory import Directory
 
-from .archive import Archive, ArchiveMember
+from .archive import Archive, ArchiveMember, hash_blocks, write_blocks
 
 logger = logging.getLogger(__name__)
 
@@ -72,24 +73,45 @@ libarchive.ArchiveEntry.pathname = property(lambda self: libarchive.ffi.entry_pa
 def list_libarchive(path):
     with libarchive.file_reader(path) as archive:
         for entry in archive:
-            if entry.isblk or entry.ischr:
-                size_or_dev = '{major:>3},{minor:>3}'.format(major=entry.rdevmajor, minor=entry.rdevminor)
-            else:
-                size_or_dev = entry.size
-            mtime = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(entry.mtime)) + '.{:06d}'.format(entry.mtime_nsec // 1000)
-            if entry.issym:
-                name_and_link = '{entry.name} -> {entry.linkname}'.format(entry=entry)
-            else:
-                name_and_link = entry.name
-            if entry.uname:
-                user = '{user:<8} {uid:>7}'.format(user=entry.uname.decode('utf-8', errors='surrogateescape'), uid='({})'.format(entry.uid))
-            else:
-                user = entry.uid
-            if entry.gname:
-                group = '{group:<8} {gid:>7}'.format(group=entry.gname.decode('utf-8', errors='surrogateescape'), gid='({})'.format(entry.gid))
-            else:
-                group = entry.gid
-            yield '{strmode} {entry.nlink:>3} {user:>8} {group:>8} {size_or_dev:>8} {mtime:>8} {name_and_link}\n'.format(strmode=entry.strmode.decode('us-ascii'), entry=entry, user=user, group=group, size_or_dev=size_or_dev, mtime=mtime, name_and_link=name_and_link)
+            yield format_entry(entry)
+
+def list_libarchive_file(file):
+    """
+    Like list_libarchive, but re-use the scan of the archive made by its
+    LibarchiveContainer instead of reading it once more.
+    """
+
+    container = file.as_container
+    if isinstance(container, LibarchiveContainer):
+        return container.get_listing()
+    return list_libarchive(file.path)
+
+def format_entry(entry):
+    if entry.isblk or entry.ischr:
+        size_or_dev = '{major:>3},{minor:>3}'.format(major=entry.rdevmajor, minor=entry.rdevminor)
+    else:
+        size_or_dev = entry.size
+    mtime = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(entry.mtime)) + '.{:06d}'.format(entry.mtime_nsec // 1000)
+    if entry.issym:
+        name_and_link = '{entry.name} -> {entry.linkname}'.format(entry=entry)
+    else:
+        name_and_link = entry.name
+    if entry.uname:
+        user = '{user:<8} {uid:>7}'.format(user=entry.uname.decode('utf-8', errors='surrogateescape'), uid='({})'.format(entry.uid))
+    else:
+        user = entry.uid
+    if entry.gname:
+        group = '{group:<8} {gid:>7}'.format(group=entry.gname.decode('utf-8', errors='surrogateescape'), gid='({})'.format(entry.gid))
+    else:
+        group = entry.gid
+    return '{strmode} {entry.nlink:>3} {user:>8} {group:>8} {size_or_dev:>8} {mtime:>8} {name_and_link}\n'.format(strmode=entry.strmode.decode('us-ascii'), entry=entry, user=user, group=group, size_or_dev=size_or_dev, mtime=mtime, name_and_link=name_and_link)
+
+
+def write_entry(entry, dst):
+    logger.debug("Extracting %s to %s", entry.pathname, dst)
+
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    return write_blocks(entry.get_blocks(), dst)
 
 
 class LibarchiveMember(ArchiveMember):
@@ -160,9 +182,9 @@ class LibarchiveDevice(Device, LibarchiveMember):
 
 class LibarchiveContainer(Archive):
     def open_archive(self):
-        # libarchive is very very stream oriented an not for random access
-        # so we are going to reopen the archive everytime
-        # not nice, but it'll work
+        # libarchive is very stream oriented and not for random access, so
+        # we read the archive exactly once in ensure_unpacked, building the
+        # member index, the file listing and extracting the contents.
         return True
 
     def close_archive(self):
@@ -174,19 +196,49 @@ class LibarchiveContainer(Archive):
 
     def extract(self, member_name, dest_dir):
         self.ensure_unpacked()
-        return self._members[member_name]
+        dst = self._members[member_name]
+        with self.lock:
+            if member_name not in self._extracted:
+                self.extract_pending(member_name)
+        return dst
+
+    def comparisons(self, other):
+        if isinstance(other, LibarchiveContainer):
+            self.skip_identical(other)
+        return super().comparisons(other)
+
+    def skip_identical(self, other):
+        """
+        Avoid extracting members that we already know to be identical to their
+        counterparts in ``other`` from their hashes.
+        """
+
+        self.ensure_unpacked()
+        other.ensure_unpacked()
+
+        for name, member in self._index.items():
+            other_member = other._index.get(name)
+            if other_member is None or member.digest is None:
+                continue
+            if (member.size, member.digest) == \
+                    (other_member.size, other_member.digest):
+                self._skip.add(name)
+                other._skip.add(name)
 
     def get_member(self, member_name):
-        with libarchive.file_reader(self.source.path) as archive:
-            for entry in archive:
-                if entry.pathname == member_name:
-                    return self.get_subclass(entry)
-        raise KeyError('%s not found in archive', member_name)
+        self.ensure_unpacked()
+        try:
+            return self._index[member_name]
+        except KeyError:
+            raise KeyError('%s not found in archive' % member_name)
 
     def get_all_members(self):
-        with libarchive.file_reader(self.source.path) as archive:
-            for entry in archive:
-                yield entry.pathname, self.get_subclass(entry)
+        self.ensure_unpacked()
+        return iter(self._all_members)
+
+    def get_listing(self):
+        self.ensure_unpacked()
+        return iter(self._listing)
 
     def get_subclass(self, entry):
         if entry.isdir:
@@ -199,16 +251,36 @@ class LibarchiveContainer(Archive):
         return LibarchiveMember(self, entry)
 
     def ensure_unpacked(self):
+        with self.lock:
+            self._ensure_unpacked()
+
+    def _ensure_unpacked(self):
         if hasattr(self, '_members'):
             return
 
         tmpdir = get_temporary_directory().name
-        self._members = collections.OrderedDict()
-
-        logger.debug("Extracting %s to %s", self.source.path, tmpdir)
+        members = collections.OrderedDict()
+        positions = {}
+        all_members = []
+        index = {}
+        listing = []
+        lazy = Config().lazy_extraction
+
+        if lazy:
+            logger.debug("Hashing contents of %s", self.source.path)
+        else:
+            logger.debug("Extracting %s to %s", self.source.path, tmpdir)
 
         with libarchive.file_reader(self.source.path) as archive:
             for idx, entry in enumerate(archive):
+                listing.append(format_entry(entry))
+
+                member = self.get_subclass(entry)
+                all_members.append((entry.pathname, member))
+                # Archives may contain the same path more than once; lookups
+                # return the first one.
+                index.setdefault(entry.pathname, member)
+
                 # Always skip directories
                 if entry.isdir:
                     continue
@@ -222,16 +294,59 @@ class LibarchiveContainer(Archive):
                 dst = os.path.join(tmpdir, str(idx // 4096), str(idx % 4096))
                 # Maintain a mapping of archive path to the extracted path,
                 # avoiding the need to sanitise filenames.
-                self._members[entry.pathname] = dst
+                members[entry.pathname] = dst
+                positions[entry.pathname] = idx
+
+                # Symlinks and devices are not compared by their contents.
+                if member.is_symlink() or member.is_device():
+                    write_entry(entry, dst)
+                elif lazy:
+                    # Only hash the contents for now; they are extracted
+                    # in extract_pending once a comparator needs them.
+                    self.record_digest(entry.pathname, *hash_blocks(entry.get_blocks()))
+                else:
+                    self.record_digest(entry.pathname, *write_entry(entry, dst))
+
+        self._all_members = all_members
+        self._index = index
+        self._listing = listing
+        self._positions = positions
+        self._extracted = set() if lazy else set(members)
+        self._skip = set()
+        # Set last as its presence marks the archive as being unpacked.
+        self._members = members
+
+        logger.debug(
+            "%s %d entries from %s to %s",
+            "Indexed" if lazy else "Extracted",
+            len(self._members), self.source.path, tmpdir,
+        )
 
-                logger.debug("Extracting %s to %s", entry.pathname, dst)
+    def extract_pending(self, member_name):
+        """
+        Extract ``member_name`` together with all other members that may be
+        needed later on, ie. those not known to be identical, so that the
+        archive is read at most once more in the common case.
+        """
 
-                os.makedirs(os.path.dirname(dst), exist_ok=True)
-                with open(dst, 'wb') as f:
-                    for block in entry.get_blocks():
-                        f.write(block)
+        wanted = set(self._members) - self._extracted - self._skip
+        wanted.add(member_name)
 
         logger.debug(
-            "Extracted %d entries from %s to %s",
-            len(self._members), self.source.path, tmpdir,
+            "Extracting %d entries from %s",
+            len(wanted), self.source.path,
         )
+
+        with libarchive.file_reader(self.source.path) as archive:
+            for idx, entry in enumerate(archive):
+                # If the archive contains the same path more than once, only
+                # the position of the last one was recorded.
+                if entry.pathname not in wanted or \
+                        self._positions[entry.pathname] != idx:
+                    continue
+
+                result = write_entry(entry, self._members[entry.pathname])
+                if not (entry.issym or entry.isblk or entry.ischr):
+                    self.record_digest(entry.pathname, *result)
+
+        self._extracted.update(wanted)
@@ -19,7 +19,6 @@
 
 import re
 import sys
-import shutil
 import os.path
 import zipfile
 import contextlib
@@ -29,8 +28,8 @@ from diffoscope.difference import Difference
 
 from .utils.file import File
 from .directory import Directory
-from .utils.archive import Archive, ArchiveMember
-from .utils.command import Command
+from .utils.archive import Archive, ArchiveMember, write_blocks
+from .utils.command import Command, sub_line_start
 
 
 class Zipinfo(Command):
@@ -38,11 +37,11 @@ class Zipinfo(Command):
     def cmdline(self):
         return ['zipinfo', self.path]
 
-    def filter(self, line):
-        # we don't care about the archive file path
-        if line.startswith(b'Archive:'):
-            return b''
-        return line
+    # we don't care about the archive file path
+    ARCHIVE_RE = re.compile(rb'Archive:.*\n?')
+
+    def filter_block(self, block):
+        return sub_line_start(Zipinfo.ARCHIVE_RE, b'', block)
 
 
 class ZipinfoVerbose(Zipinfo):
@@ -86,8 +85,11 @@ class ZipContainer(Archive):
         # can't be encoded using the filesystem encoding. So let's replace
         # any weird character so we can get to the bytes.
         targetpath = os.path.join(dest_dir, os.path.basename(member_name)).encode(sys.getfilesystemencoding(), errors='replace')
-        with self.archive.open(member_name) as source, open(targetpath, 'wb') as target:
-            shutil.copyfileobj(source, target)
+        with self.archive.open(member_name) as source:
+            self.record_digest(member_name, *write_blocks(
+                iter(lambda: source.read(2 ** 20), b''),
+                targetpath,
+            ))
         return targetpath.decode(sys.getfilesystemencoding())
 
     def get_member(self, member_name):
@@ -32,6 +32,10 @@ class Config(object):
     max_report_child_size = 500 * 2 ** 10
     new_file = False
     fuzzy_threshold = 60
+    jobs = 1
+    lazy_extraction = False
+    max_cache_size = 2 ** 30 # 1 GiB
+    max_diff_memory = 2 ** 30 # 1 GiB
     enforce_constraints = True
     excludes = ()
 
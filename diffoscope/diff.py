@@ -20,24 +20,32 @@
 import re
 import io
 import os
-import errno
-import fcntl
 import hashlib
 import logging
-import threading
 import subprocess
 
-from multiprocessing.dummy import Queue
-
 from diffoscope.tempfiles import get_temporary_directory
 
+from . import patience
+from .myers import unified_diff, TooExpensive
 from .tools import tool_required
+from .jobserver import JobServer
+from .diffstore import DiffStore, DiffBlock
 from .config import Config
+from .profiling import profile, count
 
 DIFF_CHUNK = 4096
 
+# Outputs are kept in memory up to this size, and written to disk otherwise.
+SPOOL_MAX_SIZE = 2 ** 20 # 1 MiB
+
+# Inputs up to this many lines are compared in-process, unless that takes
+# more than roughly NATIVE_DIFF_BUDGET steps. Beyond those, running diff(1)
+# is cheaper.
+NATIVE_DIFF_MAX_LINES = 4096
+NATIVE_DIFF_BUDGET = 50000
+
 logger = logging.getLogger(__name__)
-re_diff_change = re.compile(r'^([+-@]).*', re.MULTILINE)
 
 
 class DiffParser(object):
@@ -45,17 +53,16 @@ class DiffParser(object):
         r'^@@\s+-(?P<start1>\d+)(,(?P<len1>\d+))?\s+\+(?P<start2>\d+)(,(?P<len2>\d+))?\s+@@$',
     )
 
-    def __init__(self, output, end_nl_q1, end_nl_q2):
+    def __init__(self, output, end_nl1, end_nl2):
         self._output = output
-        self._end_nl_q1 = end_nl_q1
-        self._end_nl_q2 = end_nl_q2
+        # When both files don't end with \n, do not show it as a difference
+        self._end_nl = end_nl1 and end_nl2
         self._action = self.read_headers
-        self._diff = io.StringIO()
+        self._diff = DiffStore().writer()
         self._success = False
         self._remaining_hunk_lines = None
         self._block_len = None
         self._direction = None
-        self._end_nl = None
         self._max_lines = Config().max_diff_block_lines_saved
 
     @property
@@ -71,6 +78,10 @@ class DiffParser(object):
             self._action = self._action(line.decode('utf-8', errors='replace'))
 
         self._action('')
+        # Drop the bound method referring back to self, so that the diff is
+        # freed as soon as it is not used anymore rather than by the garbage
+        # collector
+        self._action = None
         self._success = True
         self._output.close()
 
@@ -114,11 +125,6 @@ class DiffParser(object):
         elif line[0] == '-':
             self._remaining_hunk_lines -= 1
         elif line[0] == '\\':
-            # When both files don't end with \n, do not show it as a difference
-            if self._end_nl is None:
-                end_nl1 = self._end_nl_q1.get()
-                end_nl2 = self._end_nl_q2.get()
-                self._end_nl = end_nl1 and end_nl2
             if not self._end_nl:
                 return self.read_hunk
         elif self._remaining_hunk_lines == 0:
@@ -156,20 +162,20 @@ class DiffParser(object):
         return self.skip_block
 
 @tool_required('diff')
-def run_diff(fifo1, fifo2, end_nl_q1, end_nl_q2):
-    cmd = ['diff', '-aU7', fifo1, fifo2]
+def run_diff(path1, path2, end_nl1, end_nl2):
+    cmd = ['diff', '-aU7', path1, path2]
 
     logger.debug("Running %s", ' '.join(cmd))
 
-    p = subprocess.Popen(
-        cmd,
-        bufsize=1,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-    )
-    parser = DiffParser(p.stdout, end_nl_q1, end_nl_q2)
-    parser.parse()
-    p.wait()
+    with JobServer().slot():
+        p = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+        )
+        parser = DiffParser(p.stdout, end_nl1, end_nl2)
+        parser.parse()
+        p.wait()
 
     logger.debug(
         "%s: returncode %d, parsed %s",
@@ -179,139 +185,199 @@ def run_diff(fifo1, fifo2, end_nl_q1, end_nl_q2):
     )
 
     if not parser.success and p.returncode not in (0, 1):
-        raise subprocess.CalledProcessError(p.returncode, cmd, output=diff)
+        raise subprocess.CalledProcessError(p.returncode, cmd)
 
     if p.returncode == 0:
         return None
 
     return parser.diff
 
-class FIFOFeeder(threading.Thread):
-    def __init__(self, feeder, fifo_path, end_nl_q=None, *, daemon=True):
-        os.mkfifo(fifo_path)
-        super().__init__(daemon=daemon)
-        self.feeder = feeder
-        self.fifo_path = fifo_path
-        self.end_nl_q = Queue() if end_nl_q is None else end_nl_q
-        self._exception = None
-        self._want_join = threading.Event()
+def run_native_diff(content1, content2, end_nl1, end_nl2):
+    """
+    Compare in-process, producing the same output as run_diff. Raises
+    TooExpensive if that would be slower than running diff(1).
+    """
+
+    lines1 = list(io.BytesIO(content1))
+    lines2 = list(io.BytesIO(content2))
+
+    if max(len(lines1), len(lines2)) > NATIVE_DIFF_MAX_LINES:
+        raise TooExpensive()
+
+    output = b''.join(unified_diff(lines1, lines2, 7, NATIVE_DIFF_BUDGET))
+    if not output:
+        return None
+
+    parser = DiffParser(io.BytesIO(output), end_nl1, end_nl2)
+    parser.parse()
+
+    return parser.diff
+
+def run_patience_diff(path1, path2, end_nl1, end_nl2):
+    """
+    Compare files too large for diff(1) in-process, without keeping their
+    contents in memory; see diffoscope.patience.
+    """
+
+    parser = DiffParser(patience.unified_diff(path1, path2), end_nl1, end_nl2)
+    parser.parse()
+
+    return parser.diff or None
+
+class Spool(object):
+    """
+    File-like object keeping what is written to it in memory, or in the file
+    at ``path`` once that exceeds ``max_size``. What is written is hashed
+    along the way, so identical contents can be detected without comparing
+    them.
+    """
+
+    def __init__(self, path, max_size=SPOOL_MAX_SIZE):
+        self.path = path
+        self.max_size = max_size
+        self._buf = io.BytesIO()
+        self._file = None
+        self._hash = hashlib.sha256()
+        self.lines = 0
 
     def __enter__(self):
-        self.start()
         return self
 
     def __exit__(self, exc_type, exc_value, exc_tb):
-        self.join()
-
-    def run(self):
-        try:
-            # Try to open the FIFO nonblocking, so we can periodically check
-            # if the main thread wants us to wind down.  If it does, there's no
-            # more need for the FIFO, so stop the thread.
-            while True:
-                try:
-                    fifo_fd = os.open(self.fifo_path, os.O_WRONLY | os.O_NONBLOCK)
-                except OSError as error:
-                    if error.errno != errno.ENXIO:
-                        raise
-                    elif self._want_join.is_set():
-                        return
-                else:
-                    break
-
-            # Now clear the fd's nonblocking flag to let writes block normally.
-            fcntl.fcntl(fifo_fd, fcntl.F_SETFL, 0)
-            with open(fifo_fd, 'wb') as fifo:
-                # The queue works around a unified diff limitation: if there's
-                # no newlines in both don't make it a difference
-                end_nl = self.feeder(fifo)
-                self.end_nl_q.put(end_nl)
-        except Exception as error:
-            self._exception = error
-
-    def join(self):
-        self._want_join.set()
-        super().join()
-        if self._exception is not None:
-            raise self._exception
-
-
-def empty_file_feeder():
-    def feeder(f):
-        return False
-    return feeder
-
-def make_feeder_from_raw_reader(in_file, filter=lambda buf: buf):
-    def feeder(out_file):
-        h = None
-        end_nl = False
-        max_lines = Config().max_diff_input_lines
-        line_count = 0
-
-        if max_lines < float("inf"):
-            h = hashlib.sha1()
-
-        for buf in in_file:
-            line_count += 1
-            out = filter(buf)
-            if h:
-                h.update(out)
-            if line_count < max_lines:
-                out_file.write(out)
-            end_nl = buf[-1] == '\n'
-
-        if h and line_count >= max_lines:
-            out_file.write("[ Too much input for diff (SHA1: {}) ]\n".format(
-                h.hexdigest(),
-            ).encode('utf-8'))
-            end_nl = True
-
-        return end_nl
-    return feeder
+        self.close()
 
-def diff(feeder1, feeder2):
-    tmpdir = get_temporary_directory().name
+    @property
+    def in_memory(self):
+        return self._buf is not None
 
-    fifo1_path = os.path.join(tmpdir, 'fifo1')
-    fifo2_path = os.path.join(tmpdir, 'fifo2')
-    with FIFOFeeder(feeder1, fifo1_path) as fifo1, \
-         FIFOFeeder(feeder2, fifo2_path) as fifo2:
-        return run_diff(fifo1_path, fifo2_path, fifo1.end_nl_q, fifo2.end_nl_q)
+    def write(self, data):
+        self.lines += data.count(b'\n')
+        self._hash.update(data)
 
-def reverse_unified_diff(diff):
-    res = []
-    for line in diff.splitlines(True): # keepends=True
-        found = DiffParser.RANGE_RE.match(line)
+        if self._buf is None:
+            return self._file.write(data)
 
-        if found:
-            before = found.group('start2')
-            if found.group('len2') is not None:
-                before += ',' + found.group('len2')
-
-            after = found.group('start1')
-            if found.group('len1') is not None:
-                after += ',' + found.group('len1')
-
-            res.append('@@ -%s +%s @@\n' % (before, after))
-        elif line.startswith('-'):
-            res.append('+')
-            res.append(line[1:])
-        elif line.startswith('+'):
-            res.append('-')
-            res.append(line[1:])
-        else:
-            res.append(line)
-    return ''.join(res)
+        result = self._buf.write(data)
+        if self._buf.tell() > self.max_size:
+            self.rollover()
+        return result
 
-def color_unified_diff(diff):
-    RESET = '\033[0m'
-    RED, GREEN, CYAN = '\033[31m', '\033[32m', '\033[0;36m'
+    def rollover(self):
+        if self._buf is None:
+            return
+
+        self._file = open(self.path, 'wb')
+        self._file.write(self._buf.getbuffer())
+        self._buf = None
+
+    def getvalue(self):
+        return self._buf.getvalue()
+
+    def digest(self):
+        return self._hash.digest()
 
-    def repl(m):
-        return '{}{}{}'.format({
-            '-': RED,
-            '@': CYAN,
-            '+': GREEN,
-        }[m.group(1)], m.group(0), RESET)
+    def to_path(self):
+        """
+        Return the path of a file with the contents written so far.
+        """
 
-    return re_diff_change.sub(repl, diff)
+        self.rollover()
+        self._file.flush()
+        return self.path
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            os.unlink(self.path)
+            self._file = None
+        self._buf = None
+
+def diff(feeder1, feeder2):
+    tmpdir = get_temporary_directory().name
+
+    with Spool(os.path.join(tmpdir, 'file1')) as spool1, \
+         Spool(os.path.join(tmpdir, 'file2')) as spool2:
+        # Feeders return whether their output ends with a newline; see
+        # DiffParser.read_hunk
+        end_nl1 = feeder1(spool1)
+        end_nl2 = feeder2(spool2)
+
+        if spool1.digest() == spool2.digest():
+            count('diff', 'skipped (identical inputs)')
+            return None
+
+        # Feeders only pass more lines than this when the input is to be
+        # compared by diffoscope.patience
+        if max(spool1.lines, spool2.lines) > Config().max_diff_input_lines:
+            with profile('diff', 'patience'):
+                return run_patience_diff(
+                    spool1.to_path(),
+                    spool2.to_path(),
+                    end_nl1,
+                    end_nl2,
+                )
+
+        # Avoid the cost of running diff(1) for small inputs
+        if spool1.in_memory and spool2.in_memory:
+            try:
+                with profile('diff', 'native'):
+                    return run_native_diff(
+                        spool1.getvalue(),
+                        spool2.getvalue(),
+                        end_nl1,
+                        end_nl2,
+                    )
+            except TooExpensive:
+                pass
+
+        with profile('diff', 'diff'):
+            return run_diff(
+                spool1.to_path(),
+                spool2.to_path(),
+                end_nl1,
+                end_nl2,
+            )
+
+def reverse_unified_diff(block):
+    """
+    Return the ``DiffBlock`` turning the second file into the first one for
+    block.
+    """
+
+    lines = []
+    for tag, line in block:
+        if tag == '@':
+            found = DiffParser.RANGE_RE.match(line)
+            if found:
+                before = found.group('start2')
+                if found.group('len2') is not None:
+                    before += ',' + found.group('len2')
+
+                after = found.group('start1')
+                if found.group('len1') is not None:
+                    after += ',' + found.group('len1')
+
+                line = '@@ -%s +%s @@' % (before, after)
+        elif tag == '-':
+            line = '+' + line[1:]
+        elif tag == '+':
+            line = '-' + line[1:]
+        lines.append(line)
+
+    return DiffBlock.from_lines(lines, block.text.endswith('\n'))
+
+def color_unified_diff(block):
+    RESET = '\033[0m'
+    COLORS = {
+        '-': '\033[31m',
+        '@': '\033[0;36m',
+        '+': '\033[32m',
+    }
+
+    lines = []
+    for tag, line in block:
+        if tag in COLORS:
+            line = '{}{}{}'.format(COLORS[tag], line, RESET)
+        lines.append(line)
+
+    return '\n'.join(lines) + ('\n' if block.text.endswith('\n') else '')
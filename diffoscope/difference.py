@@ -19,15 +19,21 @@
 
 import signal
 import hashlib
+import functools
+import itertools
 import logging
 import subprocess
 
+from . import patience
 from .exc import RequiredToolNotFound
 from .diff import diff, reverse_unified_diff
 from .config import Config
+from .diffstore import DiffStore, store
 from .profiling import profile
+from .comparators.utils.command import Command
 
 DIFF_CHUNK = 4096
+READ_BLOCK_SIZE = 2 ** 20 # 1 MiB
 
 logger = logging.getLogger(__name__)
 
@@ -40,6 +46,8 @@ class Difference(object):
                 self._comments.extend(comment)
             else:
                 self._comments.append(comment)
+        if isinstance(unified_diff, str):
+            unified_diff = store(unified_diff)
         self._unified_diff = unified_diff
         # allow to override declared file paths, useful when comparing
         # tempfiles
@@ -60,6 +68,8 @@ class Difference(object):
         # Whether the unified_diff already contains line numbers inside itself
         self._has_internal_linenos = has_internal_linenos
         self._details = []
+        # Details still to be computed, see add_lazy_details
+        self._lazy_details = None
 
     def __repr__(self):
         return '<Difference %s -- %s %s>' % (self._source1, self._source2, self._details)
@@ -103,21 +113,27 @@ class Difference(object):
             command_args = kwargs['command_args']
             del kwargs['command_args']
         command1 = None
-        if path1 == '/dev/null':
-            feeder1 = empty_file_feeder()
-        else:
-            command1 = klass(path1, *command_args)
-            feeder1 = make_feeder_from_command(command1)
         command2 = None
-        if path2 == '/dev/null':
-            feeder2 = empty_file_feeder()
-        else:
-            command2 = klass(path2, *command_args)
-            feeder2 = make_feeder_from_command(command2)
-        if 'source' not in kwargs:
-            source_cmd = command1 or command2
-            kwargs['source'] = ' '.join(map(lambda x: '{}' if x == source_cmd.path else x, source_cmd.cmdline()))
-        difference = Difference.from_feeder(feeder1, feeder2, path1, path2, *args, **kwargs)
+        try:
+            if path1 == '/dev/null':
+                feeder1 = empty_file_feeder()
+            else:
+                command1 = klass(path1, *command_args)
+                feeder1 = make_feeder_from_command(command1)
+            if path2 == '/dev/null':
+                feeder2 = empty_file_feeder()
+            else:
+                command2 = klass(path2, *command_args)
+                feeder2 = make_feeder_from_command(command2)
+            if 'source' not in kwargs:
+                source_cmd = command1 or command2
+                kwargs['source'] = ' '.join(map(lambda x: '{}' if x == source_cmd.path else x, source_cmd.cmdline()))
+            difference = Difference.from_feeder(feeder1, feeder2, path1, path2, *args, **kwargs)
+        finally:
+            # Don't leave commands running if the comparison failed
+            for command in (command1, command2):
+                if command:
+                    command.close()
         if not difference:
             return None
         if command1 and command1.stderr_content:
@@ -150,7 +166,23 @@ class Difference(object):
 
     @property
     def unified_diff(self):
-        return self._unified_diff
+        if self._unified_diff is None:
+            return None
+        return self._unified_diff.getvalue()
+
+    @property
+    def has_unified_diff(self):
+        return bool(self._unified_diff)
+
+    def iter_unified_diff(self):
+        """
+        Yield the unified diff as ``DiffBlock``s, without reading all of it
+        in memory if it was stored on disk.
+        """
+
+        if self._unified_diff is None:
+            return iter(())
+        return iter(self._unified_diff)
 
     @property
     def has_internal_linenos(self):
@@ -158,21 +190,67 @@ class Difference(object):
 
     @property
     def details(self):
+        if self._lazy_details is not None:
+            self._details.extend(self._lazy_details)
+            self._lazy_details = None
         return self._details
 
+    def iter_details(self):
+        """
+        Yield the details, computing those added by add_lazy_details as they
+        are needed. These are not kept, so a report can be output while the
+        comparison is still running without holding all of it in memory;
+        they can only be iterated over once, unless compute_details was
+        called first.
+        """
+
+        for x in self._details:
+            yield x
+        if self._lazy_details is not None:
+            lazy_details, self._lazy_details = self._lazy_details, None
+            for x in lazy_details:
+                yield x
+
+    def compute_details(self):
+        """
+        Compute the details added by add_lazy_details, recursively.
+        """
+
+        for x in self.details:
+            x.compute_details()
+
     def add_details(self, differences):
         if len([d for d in differences if type(d) is not Difference]) > 0:
             raise TypeError("'differences' must contains Difference objects'")
+        if self._lazy_details is not None:
+            self._lazy_details = itertools.chain(self._lazy_details, differences)
+            return
         self._details.extend(differences)
 
+    def add_lazy_details(self, differences):
+        """
+        Add the details yielded by the iterable differences, which are only
+        compared when they are needed; see iter_details.
+        """
+
+        self._lazy_details = itertools.chain(self._lazy_details or (), differences)
+
+    def __getstate__(self):
+        # Pending details cannot be pickled, eg. by the cache
+        self.compute_details()
+        return self.__dict__
+
     def get_reverse(self):
         if self._unified_diff is None:
             unified_diff = None
         else:
-            unified_diff = reverse_unified_diff(self._unified_diff)
+            writer = DiffStore().writer()
+            for block in self.iter_unified_diff():
+                writer.write_block(reverse_unified_diff(block))
+            unified_diff = writer.getvalue()
         logger.debug('reverse orig %s %s', self._source1, self._source2)
         difference = Difference(unified_diff, None, None, source=[self._source2, self._source1], comment=self._comments)
-        difference.add_details([d.get_reverse() for d in self._details])
+        difference.add_details([d.get_reverse() for d in self.details])
         return difference
 
 def make_feeder_from_text_reader(in_file, filter=lambda text_buf: text_buf):
@@ -181,9 +259,17 @@ def make_feeder_from_text_reader(in_file, filter=lambda text_buf: text_buf):
     return make_feeder_from_raw_reader(in_file, encoding_filter)
 
 def make_feeder_from_command(command):
+    # Output that is not filtered line by line can be processed in blocks
+    if hasattr(command, 'filter_block'):
+        make_feeder = functools.partial(make_feeder_from_raw_blocks, filter=command.filter_block)
+    elif type(command).filter is Command.filter:
+        make_feeder = make_feeder_from_raw_blocks
+    else:
+        make_feeder = functools.partial(make_feeder_from_raw_reader, filter=command.filter)
+
     def feeder(out_file):
         with profile('command', command.cmdline()[0]):
-            end_nl = make_feeder_from_raw_reader(command.stdout, command.filter)(out_file)
+            end_nl = make_feeder(command.stdout)(out_file)
             if command.poll() is None:
                 command.terminate()
             returncode = command.wait()
@@ -198,6 +284,9 @@ def make_feeder_from_raw_reader(in_file, filter=lambda buf: buf):
         line_count = 0
         end_nl = False
         h = None
+        # Larger inputs are compared by diffoscope.patience if available
+        if patience.numpy is not None:
+            max_lines = float("inf")
         if max_lines < float("inf"):
             h = hashlib.sha1()
         for buf in in_file:
@@ -214,6 +303,66 @@ def make_feeder_from_raw_reader(in_file, filter=lambda buf: buf):
         return end_nl
     return feeder
 
+def make_feeder_from_raw_blocks(in_file, filter=lambda block: block):
+    """
+    Like make_feeder_from_raw_reader, but reading in_file in large blocks.
+    The filter is called with blocks of whole lines and must process each
+    of them independently.
+    """
+
+    def feeder(out_file):
+        max_lines = Config().max_diff_input_lines
+        line_count = 0
+        end_nl = False
+        h = None
+        if patience.numpy is not None:
+            max_lines = float("inf")
+        if max_lines < float("inf"):
+            h = hashlib.sha1()
+        for buf in read_line_blocks(in_file):
+            newlines = buf.count(b'\n')
+            # Write the first max_lines - 1 lines, as make_feeder_from_raw_reader
+            remaining = max_lines - 1 - line_count
+            if newlines < remaining:
+                out = filter(buf)
+                out_file.write(out)
+            else:
+                end = 0
+                for _ in range(max(remaining, 0)):
+                    end = buf.index(b'\n', end) + 1
+                out = filter(buf[:end])
+                out_file.write(out)
+                out += filter(buf[end:])
+            if h:
+                h.update(out)
+            line_count += newlines
+            end_nl = buf.endswith(b'\n')
+        if line_count and not end_nl:
+            line_count += 1
+        if h and line_count >= max_lines:
+            out_file.write('[ Too much input for diff (SHA1: {}) ]\n'.format(h.hexdigest()).encode('utf-8'))
+            end_nl = True
+        return end_nl
+    return feeder
+
+def read_line_blocks(in_file):
+    """
+    Yield the contents of in_file in blocks of roughly READ_BLOCK_SIZE bytes
+    that end on a line boundary, except maybe the last one.
+    """
+
+    partial = []
+    for buf in iter(lambda: in_file.read(READ_BLOCK_SIZE), b''):
+        end = buf.rfind(b'\n') + 1
+        if not end:
+            partial.append(buf)
+            continue
+        partial.append(buf[:end])
+        yield b''.join(partial)
+        partial = [buf[end:]]
+    if any(partial):
+        yield b''.join(partial)
+
 def make_feeder_from_text(content):
     def feeder(f):
         for offset in range(0, len(content), DIFF_CHUNK):
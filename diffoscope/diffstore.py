@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+#
+# diffoscope: in-depth comparison of files, archives, and directories
+#
+# Copyright © 2026 agent <agent@local>
+#
+# diffoscope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# diffoscope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import zlib
+import array
+import weakref
+import logging
+import itertools
+import threading
+
+from .config import Config
+from .profiling import count
+from .tempfiles import get_named_temporary_file
+
+logger = logging.getLogger(__name__)
+
+# Diffs are kept in memory, or compressed to disk, in blocks of whole lines
+# of about this many characters.
+BLOCK_SIZE = 2 ** 20
+
+
+class DiffStore(object):
+    """
+    Storage for the unified diffs of the ``Difference`` tree, which is only
+    output once the whole comparison is done.
+
+    Diffs are kept in memory as long as those not freed yet, eg. once
+    streamed to the report, add up to less than ``Config().max_diff_memory``.
+    Larger diffs are then compressed, block by block, into a single
+    temporary file as they are written and read back from there on demand.
+    """
+
+    _singleton = {}
+
+    def __init__(self):
+        self.__dict__ = self._singleton
+
+        if not self._singleton:
+            self.reset()
+
+    def reset(self):
+        self.lock = threading.Lock()
+        self.in_memory = 0
+        # Sizes of the blocks freed since, appended to by finalizers which
+        # may run at any time, even with the lock held
+        self._freed = []
+        self._file = None
+
+    def writer(self):
+        return DiffWriter(self)
+
+    def over_budget(self, size):
+        with self.lock:
+            while self._freed:
+                self.in_memory -= self._freed.pop()
+            return self.in_memory + size > Config().max_diff_memory
+
+    def keep(self, block):
+        with self.lock:
+            self.in_memory += len(block)
+        finalizer = weakref.finalize(block, self._freed.append, len(block))
+        finalizer.atexit = False
+
+    def append(self, data):
+        """
+        Compress and append data to the temporary file, returning the file,
+        the offset and the compressed size.
+        """
+
+        data = zlib.compress(data, 1)
+
+        with self.lock:
+            if self._file is None:
+                self._file = get_named_temporary_file(
+                    suffix='_diffs',
+                    delete=False,
+                )
+                logger.debug("Storing large diffs in %s", self._file.name)
+
+            f = self._file
+            offset = f.tell()
+            f.write(data)
+            f.flush()
+
+        return f, offset, len(data)
+
+
+class DiffBlock(object):
+    """
+    Whole lines of a unified diff, parsed once for all presenters.
+
+    ``text`` holds the lines as one string, ``tags`` the first character of
+    each of them (``'\\n'`` for empty lines) and ``ends`` the offset in
+    ``text`` just past each of them. Iterating over a block yields
+    ``(tag, line)`` pairs, without the newlines.
+    """
+
+    __slots__ = ('text', 'tags', 'ends', '__weakref__')
+
+    def __init__(self, text, tags, ends):
+        self.text = text
+        self.tags = tags
+        self.ends = ends
+
+    @classmethod
+    def from_lines(cls, lines, end_nl=True):
+        """
+        Make a block of lines given without their newlines. The last one has
+        none unless end_nl is True.
+        """
+
+        lengths = [len(x) + 1 for x in lines]
+        if lengths and not end_nl:
+            lengths[-1] -= 1
+
+        text = '\n'.join(lines)
+        if lines and end_nl:
+            text += '\n'
+
+        return cls(
+            text,
+            ''.join(x[:1] or '\n' for x in lines),
+            array.array('L', itertools.accumulate(lengths)),
+        )
+
+    @classmethod
+    def from_text(cls, text):
+        lines = text.split('\n')
+        last = lines.pop()
+        if last:
+            lines.append(last)
+        return cls.from_lines(lines, not last)
+
+    def __len__(self):
+        return len(self.text)
+
+    def __iter__(self):
+        return zip(self.tags, self.text.split('\n'))
+
+
+class DiffWriter(object):
+    """
+    File-like object to write a diff to, one line at a time, returning the
+    stored diff from ``getvalue``.
+    """
+
+    def __init__(self, store):
+        self._store = store
+        self._blocks = []
+        self._length = 0
+        self._on_disk = False
+        self._value = None
+        self.new_block()
+
+    def new_block(self):
+        self._lines = []
+        self._tags = []
+        self._ends = array.array('L')
+        self._size = 0
+
+    def write(self, line):
+        self._lines.append(line)
+        self._tags.append(line[:1])
+        self._size += len(line)
+        self._ends.append(self._size)
+
+        if self._size >= BLOCK_SIZE:
+            self.flush()
+
+    def write_block(self, block):
+        self.flush()
+        self.add(block)
+
+    def flush(self):
+        if self._lines:
+            self.add(DiffBlock(
+                ''.join(self._lines),
+                ''.join(self._tags),
+                self._ends,
+            ))
+            self.new_block()
+
+    def add(self, block):
+        self._length += len(block)
+
+        if not self._on_disk and self._store.over_budget(len(block)):
+            count('diff', 'stored on disk')
+            self._on_disk = True
+
+        if self._on_disk:
+            self._blocks.append(self._store.append(
+                block.text.encode('utf-8', errors='surrogatepass'),
+            ))
+        else:
+            self._store.keep(block)
+            self._blocks.append(block)
+
+    def getvalue(self):
+        if self._value is None:
+            self.flush()
+            self._value = UnifiedDiff(self._blocks, self._length)
+        return self._value
+
+
+class UnifiedDiff(object):
+    """
+    Unified diff made of ``DiffBlock``s, either kept in memory or stored on
+    disk by a ``DiffStore``. Iterating over it yields the blocks.
+    """
+
+    def __init__(self, blocks, length):
+        self._blocks = blocks
+        self._length = length
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        for block in self._blocks:
+            if isinstance(block, DiffBlock):
+                yield block
+                continue
+            f, offset, size = block
+            data = zlib.decompress(os.pread(f.fileno(), size, offset))
+            yield DiffBlock.from_text(
+                data.decode('utf-8', errors='surrogatepass'),
+            )
+
+    def __reduce__(self):
+        # Store the diff again when loading it, eg. from the cache.
+        return store, (self.getvalue(),)
+
+    @property
+    def on_disk(self):
+        return any(not isinstance(x, DiffBlock) for x in self._blocks)
+
+    def getvalue(self):
+        return ''.join(x.text for x in self)
+
+
+def store(text):
+    """
+    Return a unified diff given as a string as stored by ``DiffStore``.
+    """
+
+    writer = DiffStore().writer()
+    lines = text.split('\n')
+    last = lines.pop()
+    for line in lines:
+        writer.write(line + '\n')
+    if last:
+        writer.write(last)
+    return writer.getvalue()
@@ -32,10 +32,6 @@ EXTERNAL_TOOLS = {
         'arch': 'colord',
         'FreeBSD': 'colord',
     },
-    'cmp': {
-        'debian': 'diffutils',
-        'arch': 'diffutils',
-    },
     'cpio': {
         'debian': 'cpio',
         'arch': 'cpio',
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+#
+# diffoscope: in-depth comparison of files, archives, and directories
+#
+# Copyright © 2026 agent <agent@local>
+#
+# diffoscope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# diffoscope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import re
+import stat
+import fcntl
+import atexit
+import select
+import logging
+import threading
+import contextlib
+import subprocess
+
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+RE_JOBSERVER = re.compile(r'--jobserver-(?:auth|fds)=(\S+)')
+
+
+class JobServer(object):
+    """
+    Limits how many external processes run at once across the whole
+    comparison.
+
+    When run by GNU make with a jobserver (eg. from a recipe prefixed with
+    '+' under ``make -jN``), slots are shared with make using its protocol:
+    diffoscope owns one implicit slot and reads a token from make's pipe
+    for every other one, writing it back once done. Otherwise, up to twice
+    ``Config().jobs`` processes may run at once, as comparing the output of
+    commands runs two of them at a time.
+
+    A thread only blocks waiting for a slot when it holds none, so threads
+    cannot deadlock waiting for each other's slots.
+    """
+
+    _singleton = {}
+
+    def __init__(self):
+        self.__dict__ = self._singleton
+
+        if not self._singleton:
+            self.reset()
+
+    def reset(self):
+        self.lock = threading.Lock()
+        self.condition = threading.Condition(self.lock)
+        self.local = threading.local()
+        self.running = 0
+        self.tokens = []
+        self.implicit_free = True
+        self.fds = None
+        self.wakeup = None
+        self.initialized = False
+
+    def setup(self):
+        self.initialized = True
+
+        match = None
+        for match in RE_JOBSERVER.finditer(os.environ.get('MAKEFLAGS', '')):
+            pass
+        if match is None:
+            return
+
+        try:
+            self.fds = open_jobserver(match.group(1))
+        except (OSError, ValueError) as e:
+            logger.warning("Not using the make jobserver %s: %s", match.group(1), e)
+            return
+
+        logger.debug("Using the make jobserver %s", match.group(1))
+        self.wakeup = os.pipe()
+        for fd in self.wakeup:
+            fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+        atexit.register(self.return_tokens)
+
+    def held(self):
+        return getattr(self.local, 'held', 0)
+
+    def acquire(self, block=True):
+        """
+        Take a slot, returning whether one was available if block is False.
+        """
+
+        with self.lock:
+            if not self.initialized:
+                self.setup()
+
+            if self.fds is None:
+                while self.running >= 2 * Config().jobs:
+                    if not block:
+                        return False
+                    self.condition.wait()
+                self.running += 1
+                self.local.held = self.held() + 1
+                return True
+
+        token = self.read_token(block)
+        if token is False:
+            return False
+
+        with self.lock:
+            if token is not None:
+                self.tokens.append(token)
+            self.local.held = self.held() + 1
+        return True
+
+    def read_token(self, block):
+        """
+        Return a token read from make, None for the implicit slot or False if
+        block is False and neither is available.
+        """
+
+        rfd = self.fds[0]
+
+        while True:
+            with self.lock:
+                if self.implicit_free:
+                    self.implicit_free = False
+                    return None
+
+            ready = select.select(
+                [rfd, self.wakeup[0]], [], [], None if block else 0,
+            )[0]
+            if self.wakeup[0] in ready:
+                try:
+                    os.read(self.wakeup[0], 512)
+                except BlockingIOError:
+                    pass
+
+            if rfd in ready:
+                try:
+                    token = os.read(rfd, 1)
+                except BlockingIOError:
+                    # Another process took it first
+                    token = None
+                if token:
+                    return token
+
+            if not block:
+                return False
+
+    def release(self):
+        with self.lock:
+            self.local.held = self.held() - 1
+
+            if self.fds is None:
+                self.running -= 1
+                self.condition.notify()
+                return
+
+            if self.tokens:
+                os.write(self.fds[1], self.tokens.pop())
+                return
+
+            self.implicit_free = True
+            # Wake up threads waiting for a token
+            try:
+                os.write(self.wakeup[1], b'\0')
+            except BlockingIOError:
+                pass
+
+    @contextlib.contextmanager
+    def slot(self):
+        """
+        Hold a slot for the duration of the block. Threads already holding
+        one run without a slot if none is free, rather than risking a
+        deadlock.
+        """
+
+        acquired = self.acquire(block=not self.held())
+        try:
+            yield
+        finally:
+            if acquired:
+                self.release()
+
+    def return_tokens(self):
+        with self.lock:
+            while self.tokens:
+                os.write(self.fds[1], self.tokens.pop())
+
+
+def open_jobserver(auth):
+    """
+    Return the file descriptors to read tokens from and write them back to
+    from the value of make's ``--jobserver-auth`` option.
+    """
+
+    if auth.startswith('fifo:'):
+        path = auth[len('fifo:'):]
+        return (
+            os.open(path, os.O_RDONLY | os.O_NONBLOCK),
+            os.open(path, os.O_WRONLY),
+        )
+
+    rfd, wfd = (int(x) for x in auth.split(','))
+    for fd in (rfd, wfd):
+        if not stat.S_ISFIFO(os.fstat(fd).st_mode):
+            raise ValueError("file descriptor {} is not a pipe".format(fd))
+
+    # Read from a separate, non-blocking, open file description so that
+    # another process taking a token first cannot block us. The flag must
+    # not be set on the one shared with make.
+    try:
+        rfd = os.open('/proc/self/fd/{}'.format(rfd), os.O_RDONLY | os.O_NONBLOCK)
+    except OSError:
+        pass
+
+    return rfd, wfd
+
+
+def check_call(*args, **kwargs):
+    with JobServer().slot():
+        return subprocess.check_call(*args, **kwargs)
+
+def check_output(*args, **kwargs):
+    with JobServer().slot():
+        return subprocess.check_output(*args, **kwargs)
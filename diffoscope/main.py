@@ -28,17 +28,19 @@ import traceback
 
 from . import VERSION
 from .tools import tool_required, OS_NAMES, get_current_os
+from .cache import CacheManager
 from .config import Config
 from .locale import set_locale
 from .logging import setup_logging
 from .progress import ProgressManager, Progress
 from .profiling import ProfileManager, profile
 from .tempfiles import clean_all_temp_files
+from .savediff import load_diff
 from .difference import Difference
 from .comparators import ComparatorManager
 from .external_tools import EXTERNAL_TOOLS
 from .presenters.html import JQUERY_SYSTEM_LOCATIONS
-from .presenters.formats import output_all
+from .presenters.formats import output_all, can_stream
 from .comparators.utils.compare import compare_root_paths
 
 logger = logging.getLogger(__name__)
@@ -59,8 +61,10 @@ def create_parser():
     parser = argparse.ArgumentParser(
         description='Calculate differences between two files or directories',
         add_help=False)
-    parser.add_argument('path1', help='First file or directory to compare')
-    parser.add_argument('path2', help='Second file or directory to compare')
+    parser.add_argument('path1', nargs='?',
+                        help='First file or directory to compare')
+    parser.add_argument('path2', nargs='?',
+                        help='Second file or directory to compare')
     parser.add_argument('--debug', dest='debug', action='store_true',
                         default=False, help='Display debug messages')
     parser.add_argument('--debugger', action='store_true',
@@ -87,6 +91,11 @@ def create_parser():
                         help='Write HTML report to given file (use - for stdout)')
     group1.add_argument('--html-dir', metavar='OUTPUT_DIR', dest='html_output_directory',
                         help='Write multi-file HTML report to given directory')
+    group1.add_argument('--html-dir-chunks', action='store_true',
+                        help='In --html-dir output, write all diffs as chunks '
+                        'of data shown by a viewer that only renders the rows '
+                        'scrolled to, so that reports of any size open '
+                        'quickly. Does not require jQuery.')
     group1.add_argument('--css', metavar='URL', dest='css_url',
                         help='Link to an extra CSS for the HTML report')
     group1.add_argument('--jquery', metavar='URL', dest='jquery_url',
@@ -96,11 +105,22 @@ def create_parser():
                         'installation. Known locations: %s' % ', '.join(JQUERY_SYSTEM_LOCATIONS))
     group1.add_argument('--json', metavar='OUTPUT_FILE', dest='json_output',
                         help='Write JSON text output to given file (use - for stdout)')
+    group1.add_argument('--ndjson', metavar='OUTPUT_FILE', dest='ndjson_output',
+                        help='Write newline-delimited JSON output to given '
+                        'file (use - for stdout), one record per difference '
+                        'as soon as it is found, referring to its parent by id')
     group1.add_argument('--markdown', metavar='OUTPUT_FILE', dest='markdown_output',
                         help='Write Markdown text output to given file (use - for stdout)')
     group1.add_argument('--restructured-text', metavar='OUTPUT_FILE',
                         dest='restructuredtext_output',
                         help='Write RsT text output to given file (use - for stdout)')
+    group1.add_argument('--save-diff', metavar='OUTPUT_FILE', dest='save_diff',
+                        help='Save the differences to given file, to output '
+                        'reports from it later with --load-diff')
+    group1.add_argument('--load-diff', metavar='INPUT_FILE', dest='load_diff',
+                        help='Output reports of the differences saved with '
+                        '--save-diff to given file, instead of comparing '
+                        'path1 and path2')
     group1.add_argument('--profile', metavar='OUTPUT_FILE', dest='profile_output',
                         help='Write profiling info to given file (use - for stdout)')
 
@@ -168,11 +188,47 @@ def create_parser():
                         400, 20)
     group3.add_argument('--max-diff-input-lines', dest='max_diff_input_lines',
                         metavar='LINES', type=int,
-                        help='Maximum number of lines fed to diff(1) '
-                        '(0 to disable, default: %d)' %
+                        help='Maximum number of lines fed to diff(1). Larger '
+                        'inputs are compared with a less precise but faster '
+                        'algorithm if NumPy is available, and truncated '
+                        'otherwise (0 to disable, default: %d)' %
                         Config().max_diff_input_lines,
                         default=None).completer=RangeCompleter(0,
                         Config().max_diff_input_lines, 5000)
+    group3.add_argument('--max-diff-memory', dest='max_diff_memory',
+                        metavar='BYTES', type=int,
+                        help='Maximum size of the diffs kept in memory until '
+                        'the report is written. Larger diffs are then '
+                        'compressed to temporary files. (0 to disable, '
+                        'default: %d)' % Config().max_diff_memory,
+                        default=None)
+    group3.add_argument('--jobs', '-j', dest='jobs', metavar='N', type=int,
+                        help='Compare up to N container members in parallel. '
+                        'The report is identical to the one of a serial run. '
+                        '(default: %(default)s)',
+                        default=Config().jobs).completer=RangeCompleter(1,
+                        os.cpu_count() or 1, 1)
+
+    group3.add_argument('--lazy-extraction', dest='lazy_extraction',
+                        action='store_true', default=Config().lazy_extraction,
+                        help='Only extract archive members once they are '
+                        'needed, skipping those whose contents are identical. '
+                        'Saves disk space and I/O at the cost of reading '
+                        'archives twice.')
+    group3.add_argument('--cache-dir', dest='cache_dir', metavar='DIR',
+                        help='Store comparison results in DIR and reuse them '
+                        'when comparing files with identical contents again. '
+                        'As loading them can run arbitrary code, DIR must '
+                        'not be writable by other users')
+    group3.add_argument('--no-cache', dest='no_cache', action='store_true',
+                        help='Do not use the comparison cache, even if '
+                        '--cache-dir is specified')
+    group3.add_argument('--max-cache-size', dest='max_cache_size',
+                        metavar='BYTES', type=int,
+                        help='Maximum size of the comparison cache. Least '
+                        'recently used results are evicted first. (0 to '
+                        'disable, default: %d)' % Config().max_cache_size,
+                        default=None)
 
     group4 = parser.add_argument_group('information commands')
     group4.add_argument('--help', '-h', action='help',
@@ -249,23 +305,49 @@ def run_diffoscope(parsed_args):
     maybe_set_limit(Config(), parsed_args, "max_diff_block_lines_parent")
     maybe_set_limit(Config(), parsed_args, "max_diff_block_lines")
     maybe_set_limit(Config(), parsed_args, "max_diff_input_lines")
+    if parsed_args.max_diff_memory is not None:
+        Config().max_diff_memory = parsed_args.max_diff_memory or float("inf")
     Config().fuzzy_threshold = parsed_args.fuzzy_threshold
+    Config().jobs = max(1, parsed_args.jobs)
+    Config().lazy_extraction = parsed_args.lazy_extraction
     Config().new_file = parsed_args.new_file
     Config().excludes = parsed_args.excludes
     set_locale()
+    try:
+        CacheManager().setup(parsed_args)
+    except (OSError, ValueError) as e:
+        logger.critical("Unable to use the cache: %s", e)
+        return 2
     logger.debug('Starting comparison')
     ProgressManager().setup(parsed_args)
+    # Unless the report can be output as the comparison goes, finish it
+    # first; see Difference.iter_details
+    stream = can_stream(parsed_args)
+    if parsed_args.load_diff is not None:
+        try:
+            difference = load_diff(parsed_args.load_diff)
+        except (OSError, ValueError) as e:
+            logger.critical("Unable to load differences: %s", e)
+            return 2
+        # Name the saved differences in the progress and --output-empty
+        parsed_args.path1 = parsed_args.path2 = parsed_args.load_diff
     with Progress(1, parsed_args.path1):
         with profile('main', 'outputs'):
-            difference = compare_root_paths(
-                parsed_args.path1, parsed_args.path2)
-    ProgressManager().finish()
+            if parsed_args.load_diff is None:
+                difference = compare_root_paths(
+                    parsed_args.path1, parsed_args.path2)
+            if difference is not None and not stream:
+                difference.compute_details()
+    if not stream:
+        ProgressManager().finish()
     # Generate an empty, dummy diff to write, saving the exit code first.
     has_differences = bool(difference is not None)
     if difference is None and parsed_args.output_empty:
         difference = Difference(None, parsed_args.path1, parsed_args.path2)
     with profile('main', 'outputs'):
         output_all(difference, parsed_args, has_differences)
+    if stream:
+        ProgressManager().finish()
     return 1 if has_differences else 0
 
 
@@ -282,6 +364,11 @@ def main(args=None):
         with profile('main', 'parse_args'):
             parser = create_parser()
             parsed_args = parser.parse_args(args)
+            if parsed_args.load_diff is not None:
+                if parsed_args.path1 is not None:
+                    parser.error('path1 and path2 cannot be used with --load-diff')
+            elif parsed_args.path2 is None:
+                parser.error('the following arguments are required: path1, path2')
         sys.exit(run_diffoscope(parsed_args))
     except KeyboardInterrupt:
         logger.info('Keyboard Interrupt')
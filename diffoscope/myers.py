@@ -0,0 +1,620 @@
+# -*- coding: utf-8 -*-
+#
+# diffoscope: in-depth comparison of files, archives, and directories
+#
+# Copyright © 2026 agent <agent@local>
+#
+# diffoscope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# diffoscope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+In-process line diff producing the same hunks as ``diff -aU<context>``.
+
+This follows the implementation of GNU diffutils (analyze.c, io.c and
+context.c) step by step, including the heuristics that decide which of the
+many possible minimal edit scripts is chosen: trimming of the identical
+prefix and suffix, discarding of "confusing" lines, Myers' O(ND) algorithm
+with linear space refinement and the sliding of changed regions in
+shift_boundaries.
+"""
+
+NO_NEWLINE = b'\\ No newline at end of file\n'
+
+
+class TooExpensive(Exception):
+    """
+    Raised when the comparison exceeds the given budget; callers are
+    expected to fall back to diff(1).
+    """
+
+
+class Context(object):
+    def __init__(self, xvec, yvec, budget):
+        self.xvec = xvec
+        self.yvec = yvec
+        self.budget = budget
+
+        diags = len(xvec) + len(yvec) + 3
+        # Diagonals range from -(len(yvec) + 1) to len(xvec) + 1
+        self.offset = len(yvec) + 1
+        self.fdiag = [0] * diags
+        self.bdiag = [0] * diags
+
+        too_expensive = 1
+        while diags:
+            diags >>= 2
+            too_expensive <<= 1
+        self.too_expensive = max(4096, too_expensive)
+
+    def spend(self, cost):
+        if self.budget is not None:
+            self.budget -= cost
+            if self.budget < 0:
+                raise TooExpensive()
+
+
+def unified_diff(lines1, lines2, context=7, budget=None):
+    """
+    Yield the lines (as bytes) of the hunks of the unified diff between two
+    lists of lines, as ``diff -aU<context>`` would output them after its
+    ``---``/``+++`` headers. Lines must include their trailing newline, if
+    any.
+
+    If ``budget`` is not None, TooExpensive is raised once roughly that many
+    steps of the algorithm have been taken.
+    """
+
+    changes = compute_changes(lines1, lines2, context, budget)
+
+    for hunk in group_hunks(changes, context):
+        yield from format_hunk(hunk, lines1, lines2, context)
+
+
+def compute_changes(lines1, lines2, horizon, budget=None):
+    """
+    Return the list of ``(line1, line2, deleted, inserted)`` changes needed
+    to turn lines1 into lines2.
+    """
+
+    len1, len2 = len(lines1), len(lines2)
+
+    # Like diff(1), only consider the lines between the identical prefix and
+    # suffix, keeping horizon lines of each.
+    common = 0
+    while common < min(len1, len2) and lines1[common] == lines2[common]:
+        common += 1
+    if common == len1 == len2:
+        return []
+    prefix = max(0, common - horizon)
+
+    common = 0
+    while common < min(len1, len2) - prefix and \
+            lines1[len1 - common - 1] == lines2[len2 - common - 1]:
+        common += 1
+    suffix = max(0, common - horizon)
+
+    # Equivalence classes of lines; 0 is reserved.
+    classes = {}
+    equivs = []
+    for lines, length in ((lines1, len1), (lines2, len2)):
+        equivs.append([
+            classes.setdefault(x, len(classes) + 1)
+            for x in lines[prefix:length - suffix]
+        ])
+
+    # changed[i + 1] is set when line i is changed; the first and last
+    # elements are sentinels.
+    changed = [bytearray(len(x) + 2) for x in equivs]
+
+    undiscarded, realindexes = discard_confusing_lines(equivs, changed)
+
+    ctxt = Context(undiscarded[0], undiscarded[1], budget)
+
+    def note_delete(x):
+        changed[0][realindexes[0][x] + 1] = 1
+
+    def note_insert(y):
+        changed[1][realindexes[1][y] + 1] = 1
+
+    compareseq(
+        0, len(undiscarded[0]), 0, len(undiscarded[1]), False,
+        ctxt, note_delete, note_insert,
+    )
+
+    shift_boundaries(equivs, changed)
+
+    return [
+        (line1 + prefix, line2 + prefix, deleted, inserted)
+        for line1, line2, deleted, inserted in build_script(equivs, changed)
+    ]
+
+
+def discard_confusing_lines(equivs, changed):
+    """
+    Discard lines that have no match in the other file, and lines that have
+    many matches when they are amongst such lines. Returns the equivalence
+    classes of the remaining lines and their original indices.
+    """
+
+    counts = []
+    for x in equivs:
+        count = {}
+        for equiv in x:
+            count[equiv] = count.get(equiv, 0) + 1
+        counts.append(count)
+
+    discarded = []
+
+    # Mark to be discarded each line that matches no line of the other
+    # file. If a line matches many lines, mark it as provisionally
+    # discardable.
+    for f in (0, 1):
+        end = len(equivs[f])
+        other_counts = counts[1 - f]
+        discards = bytearray(end)
+
+        # Multiply many by the approximate square root of the number of
+        # lines; that is the threshold for provisionally discardable lines.
+        many = 5
+        tem = end // 64
+        tem >>= 2
+        while tem > 0:
+            many *= 2
+            tem >>= 2
+
+        for i, equiv in enumerate(equivs[f]):
+            nmatch = other_counts.get(equiv, 0)
+            if nmatch == 0:
+                discards[i] = 1
+            elif nmatch > many:
+                discards[i] = 2
+
+        discarded.append(discards)
+
+    # Don't really discard the provisional lines except when they occur in a
+    # run of discardables, with nonprovisionals at the beginning and end.
+    for f in (0, 1):
+        end = len(equivs[f])
+        discards = discarded[f]
+
+        i = 0
+        while i < end:
+            if discards[i] == 2:
+                # Cancel provisional discards not in middle of run of
+                # discards.
+                discards[i] = 0
+            elif discards[i] != 0:
+                # Find end of this run of discardable lines. Count how many
+                # are provisionally discardable.
+                provisional = 0
+                j = i
+                while j < end:
+                    if discards[j] == 0:
+                        break
+                    if discards[j] == 2:
+                        provisional += 1
+                    j += 1
+
+                # Cancel provisional discards at end, and shrink the run.
+                while j > i and discards[j - 1] == 2:
+                    j -= 1
+                    discards[j] = 0
+                    provisional -= 1
+
+                length = j - i
+
+                if provisional * 4 > length:
+                    # If 1/4 of the lines in the run are provisional, cancel
+                    # discarding of all provisional lines in the run.
+                    while j > i:
+                        j -= 1
+                        if discards[j] == 2:
+                            discards[j] = 0
+                else:
+                    # minimum is the approximate square root of length / 4
+                    minimum = 1
+                    tem = length >> 2
+                    tem >>= 2
+                    while tem > 0:
+                        minimum <<= 1
+                        tem >>= 2
+                    minimum += 1
+
+                    # Cancel any subrun of minimum or more provisionals
+                    # within the larger run.
+                    j = 0
+                    consec = 0
+                    while j < length:
+                        if discards[i + j] != 2:
+                            consec = 0
+                        else:
+                            consec += 1
+                            if consec == minimum:
+                                # Back up to start of subrun, to cancel it
+                                # all.
+                                j -= consec
+                            elif consec > minimum:
+                                discards[i + j] = 0
+                        j += 1
+
+                    # Scan from beginning of run until we find 3 or more
+                    # nonprovisionals in a row or until the first
+                    # nonprovisional at least 8 lines in. Until that point,
+                    # cancel any provisionals.
+                    consec = 0
+                    for j in range(length):
+                        if j >= 8 and discards[i + j] == 1:
+                            break
+                        if discards[i + j] == 2:
+                            consec = 0
+                            discards[i + j] = 0
+                        elif discards[i + j] == 0:
+                            consec = 0
+                        else:
+                            consec += 1
+                        if consec == 3:
+                            break
+
+                    # i advances to the last line of the run.
+                    i += length - 1
+
+                    # Same thing, from end.
+                    consec = 0
+                    for j in range(length):
+                        if j >= 8 and discards[i - j] == 1:
+                            break
+                        if discards[i - j] == 2:
+                            consec = 0
+                            discards[i - j] = 0
+                        elif discards[i - j] == 0:
+                            consec = 0
+                        else:
+                            consec += 1
+                        if consec == 3:
+                            break
+            i += 1
+
+    # Actually discard the lines.
+    undiscarded = ([], [])
+    realindexes = ([], [])
+    for f in (0, 1):
+        for i, equiv in enumerate(equivs[f]):
+            if discarded[f][i] == 0:
+                undiscarded[f].append(equiv)
+                realindexes[f].append(i)
+            else:
+                changed[f][i + 1] = 1
+
+    return undiscarded, realindexes
+
+
+def diag(xoff, xlim, yoff, ylim, find_minimal, ctxt):
+    """
+    Find the midpoint of the shortest edit script for a specified portion of
+    the two vectors, returning ``(xmid, ymid, lo_minimal, hi_minimal)``.
+    """
+
+    xv = ctxt.xvec
+    yv = ctxt.yvec
+    offset = ctxt.offset
+    fd = ctxt.fdiag
+    bd = ctxt.bdiag
+
+    dmin = xoff - ylim
+    dmax = xlim - yoff
+    fmid = xoff - yoff
+    bmid = xlim - ylim
+    fmin = fmax = fmid
+    bmin = bmax = bmid
+    odd = (fmid - bmid) & 1
+
+    fd[fmid + offset] = xoff
+    bd[bmid + offset] = xlim
+
+    c = 1
+    while True:
+        ctxt.spend(fmax - fmin + bmax - bmin + 2)
+
+        # Extend the top-down search by an edit step in each diagonal.
+        if fmin > dmin:
+            fmin -= 1
+            fd[fmin - 1 + offset] = -1
+        else:
+            fmin += 1
+        if fmax < dmax:
+            fmax += 1
+            fd[fmax + 1 + offset] = -1
+        else:
+            fmax -= 1
+        for d in range(fmax, fmin - 1, -2):
+            tlo = fd[d - 1 + offset]
+            thi = fd[d + 1 + offset]
+            x0 = thi if tlo < thi else tlo + 1
+            x = x0
+            y = x0 - d
+            while x < xlim and y < ylim and xv[x] == yv[y]:
+                x += 1
+                y += 1
+            fd[d + offset] = x
+            if odd and bmin <= d <= bmax and bd[d + offset] <= x:
+                return x, y, True, True
+
+        # Similarly extend the bottom-up search.
+        if bmin > dmin:
+            bmin -= 1
+            bd[bmin - 1 + offset] = float('inf')
+        else:
+            bmin += 1
+        if bmax < dmax:
+            bmax += 1
+            bd[bmax + 1 + offset] = float('inf')
+        else:
+            bmax -= 1
+        for d in range(bmax, bmin - 1, -2):
+            tlo = bd[d - 1 + offset]
+            thi = bd[d + 1 + offset]
+            x0 = tlo if tlo < thi else thi - 1
+            x = x0
+            y = x0 - d
+            while xoff < x and yoff < y and xv[x - 1] == yv[y - 1]:
+                x -= 1
+                y -= 1
+            bd[d + offset] = x
+            if not odd and fmin <= d <= fmax and x <= fd[d + offset]:
+                return x, y, True, True
+
+        if not find_minimal and c >= ctxt.too_expensive:
+            # We've gone well beyond the call of duty; give up and report
+            # halfway between our best results so far.
+            fxybest = -1
+            fxbest = 0
+            for d in range(fmax, fmin - 1, -2):
+                x = min(fd[d + offset], xlim)
+                y = x - d
+                if ylim < y:
+                    x = ylim + d
+                    y = ylim
+                if fxybest < x + y:
+                    fxybest = x + y
+                    fxbest = x
+
+            bxybest = float('inf')
+            bxbest = 0
+            for d in range(bmax, bmin - 1, -2):
+                x = max(xoff, bd[d + offset])
+                y = x - d
+                if y < yoff:
+                    x = yoff + d
+                    y = yoff
+                if x + y < bxybest:
+                    bxybest = x + y
+                    bxbest = x
+
+            if (xlim + ylim) - bxybest < fxybest - (xoff + yoff):
+                return fxbest, fxybest - fxbest, True, False
+            return bxbest, bxybest - bxbest, False, True
+
+        c += 1
+
+
+def compareseq(xoff, xlim, yoff, ylim, find_minimal, ctxt, note_delete, note_insert):
+    xv = ctxt.xvec
+    yv = ctxt.yvec
+
+    # Slide down the bottom initial diagonal.
+    while xoff < xlim and yoff < ylim and xv[xoff] == yv[yoff]:
+        xoff += 1
+        yoff += 1
+
+    # Slide up the top initial diagonal.
+    while xoff < xlim and yoff < ylim and xv[xlim - 1] == yv[ylim - 1]:
+        xlim -= 1
+        ylim -= 1
+
+    if xoff == xlim:
+        for y in range(yoff, ylim):
+            note_insert(y)
+    elif yoff == ylim:
+        for x in range(xoff, xlim):
+            note_delete(x)
+    else:
+        # Find a point of correspondence in the middle of the vectors and
+        # use it to split this problem into subproblems.
+        xmid, ymid, lo_minimal, hi_minimal = \
+            diag(xoff, xlim, yoff, ylim, find_minimal, ctxt)
+
+        compareseq(xoff, xmid, yoff, ymid, lo_minimal, ctxt, note_delete, note_insert)
+        compareseq(xmid, xlim, ymid, ylim, hi_minimal, ctxt, note_delete, note_insert)
+
+
+def shift_boundaries(equivs, changed):
+    """
+    Adjust inserts/deletes of identical lines to join changes as much as
+    possible, and to move them to a corresponding run of changes in the
+    other file otherwise.
+
+    ``changed`` are offset by one to accommodate their sentinels.
+    """
+
+    for f in (0, 1):
+        ch = changed[f]
+        other = changed[1 - f]
+        eq = equivs[f]
+        i_end = len(eq)
+        i = 0
+        j = 0
+
+        while True:
+            # Scan forwards to find beginning of another run of changes.
+            # Also keep track of the corresponding point in the other file.
+            while i < i_end and not ch[i + 1]:
+                while other[j + 1]:
+                    j += 1
+                j += 1
+                i += 1
+
+            if i == i_end:
+                break
+
+            start = i
+
+            # Find the end of this run of changes.
+            i += 1
+            while ch[i + 1]:
+                i += 1
+            while other[j + 1]:
+                j += 1
+
+            while True:
+                # Record the length of this run of changes, so that we can
+                # later determine whether the run has grown.
+                runlength = i - start
+
+                # Move the changed region back, so long as the previous
+                # unchanged line matches the last changed one. This merges
+                # with previous changed regions.
+                while start and eq[start - 1] == eq[i - 1]:
+                    start -= 1
+                    ch[start + 1] = 1
+                    i -= 1
+                    ch[i + 1] = 0
+                    while ch[start]:
+                        start -= 1
+                    j -= 1
+                    while other[j + 1]:
+                        j -= 1
+
+                # Set corresponding to the end of the changed run, at the
+                # last point where it corresponds to a changed run in the
+                # other file. corresponding == i_end means no such point has
+                # been found.
+                corresponding = i if other[j] else i_end
+
+                # Move the changed region forward, so long as the first
+                # changed line matches the following unchanged one. This
+                # merges with following changed regions.
+                while i != i_end and eq[start] == eq[i]:
+                    ch[start + 1] = 0
+                    start += 1
+                    ch[i + 1] = 1
+                    i += 1
+                    while ch[i + 1]:
+                        i += 1
+                    j += 1
+                    while other[j + 1]:
+                        corresponding = i
+                        j += 1
+
+                if runlength == i - start:
+                    break
+
+            # If possible, move the fully-merged run of changes back to a
+            # corresponding run in the other file.
+            while corresponding < i:
+                start -= 1
+                ch[start + 1] = 1
+                i -= 1
+                ch[i + 1] = 0
+                j -= 1
+                while other[j + 1]:
+                    j -= 1
+
+
+def build_script(equivs, changed):
+    changed0, changed1 = changed
+    i0 = len(equivs[0])
+    i1 = len(equivs[1])
+    script = []
+
+    while i0 >= 0 or i1 >= 0:
+        if changed0[i0] or changed1[i1]:
+            line0, line1 = i0, i1
+
+            # Find # lines changed here in each file.
+            while changed0[i0]:
+                i0 -= 1
+            while changed1[i1]:
+                i1 -= 1
+
+            script.append((i0, i1, line0 - i0, line1 - i1))
+
+        # We have reached lines in the two files that match each other.
+        i0 -= 1
+        i1 -= 1
+
+    script.reverse()
+
+    return script
+
+
+def group_hunks(changes, context):
+    """
+    Group changes that are separated by at most ``2 * context`` lines.
+    """
+
+    hunk = []
+    for change in changes:
+        if hunk:
+            line1, _, deleted, _ = hunk[-1]
+            if change[0] - (line1 + deleted) > 2 * context:
+                yield hunk
+                hunk = []
+        hunk.append(change)
+
+    if hunk:
+        yield hunk
+
+
+def format_hunk(hunk, lines1, lines2, context):
+    first1 = max(hunk[0][0] - context, 0)
+    first2 = max(hunk[0][1] - context, 0)
+    last1 = min(hunk[-1][0] + hunk[-1][2] - 1 + context, len(lines1) - 1)
+    last2 = min(hunk[-1][1] + hunk[-1][3] - 1 + context, len(lines2) - 1)
+
+    yield '@@ -{} +{} @@\n'.format(
+        format_range(first1, last1),
+        format_range(first2, last2),
+    ).encode('ascii')
+
+    def output(prefix, line):
+        if line.endswith(b'\n'):
+            return prefix + line
+        return prefix + line + b'\n' + NO_NEWLINE
+
+    i, j = first1, first2
+    for line1, line2, deleted, inserted in hunk:
+        while i < line1:
+            yield output(b' ', lines1[i])
+            i += 1
+            j += 1
+        for _ in range(deleted):
+            yield output(b'-', lines1[i])
+            i += 1
+        for _ in range(inserted):
+            yield output(b'+', lines2[j])
+            j += 1
+
+    while i <= last1:
+        yield output(b' ', lines1[i])
+        i += 1
+
+
+def format_range(first, last):
+    # 1-based; an empty range is shown as the line before it.
+    start, end = first + 1, last + 1
+
+    if end < start:
+        return '{},0'.format(end)
+    if end == start:
+        return '{}'.format(end)
+    return '{},{}'.format(start, end - start + 1)
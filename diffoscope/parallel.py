@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+#
+# diffoscope: in-depth comparison of files, archives, and directories
+#
+# Copyright © 2026 agent <agent@local>
+#
+# diffoscope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# diffoscope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
+
+import logging
+import threading
+import itertools
+import collections
+
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class ParallelManager(object):
+    """
+    Keeps track of how many worker threads are currently running so that the
+    total never exceeds ``Config().jobs``, however deeply nested the
+    containers being compared are.
+    """
+
+    _singleton = {}
+
+    def __init__(self):
+        self.__dict__ = self._singleton
+
+        if not self._singleton:
+            self.reset()
+
+    def reset(self):
+        self.lock = threading.Lock()
+        self.running = 0
+
+    def try_acquire(self):
+        with self.lock:
+            # The calling thread is always doing work itself, so it counts
+            # as one of the jobs.
+            if self.running + 1 >= Config().jobs:
+                return False
+            self.running += 1
+            return True
+
+    def release(self):
+        with self.lock:
+            self.running -= 1
+
+
+class Job(object):
+    def __init__(self, function, args):
+        self.function = function
+        self.args = args
+        self.thread = None
+        self._result = None
+        self._exception = None
+
+    def run(self):
+        try:
+            self._result = self.function(*self.args)
+        except BaseException as e:
+            # Includes KeyboardInterrupt so that it is re-raised in the main
+            # thread when collecting the result.
+            self._exception = e
+        finally:
+            # Don't keep members alive for longer than necessary
+            self.function = self.args = None
+
+    def start(self):
+        def target():
+            try:
+                self.run()
+            finally:
+                ParallelManager().release()
+
+        self.thread = threading.Thread(target=target, daemon=True)
+        self.thread.start()
+
+    def wait(self):
+        if self.thread is not None:
+            self.thread.join()
+
+    def done(self):
+        return self.thread is None or not self.thread.is_alive()
+
+    def result(self):
+        self.wait()
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+
+def parallel_starmap(function, iterable):
+    """
+    Like ``itertools.starmap`` but runs each call in a worker thread whilst
+    there are free job slots (see ``--jobs``), falling back to running it in
+    the calling thread otherwise. As the caller always makes progress itself,
+    nested calls cannot deadlock waiting for a slot.
+
+    Results are yielded in the order of ``iterable`` so that the output is
+    identical to a serial run.
+    """
+
+    if Config().jobs <= 1:
+        return itertools.starmap(function, iterable)
+
+    return _parallel_starmap(function, iterable)
+
+
+def _parallel_starmap(function, iterable):
+    jobs = collections.deque()
+
+    try:
+        for args in iterable:
+            job = Job(function, args)
+            if ParallelManager().try_acquire():
+                logger.debug("Running %s%r in a worker thread", function.__name__, args)
+                job.start()
+                jobs.append(job)
+                continue
+            job.run()
+            jobs.append(job)
+            # Yield the results that are ready rather than keeping them until
+            # all jobs have been run, so they can be output and released as
+            # early as possible.
+            while jobs and jobs[0].done():
+                yield jobs.popleft().result()
+
+        while jobs:
+            yield jobs.popleft().result()
+    finally:
+        # Never leave threads running behind our back, eg. if a job raised
+        # an exception or our consumer went away.
+        for job in jobs:
+            job.wait()
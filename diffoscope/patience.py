@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+#
+# diffoscope: in-depth comparison of files, archives, and directories
+#
+# Copyright © 2026 agent <agent@local>
+#
+# diffoscope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# diffoscope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Line diff for inputs too large for diff(1).
+
+Each line is interned as its 64-bit hash and the resulting arrays are
+compared with the patience algorithm: lines that are unique in both inputs are
+matched up by a longest increasing subsequence, and the regions in between
+are compared recursively. Regions without any such lines are compared with
+diffoscope.myers if they are small enough, and reported as changed as a
+whole otherwise. Only the hashes and offsets of the lines are kept in
+memory; their contents are read back from the files for the output.
+
+Unlike diffoscope.myers, the output is not identical to diff(1) as the
+edit script is not necessarily minimal. Lines whose hashes collide are
+considered identical, which is unlikely enough not to matter here.
+"""
+
+import mmap
+import bisect
+import logging
+
+from .myers import compute_changes, group_hunks, format_hunk, TooExpensive
+
+try:
+    import numpy
+except ImportError:  # noqa
+    numpy = None
+
+logger = logging.getLogger(__name__)
+
+# Regions without lines unique to both sides are passed to diffoscope.myers
+# below this many lines, and with this budget.
+MYERS_MAX_LINES = 4096
+MYERS_BUDGET = 100000
+
+# Files are split into lines this many bytes at a time.
+READ_SIZE = 2 ** 24 # 16 MiB
+
+
+class Lines(object):
+    """
+    Sequence of the lines of a file, read on demand from a memory map.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+
+        hashes = []
+        lengths = []
+        while True:
+            lines = self._file.readlines(READ_SIZE)
+            if not lines:
+                break
+            hashes.append(numpy.fromiter(map(hash, lines), numpy.int64, len(lines)))
+            lengths.append(numpy.fromiter(map(len, lines), numpy.int64, len(lines)))
+
+        self.hashes = numpy.concatenate(hashes or [numpy.empty(0, numpy.int64)])
+        self.offsets = numpy.zeros(len(self.hashes) + 1, numpy.int64)
+        if lengths:
+            numpy.cumsum(numpy.concatenate(lengths), out=self.offsets[1:])
+
+        self._mmap = None
+        if self.offsets[-1]:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def __getitem__(self, idx):
+        return self._mmap[self.offsets[idx]:self.offsets[idx + 1]]
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+        self._file.close()
+
+
+def unified_diff(path1, path2, context=7):
+    """
+    Yield the lines (as bytes) of the hunks of a unified diff between two
+    files, in the format of diffoscope.myers.unified_diff.
+    """
+
+    lines1 = Lines(path1)
+    lines2 = Lines(path2)
+
+    try:
+        changes = merge_adjacent(sorted(compute_patience_changes(
+            lines1.hashes,
+            lines2.hashes,
+        )))
+
+        for hunk in group_hunks(changes, context):
+            yield from format_hunk(hunk, lines1, lines2, context)
+    finally:
+        lines1.close()
+        lines2.close()
+
+
+def compute_patience_changes(a, b):
+    """
+    Yield ``(line1, line2, deleted, inserted)`` changes turning a into b, in
+    no particular order.
+    """
+
+    regions = [(0, len(a), 0, len(b))]
+
+    while regions:
+        a0, a1, b0, b1 = regions.pop()
+
+        # Trim the identical prefix and suffix.
+        length = min(a1 - a0, b1 - b0)
+        different = numpy.flatnonzero(a[a0:a0 + length] != b[b0:b0 + length])
+        common = different[0] if len(different) else length
+        a0 += common
+        b0 += common
+
+        length = min(a1 - a0, b1 - b0)
+        different = numpy.flatnonzero(
+            a[a1 - length:a1][::-1] != b[b1 - length:b1][::-1],
+        )
+        common = different[0] if len(different) else length
+        a1 -= common
+        b1 -= common
+
+        if a0 == a1 or b0 == b1:
+            if a0 != a1 or b0 != b1:
+                yield a0, b0, a1 - a0, b1 - b0
+            continue
+
+        xs, ys = unique_anchors(a[a0:a1], b[b0:b1])
+        if not len(xs):
+            yield from compare_region(a, b, a0, a1, b0, b1)
+            continue
+
+        # Compare the regions between the anchors, which match, skipping
+        # those that are empty on both sides.
+        xs = numpy.concatenate(([-1], xs, [a1 - a0])) + a0
+        ys = numpy.concatenate(([-1], ys, [b1 - b0])) + b0
+        gaps = (numpy.diff(xs) > 1) | (numpy.diff(ys) > 1)
+        regions.extend(zip(
+            (xs[:-1][gaps] + 1).tolist(),
+            xs[1:][gaps].tolist(),
+            (ys[:-1][gaps] + 1).tolist(),
+            ys[1:][gaps].tolist(),
+        ))
+
+
+def unique_anchors(a, b):
+    """
+    Return the positions in a and b of the longest sequence of lines that
+    are unique in both and appear in the same order in both.
+    """
+
+    def unique(x):
+        values, indices, counts = numpy.unique(
+            x,
+            return_index=True,
+            return_counts=True,
+        )
+        return values[counts == 1], indices[counts == 1]
+
+    values1, indices1 = unique(a)
+    values2, indices2 = unique(b)
+
+    _, x1, x2 = numpy.intersect1d(
+        values1,
+        values2,
+        assume_unique=True,
+        return_indices=True,
+    )
+    xs = indices1[x1]
+    ys = indices2[x2]
+
+    order = numpy.argsort(xs)
+    xs = xs[order]
+    ys = ys[order]
+
+    # Unique lines are usually all in the same order.
+    if numpy.all(ys[1:] > ys[:-1]):
+        return xs, ys
+
+    # Longest increasing subsequence of ys by patience sorting
+    tails = []
+    tail_indices = []
+    previous = [None] * len(ys)
+
+    for idx, y in enumerate(ys.tolist()):
+        pos = bisect.bisect_left(tails, y)
+        if pos:
+            previous[idx] = tail_indices[pos - 1]
+        if pos == len(tails):
+            tails.append(y)
+            tail_indices.append(idx)
+        else:
+            tails[pos] = y
+            tail_indices[pos] = idx
+
+    result = []
+    idx = tail_indices[-1]
+    while idx is not None:
+        result.append(idx)
+        idx = previous[idx]
+    result.reverse()
+
+    return xs[result], ys[result]
+
+
+def compare_region(a, b, a0, a1, b0, b1):
+    if a1 - a0 <= MYERS_MAX_LINES and b1 - b0 <= MYERS_MAX_LINES:
+        try:
+            for line1, line2, deleted, inserted in compute_changes(
+                a[a0:a1].tolist(),
+                b[b0:b1].tolist(),
+                0,
+                MYERS_BUDGET,
+            ):
+                yield a0 + line1, b0 + line2, deleted, inserted
+            return
+        except TooExpensive:
+            pass
+
+    logger.debug(
+        "Reporting lines %d-%d and %d-%d as changed",
+        a0, a1, b0, b1,
+    )
+
+    yield a0, b0, a1 - a0, b1 - b0
+
+
+def merge_adjacent(changes):
+    """
+    Merge changes that are not separated by any unchanged line, as they are
+    output as one block of deletions followed by one block of insertions.
+    """
+
+    result = []
+
+    for change in changes:
+        if result:
+            line1, line2, deleted, inserted = result[-1]
+            if change[0] == line1 + deleted and change[1] == line2 + inserted:
+                result[-1] = (line1, line2, deleted + change[2], inserted + change[3])
+                continue
+        result.append(change)
+
+    return result
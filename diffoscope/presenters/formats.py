@@ -19,13 +19,16 @@
 
 import sys
 import logging
+import contextlib
 
+from ..savediff import DiffFileWriter
 from ..profiling import profile
+from ..progress import ProgressManager, ProgressBar
 
 from .text import TextPresenter
-from .json import JSONPresenter
-from .html import output_html, output_html_directory
-from .utils import make_printer
+from .json import JSONPresenter, NDJSONPresenter
+from .html import HTMLPresenter, html_directory_presenter
+from .utils import make_printer, present
 from .markdown import MarkdownTextPresenter
 from .restructuredtext import RestructuredTextPresenter
 
@@ -53,6 +56,10 @@ def output_all(difference, parsed_args, has_differences):
             'klass': JSONPresenter,
             'target': parsed_args.json_output,
         },
+        'ndjson': {
+            'klass': NDJSONPresenter,
+            'target': parsed_args.ndjson_output,
+        },
         'markdown': {
             'klass': MarkdownTextPresenter,
             'target': parsed_args.markdown_output,
@@ -65,60 +72,130 @@ def output_all(difference, parsed_args, has_differences):
             'fn': html_directory,
             'target': parsed_args.html_output_directory,
         },
+        'save_diff': {
+            'fn': save_diff,
+            'target': parsed_args.save_diff,
+        },
     }
 
     # If no output specified, default to printing --text output to stdout
     if not any(x['target'] for x in FORMATS.values()):
         parsed_args.text_output = FORMATS['text']['target'] = '-'
 
+    # The differences are visited once for all formats, except that those
+    # printed to stdout are output one after the other.
+    passes = [[]]
     for name, data in FORMATS.items():
         if data['target'] is None:
             continue
 
-        logger.debug("Generating %r output at %r", name, data['target'])
+        if data['target'] == '-' and any(x[1]['target'] == '-' for x in passes[-1]):
+            passes.append([])
+        passes[-1].append((name, data))
+
+    for formats in passes:
+        with contextlib.ExitStack() as stack:
+            presenters = []
+            for name, data in formats:
+                logger.debug("Generating %r output at %r", name, data['target'])
+
+                if 'fn' in data:
+                    presenter = data['fn'](stack, parsed_args, has_differences)
+                else:
+                    presenter = data['klass'](
+                        stack.enter_context(make_printer(data['target'])),
+                    )
+
+                if presenter is not None:
+                    presenters.append(presenter)
+
+            with profile('output', ', '.join(x for x, _ in formats)):
+                try:
+                    present(difference, presenters)
+                except UnicodeEncodeError:
+                    logger.critical("Console is unable to print Unicode characters. "
+                        "Set e.g. PYTHONIOENCODING=utf-8")
+                    sys.exit(2)
+
+def can_stream(parsed_args):
+    """
+    Whether the report can be output while the comparison is still running:
+    when it is written in a single format whose presenter visits each
+    difference once, and not to a terminal that also shows the progress bar.
+    """
+
+    targets = {
+        'text': parsed_args.text_output,
+        'html': parsed_args.html_output,
+        'json': parsed_args.json_output,
+        'ndjson': parsed_args.ndjson_output,
+        'markdown': parsed_args.markdown_output,
+        'restructuredtext': parsed_args.restructuredtext_output,
+        'html_directory': parsed_args.html_output_directory,
+        'save_diff': parsed_args.save_diff,
+    }
+    targets = {k: v for k, v in targets.items() if v}
 
-        with profile('output', name):
-            if 'fn' in data:
-                data['fn'](difference, parsed_args, has_differences)
-                continue
+    # See output_all
+    if not targets:
+        targets = {'text': '-'}
 
-            with make_printer(data['target']) as fn:
-                data['klass'](fn).start(difference)
+    if len(targets) != 1:
+        return False
 
-def text(difference, parsed_args, has_differences):
+    (name, target), = targets.items()
+
+    if name not in ('text', 'json', 'ndjson', 'save_diff'):
+        return False
+
+    if target == '-' and any(
+        isinstance(x, ProgressBar) for x in ProgressManager().observers
+    ):
+        return False
+
+    return True
+
+def text(stack, parsed_args, has_differences):
     # As a special case, write an empty file instead of an empty diff.
     if not has_differences:
         open(parsed_args.text_output, 'w').close()
-        return
+        return None
 
-    with make_printer(parsed_args.text_output or '-') as fn:
-        color = {
-            'auto': fn.output.isatty(),
-            'never': False,
-            'always': True,
-        }[parsed_args.text_color]
-
-        presenter = TextPresenter(fn, color)
-
-        try:
-            presenter.start(difference)
-        except UnicodeEncodeError:
-            logger.critical("Console is unable to print Unicode characters. "
-                "Set e.g. PYTHONIOENCODING=utf-8")
-            sys.exit(2)
-
-def html(difference, parsed_args, has_differences):
-    with make_printer(parsed_args.html_output) as fn:
-        output_html(
-            difference,
-            css_url=parsed_args.css_url,
-            print_func=fn,
-        )
-
-def html_directory(difference, parsed_args, has_differences):
-    output_html_directory(
+    fn = stack.enter_context(make_printer(parsed_args.text_output or '-'))
+
+    color = {
+        'auto': fn.output.isatty(),
+        'never': False,
+        'always': True,
+    }[parsed_args.text_color]
+
+    return TextPresenter(fn, color)
+
+def save_diff(stack, parsed_args, has_differences):
+    if parsed_args.save_diff == '-':
+        f = sys.stdout.buffer
+    else:
+        f = stack.enter_context(open(parsed_args.save_diff, 'wb'))
+
+    # As with --text, save no differences rather than an empty one.
+    if not has_differences:
+        writer = DiffFileWriter(f)
+        writer.open()
+        writer.close()
+        return None
+
+    return DiffFileWriter(f)
+
+def html(stack, parsed_args, has_differences):
+    return HTMLPresenter(
+        stack.enter_context(make_printer(parsed_args.html_output)),
+        css_url=parsed_args.css_url,
+    )
+
+def html_directory(stack, parsed_args, has_differences):
+    return stack.enter_context(html_directory_presenter(
         parsed_args.html_output_directory,
-        difference,
         css_url=parsed_args.css_url,
         jquery_url=parsed_args.jquery_url,
-    )
+        chunks=parsed_args.html_dir_chunks,
+    ))
@@ -17,4 +17,5 @@
 # You should have received a copy of the GNU General Public License
 # along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
 
-from .html import output_html, output_html_directory, JQUERY_SYSTEM_LOCATIONS
+from .html import HTMLPresenter, output_html, output_html_directory, \
+    html_directory_presenter, JQUERY_SYSTEM_LOCATIONS
@@ -36,16 +36,19 @@ import os
 import re
 import sys
 import html
+import json
 import codecs
 import hashlib
 import logging
 import contextlib
+import collections
 
 from diffoscope import VERSION
 from diffoscope.config import Config
+from diffoscope.parallel import Job, ParallelManager
 
 from ..icon import FAVICON_BASE64
-from ..utils import PrintLimitReached, DiffBlockLimitReached, \
+from ..utils import Presenter, PrintLimitReached, DiffBlockLimitReached, \
     create_limited_print_func
 
 from . import templates
@@ -57,6 +60,9 @@ LINESIZE = 20
 MAX_LINE_SIZE = 1024
 TABSIZE = 8
 
+# Rows in each file written by UnifiedDiffChunks
+CHUNK_ROWS = 1000
+
 # Characters we're willing to word wrap on
 WORDBREAK = " \t;.,/):-"
 
@@ -70,26 +76,9 @@ JQUERY_SYSTEM_LOCATIONS = (
 logger = logging.getLogger(__name__)
 re_anchor_prefix = re.compile(r'^[^A-Za-z]')
 re_anchor_suffix = re.compile(r'[^A-Za-z-_:\.]')
-
-buf, add_cpt, del_cpt = [], 0, 0
-line1, line2, has_internal_linenos = 0, 0, True
-hunk_off1, hunk_size1, hunk_off2, hunk_size2 = 0, 0, 0, 0
-spl_rows, spl_current_page = 0, 0
-spl_print_func, spl_print_ctrl = None, None
-
-
-def new_unified_diff():
-    global buf, add_cpt, del_cpt
-    global line1, line2, has_internal_linenos
-    global hunk_off1, hunk_size1, hunk_off2, hunk_size2
-    global spl_rows, spl_current_page
-    global spl_print_func, spl_print_ctrl
-    buf, add_cpt, del_cpt = [], 0, 0
-    line1, line2, has_internal_linenos = 0, 0, True
-    hunk_off1, hunk_size1, hunk_off2, hunk_size2 = 0, 0, 0, 0
-    spl_rows, spl_current_page = 0, 0
-    spl_print_func, spl_print_ctrl = None, None
-
+re_hunk_header = re.compile(r"@@ -(\d+),?(\d*) \+(\d+),?(\d*)")
+re_lines_removed = re.compile(r"\[ (\d+) lines removed \]$")
+re_line_break = re.compile('[\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]')
 
 def convert(s, ponct=0, tag=''):
     i = 0
@@ -129,126 +118,6 @@ def convert(s, ponct=0, tag=''):
     return t.getvalue()
 
 
-def output_hunk():
-    spl_print_func(u'<tr class="diffhunk"><td colspan="2">Offset %d, %d lines modified</td>'%(hunk_off1, hunk_size1))
-    spl_print_func(u'<td colspan="2">Offset %d, %d lines modified</td></tr>\n'%(hunk_off2, hunk_size2))
-    row_was_output()
-
-
-def output_line(s1, s2):
-    global line1, line2, has_internal_linenos
-
-    orig1 = s1
-    orig2 = s2
-
-    if s1 and len(s1) > MAX_LINE_SIZE:
-        s1 = s1[:MAX_LINE_SIZE] + u" ✂"
-    if s2 and len(s2) > MAX_LINE_SIZE:
-        s2 = s2[:MAX_LINE_SIZE] + u" ✂"
-
-    if s1 == None and s2 == None:
-        type_name = "unmodified"
-    elif s1 == "" and s2 == "":
-        type_name = "unmodified"
-    elif s1 == None or s1 == "":
-        type_name = "added"
-    elif s2 == None or s2 == "":
-        type_name = "deleted"
-    elif orig1 == orig2 and not s1.endswith('lines removed ]') and not s2.endswith('lines removed ]'):
-        type_name = "unmodified"
-    else:
-        type_name = "changed"
-        s1, s2 = linediff(s1, s2, DIFFON, DIFFOFF)
-
-    spl_print_func(u'<tr class="diff%s">' % type_name)
-    try:
-        if s1:
-            if has_internal_linenos:
-                spl_print_func(u'<td colspan="2" class="diffpresent">')
-            else:
-                spl_print_func(u'<td class="diffline">%d </td>' % line1)
-                spl_print_func(u'<td class="diffpresent">')
-            spl_print_func(convert(s1, ponct=1, tag='del'))
-            spl_print_func(u'</td>')
-        else:
-            spl_print_func(u'<td colspan="2">\xa0</td>')
-
-        if s2:
-            if has_internal_linenos:
-                spl_print_func(u'<td colspan="2" class="diffpresent">')
-            else:
-                spl_print_func(u'<td class="diffline">%d </td>' % line2)
-                spl_print_func(u'<td class="diffpresent">')
-            spl_print_func(convert(s2, ponct=1, tag='ins'))
-            spl_print_func(u'</td>')
-        else:
-            spl_print_func(u'<td colspan="2">\xa0</td>')
-    finally:
-        spl_print_func(u"</tr>\n", force=True)
-        row_was_output()
-
-    m = orig1 and re.match(r"^\[ (\d+) lines removed \]$", orig1)
-    if m:
-        line1 += int(m.group(1))
-    elif orig1:
-        line1 += 1
-    m = orig2 and re.match(r"^\[ (\d+) lines removed \]$", orig2)
-    if m:
-        line2 += int(m.group(1))
-    elif orig2:
-        line2 += 1
-
-
-def empty_buffer():
-    global buf
-    global add_cpt
-    global del_cpt
-
-    if del_cpt == 0 or add_cpt == 0:
-        for l in buf:
-            output_line(l[0], l[1])
-
-    elif del_cpt != 0 and add_cpt != 0:
-        l0, l1 = [], []
-        for l in buf:
-            if l[0] != None:
-                l0.append(l[0])
-            if l[1] != None:
-                l1.append(l[1])
-        max_len = (len(l0) > len(l1)) and len(l0) or len(l1)
-        for i in range(max_len):
-            s0, s1 = "", ""
-            if i < len(l0):
-                s0 = l0[i]
-            if i < len(l1):
-                s1 = l1[i]
-            output_line(s0, s1)
-
-    add_cpt, del_cpt = 0, 0
-    buf = []
-
-
-def spl_print_enter(print_context, rotation_params):
-    # Takes ownership of print_context
-    global spl_print_func, spl_print_ctrl
-    spl_print_ctrl = print_context.__exit__, rotation_params
-    spl_print_func = print_context.__enter__()
-    _, _, css_url = rotation_params
-    # Print file and table headers
-    output_header(css_url, spl_print_func)
-
-def spl_had_entered_child():
-    global spl_print_ctrl, spl_current_page
-    return spl_print_ctrl and spl_print_ctrl[1] and spl_current_page > 0
-
-def spl_print_exit(*exc_info):
-    global spl_print_func, spl_print_ctrl
-    if not spl_had_entered_child(): return False
-    output_footer(spl_print_func)
-    _exit, _ = spl_print_ctrl
-    spl_print_func, spl_print_ctrl = None, None
-    return _exit(*exc_info)
-
 @contextlib.contextmanager
 def spl_file_printer(directory, filename):
     with codecs.open(os.path.join(directory,filename), 'w', encoding='utf-8') as f:
@@ -259,169 +128,425 @@ def spl_file_printer(directory, filename):
         recording_print_func.bytes_written = 0
         yield recording_print_func
 
-def row_was_output():
-    global spl_print_func, spl_print_ctrl, spl_rows, spl_current_page
-    spl_rows += 1
-    _, rotation_params = spl_print_ctrl
-    max_lines = Config().max_diff_block_lines
-    max_lines_parent = Config().max_diff_block_lines_parent
-    max_lines_ratio = Config().max_diff_block_lines_html_dir_ratio
-    max_report_child_size = Config().max_report_child_size
-    if not rotation_params:
-        # html-dir single output, don't need to rotate
-        if spl_rows >= max_lines:
-            raise DiffBlockLimitReached()
-        return
-    else:
-        # html-dir output, perhaps need to rotate
-        directory, mainname, css_url = rotation_params
-        if spl_rows >= max_lines_ratio * max_lines:
-            raise DiffBlockLimitReached()
 
-        if spl_current_page == 0: # on parent page
-            if spl_rows < max_lines_parent:
-                return
-        else: # on child page
-            # TODO: make this stay below the max, instead of going 1 row over the max
-            # will require some backtracking...
-            if spl_print_func.bytes_written < max_report_child_size:
-                return
-
-    spl_current_page += 1
-    filename = "%s-%s.html" % (mainname, spl_current_page)
-
-    if spl_current_page > 1:
-        # previous page was a child, close it
-        spl_print_func(templates.UD_TABLE_FOOTER % {"filename": html.escape(filename), "text": "load diff"}, force=True)
-        spl_print_exit(None, None, None)
-
-    # rotate to the next child page
-    context = spl_file_printer(directory, filename)
-    spl_print_enter(context, rotation_params)
-    spl_print_func(templates.UD_TABLE_HEADER)
-
-
-def output_unified_diff_table(unified_diff, _has_internal_linenos):
-    global add_cpt, del_cpt
-    global line1, line2, has_internal_linenos
-    global hunk_off1, hunk_size1, hunk_off2, hunk_size2
-
-    has_internal_linenos = _has_internal_linenos
-    spl_print_func(templates.UD_TABLE_HEADER)
-    try:
-        bytes_processed = 0
-        for l in unified_diff.splitlines():
-            bytes_processed += len(l) + 1
-            m = re.match(r'^--- ([^\s]*)', l)
-            if m:
-                empty_buffer()
-                continue
-            m = re.match(r'^\+\+\+ ([^\s]*)', l)
-            if m:
-                empty_buffer()
-                continue
+class UnifiedDiffTable(object):
+    """
+    Outputs the unified diff of a difference as an HTML table.
 
-            m = re.match(r"@@ -(\d+),?(\d*) \+(\d+),?(\d*)", l)
-            if m:
-                empty_buffer()
-                hunk_data = map(lambda x:x=="" and 1 or int(x), m.groups())
-                hunk_off1, hunk_size1, hunk_off2, hunk_size2 = hunk_data
-                line1, line2 = hunk_off1, hunk_off2
-                output_hunk()
-                continue
+    With --html-dir, rows beyond the first ones are put into child pages of
+    their own. ``output`` stops once the first of them is started, returning
+    a ``Job`` to write the rest, which can run in a worker thread as tables
+    do not share any state.
+    """
 
-            if re.match(r'^\[', l):
-                empty_buffer()
-                spl_print_func(u'<td colspan="2">%s</td>\n' % l)
+    def __init__(self, print_func, css_url, directory, difference):
+        self.difference = difference
+        self.buf, self.add_cpt, self.del_cpt = [], 0, 0
+        self.line1, self.line2 = 0, 0
+        self.has_internal_linenos = difference.has_internal_linenos
+        self.hunk_off1, self.hunk_size1, self.hunk_off2, self.hunk_size2 = 0, 0, 0, 0
+        self.spl_rows, self.spl_current_page = 0, 0
+        self.spl_print_func, self.spl_print_ctrl = print_func, None
+        self.blocks = iter(())
+        self.bytes_read = 0
+        self.bytes_processed = 0
+
+        self.rotation_params = None
+        if directory:
+            h = hashlib.md5()
+            for block in difference.iter_unified_diff():
+                h.update(block.text.encode('utf-8'))
+            self.mainname = h.hexdigest()
+            self.rotation_params = directory, self.mainname, css_url
+
+        # Rows are output as this is iterated over, see output_rows
+        self.rows = self.iter_rows()
+
+    def output(self):
+        """
+        Output the table up to its first child page. Returns None if there
+        are none, or a ``Job`` writing them whose result is the end of the
+        table on the parent page.
+        """
+
+        self.spl_print_func(templates.UD_TABLE_HEADER)
 
-            if re.match(r"^\\ No newline", l):
-                if hunk_size2 == 0:
-                    buf[-1] = (buf[-1][0], buf[-1][1] + '\n' + l[2:])
-                else:
-                    buf[-1] = (buf[-1][0] + '\n' + l[2:], buf[-1][1])
+        try:
+            if self.output_rows(pause=True) is not None:
+                return None
+        except:
+            if not self.spl_print_exit(*sys.exc_info()): raise
+
+        return Job(self.output_child_pages, ())
+
+    def output_child_pages(self):
+        try:
+            truncated = not self.output_rows()
+        except:
+            if not self.spl_print_exit(*sys.exc_info()): raise
+        else:
+            self.spl_print_exit(None, None, None)
+
+        noun = "pieces" if self.spl_current_page > 1 else "piece"
+        text = "load diff (%s %s%s)" % (self.spl_current_page, noun, (", truncated" if truncated else ""))
+        return templates.UD_TABLE_FOOTER % {"filename": html.escape("%s-1.html" % self.mainname), "text": text}
+
+    def output_rows(self, pause=False):
+        """
+        Output the rows of the table, returning whether all of them were. If
+        pause is True, returns None as soon as the first child page was
+        started instead.
+        """
+
+        paused = False
+        try:
+            for _ in self.rows:
+                if pause and self.spl_current_page:
+                    paused = True
+                    return None
+            return True
+        except DiffBlockLimitReached:
+            self.spl_print_func(
+                u'<tr class="error"><td colspan="4">%s</td></tr>'
+                % self.limit_message(), force=True)
+            return False
+        except PrintLimitReached:
+            assert not self.spl_had_entered_child() # limit reached on the parent page
+            self.spl_print_func(u'<tr class="error"><td colspan="4">Max output size reached.</td></tr>', force=True)
+            raise
+        finally:
+            if not paused:
+                self.spl_print_func(u"</table>", force=True)
+
+    def limit_message(self):
+        total = self.bytes_read + sum(len(x) for x in self.blocks)
+        bytes_left = total - self.bytes_processed
+        frac = bytes_left / total
+        return u"Max diff block lines reached; %s/%s bytes (%.2f%%) of diff not shown." % (bytes_left, total, frac*100)
+
+    def iter_lines(self):
+        for block in self.blocks:
+            self.bytes_read += len(block)
+            # Split lines as str.splitlines does
+            if re_line_break.search(block.text):
+                yield from ((x[:1], x) for x in block.text.splitlines())
+            else:
+                yield from block
+
+    def iter_rows(self):
+        """
+        Output the rows of the table, yielding after each of them.
+        """
+
+        self.blocks = iter(self.difference.iter_unified_diff())
+
+        for tag, l in self.iter_lines():
+            self.bytes_processed += len(l) + 1
+
+            if tag == '@':
+                m = re_hunk_header.match(l)
+                if m:
+                    yield from self.empty_buffer()
+                    hunk_data = map(lambda x:x=="" and 1 or int(x), m.groups())
+                    self.hunk_off1, self.hunk_size1, self.hunk_off2, self.hunk_size2 = hunk_data
+                    self.line1, self.line2 = self.hunk_off1, self.hunk_off2
+                    yield from self.output_hunk()
+                    continue
+
+            elif tag == '[':
+                yield from self.empty_buffer()
+                self.write_text(l)
                 continue
 
-            if hunk_size1 <= 0 and hunk_size2 <= 0:
-                empty_buffer()
+            elif tag == '\\' and l.startswith('\\ No newline'):
+                if self.hunk_size2 == 0:
+                    self.buf[-1] = (self.buf[-1][0], self.buf[-1][1] + '\n' + l[2:])
+                else:
+                    self.buf[-1] = (self.buf[-1][0] + '\n' + l[2:], self.buf[-1][1])
                 continue
 
-            m = re.match(r"^\+\[ (\d+) lines removed \]$", l)
-            if m:
-                add_cpt += int(m.group(1))
-                hunk_size2 -= int(m.group(1))
-                buf.append((None, l[1:]))
+            elif tag == '-' and l.startswith('--- ') or \
+                    tag == '+' and l.startswith('+++ '):
+                yield from self.empty_buffer()
                 continue
 
-            if re.match(r"^\+", l):
-                add_cpt += 1
-                hunk_size2 -= 1
-                buf.append((None, l[1:]))
+            if self.hunk_size1 <= 0 and self.hunk_size2 <= 0:
+                yield from self.empty_buffer()
                 continue
 
-            m = re.match(r"^-\[ (\d+) lines removed \]$", l)
-            if m:
-                del_cpt += int(m.group(1))
-                hunk_size1 -= int(m.group(1))
-                buf.append((l[1:], None))
+            if tag == '+':
+                m = re_lines_removed.match(l, 1)
+                removed = int(m.group(1)) if m else 1
+                self.add_cpt += removed
+                self.hunk_size2 -= removed
+                self.buf.append((None, l[1:]))
                 continue
 
-            if re.match(r"^-", l):
-                del_cpt += 1
-                hunk_size1 -= 1
-                buf.append((l[1:], None))
+            if tag == '-':
+                m = re_lines_removed.match(l, 1)
+                removed = int(m.group(1)) if m else 1
+                self.del_cpt += removed
+                self.hunk_size1 -= removed
+                self.buf.append((l[1:], None))
                 continue
 
-            if re.match(r"^ ", l) and hunk_size1 and hunk_size2:
-                empty_buffer()
-                hunk_size1 -= 1
-                hunk_size2 -= 1
-                buf.append((l[1:], l[1:]))
+            if tag == ' ' and self.hunk_size1 and self.hunk_size2:
+                yield from self.empty_buffer()
+                self.hunk_size1 -= 1
+                self.hunk_size2 -= 1
+                self.buf.append((l[1:], l[1:]))
                 continue
 
-            empty_buffer()
+            yield from self.empty_buffer()
+
+        yield from self.empty_buffer()
+
+    def output_hunk(self):
+        self.write_hunk()
+        self.row_was_output()
+        yield
+
+    def write_hunk(self):
+        self.spl_print_func(u'<tr class="diffhunk"><td colspan="2">Offset %d, %d lines modified</td>'%(self.hunk_off1, self.hunk_size1))
+        self.spl_print_func(u'<td colspan="2">Offset %d, %d lines modified</td></tr>\n'%(self.hunk_off2, self.hunk_size2))
+
+    def write_text(self, l):
+        self.spl_print_func(u'<td colspan="2">%s</td>\n' % l)
+
+    def output_line(self, s1, s2):
+        orig1 = s1
+        orig2 = s2
+
+        if s1 and len(s1) > MAX_LINE_SIZE:
+            s1 = s1[:MAX_LINE_SIZE] + u" ✂"
+        if s2 and len(s2) > MAX_LINE_SIZE:
+            s2 = s2[:MAX_LINE_SIZE] + u" ✂"
+
+        if s1 == None and s2 == None:
+            type_name = "unmodified"
+        elif s1 == "" and s2 == "":
+            type_name = "unmodified"
+        elif s1 == None or s1 == "":
+            type_name = "added"
+        elif s2 == None or s2 == "":
+            type_name = "deleted"
+        elif orig1 == orig2 and not s1.endswith('lines removed ]') and not s2.endswith('lines removed ]'):
+            type_name = "unmodified"
+        else:
+            type_name = "changed"
+            s1, s2 = linediff(s1, s2, DIFFON, DIFFOFF)
+
+        self.write_line(type_name, s1, s2)
+
+        m = orig1 and re_lines_removed.match(orig1)
+        if m:
+            self.line1 += int(m.group(1))
+        elif orig1:
+            self.line1 += 1
+        m = orig2 and re_lines_removed.match(orig2)
+        if m:
+            self.line2 += int(m.group(1))
+        elif orig2:
+            self.line2 += 1
+
+        yield
+
+    def write_line(self, type_name, s1, s2):
+        spl_print_func = self.spl_print_func
+        spl_print_func(u'<tr class="diff%s">' % type_name)
+        try:
+            if s1:
+                if self.has_internal_linenos:
+                    spl_print_func(u'<td colspan="2" class="diffpresent">')
+                else:
+                    spl_print_func(u'<td class="diffline">%d </td>' % self.line1)
+                    spl_print_func(u'<td class="diffpresent">')
+                spl_print_func(convert(s1, ponct=1, tag='del'))
+                spl_print_func(u'</td>')
+            else:
+                spl_print_func(u'<td colspan="2">\xa0</td>')
 
-        empty_buffer()
-        return True
-    except DiffBlockLimitReached:
-        total = len(unified_diff)
-        bytes_left = total - bytes_processed
-        frac = bytes_left / total
-        spl_print_func(
-            u'<tr class="error">'
-            u'<td colspan="4">Max diff block lines reached; %s/%s bytes (%.2f%%) of diff not shown.'
-            u"</td></tr>" % (bytes_left, total, frac*100), force=True)
-        return False
-    except PrintLimitReached:
-        assert not spl_had_entered_child() # limit reached on the parent page
-        spl_print_func(u'<tr class="error"><td colspan="4">Max output size reached.</td></tr>', force=True)
-        raise
-    finally:
-        spl_print_func(u"</table>", force=True)
-
-
-def output_unified_diff(print_func, css_url, directory, unified_diff, has_internal_linenos):
-    global spl_print_func, spl_print_ctrl, spl_current_page
-    new_unified_diff()
-    rotation_params = None
-    if directory:
-        mainname = hashlib.md5(unified_diff.encode('utf-8')).hexdigest()
-        rotation_params = directory, mainname, css_url
-    try:
-        spl_print_func = print_func
-        spl_print_ctrl = None, rotation_params
-        truncated = not output_unified_diff_table(unified_diff, has_internal_linenos)
-    except:
-        if not spl_print_exit(*sys.exc_info()): raise
-    else:
-        spl_print_exit(None, None, None)
-    finally:
-        spl_print_ctrl = None
-        spl_print_func = None
+            if s2:
+                if self.has_internal_linenos:
+                    spl_print_func(u'<td colspan="2" class="diffpresent">')
+                else:
+                    spl_print_func(u'<td class="diffline">%d </td>' % self.line2)
+                    spl_print_func(u'<td class="diffpresent">')
+                spl_print_func(convert(s2, ponct=1, tag='ins'))
+                spl_print_func(u'</td>')
+            else:
+                spl_print_func(u'<td colspan="2">\xa0</td>')
+        finally:
+            spl_print_func(u"</tr>\n", force=True)
+            self.row_was_output()
+
+    def empty_buffer(self):
+        if self.del_cpt == 0 or self.add_cpt == 0:
+            for l in self.buf:
+                yield from self.output_line(l[0], l[1])
+
+        elif self.del_cpt != 0 and self.add_cpt != 0:
+            l0, l1 = [], []
+            for l in self.buf:
+                if l[0] != None:
+                    l0.append(l[0])
+                if l[1] != None:
+                    l1.append(l[1])
+            max_len = (len(l0) > len(l1)) and len(l0) or len(l1)
+            for i in range(max_len):
+                s0, s1 = "", ""
+                if i < len(l0):
+                    s0 = l0[i]
+                if i < len(l1):
+                    s1 = l1[i]
+                yield from self.output_line(s0, s1)
+
+        self.add_cpt, self.del_cpt = 0, 0
+        self.buf = []
+
+    def spl_print_enter(self, print_context, rotation_params):
+        # Takes ownership of print_context
+        self.spl_print_ctrl = print_context.__exit__, rotation_params
+        self.spl_print_func = print_context.__enter__()
+        _, _, css_url = rotation_params
+        # Print file and table headers
+        output_header(css_url, self.spl_print_func)
+
+    def spl_had_entered_child(self):
+        return self.spl_print_ctrl and self.spl_print_ctrl[1] and self.spl_current_page > 0
+
+    def spl_print_exit(self, *exc_info):
+        if not self.spl_had_entered_child(): return False
+        output_footer(self.spl_print_func)
+        _exit, _ = self.spl_print_ctrl
+        self.spl_print_func, self.spl_print_ctrl = None, None
+        return _exit(*exc_info)
+
+    def row_was_output(self):
+        self.spl_rows += 1
+        rotation_params = self.rotation_params
+        max_lines = Config().max_diff_block_lines
+        max_lines_parent = Config().max_diff_block_lines_parent
+        max_lines_ratio = Config().max_diff_block_lines_html_dir_ratio
+        max_report_child_size = Config().max_report_child_size
+        if not rotation_params:
+            # html-dir single output, don't need to rotate
+            if self.spl_rows >= max_lines:
+                raise DiffBlockLimitReached()
+            return
+        else:
+            # html-dir output, perhaps need to rotate
+            directory, mainname, css_url = rotation_params
+            if self.spl_rows >= max_lines_ratio * max_lines:
+                raise DiffBlockLimitReached()
+
+            if self.spl_current_page == 0: # on parent page
+                if self.spl_rows < max_lines_parent:
+                    return
+            else: # on child page
+                # TODO: make this stay below the max, instead of going 1 row over the max
+                # will require some backtracking...
+                if self.spl_print_func.bytes_written < max_report_child_size:
+                    return
+
+        self.spl_current_page += 1
+        filename = "%s-%s.html" % (mainname, self.spl_current_page)
+
+        if self.spl_current_page > 1:
+            # previous page was a child, close it
+            self.spl_print_func(templates.UD_TABLE_FOOTER % {"filename": html.escape(filename), "text": "load diff"}, force=True)
+            self.spl_print_exit(None, None, None)
+
+        # rotate to the next child page
+        context = spl_file_printer(directory, filename)
+        self.spl_print_enter(context, rotation_params)
+        self.spl_print_func(templates.UD_TABLE_HEADER)
+
+
+class UnifiedDiffChunks(UnifiedDiffTable):
+    """
+    Outputs the unified diff of a difference with --html-dir-chunks, as
+    ``<md5>-N.js`` files of CHUNK_ROWS rows each that templates.VIEWER
+    loads as they are scrolled to. Only a placeholder is put on the parent
+    page, so that it opens quickly however large the diffs are.
+
+    Each row is a list, the first item of which tells what it is:
+
+    - ``['@', offset1, size1, offset2, size2]`` for the start of a hunk
+    - ``[type, line1, s1, line2, s2]`` for lines, type being the first
+      letter of the name of their class, the line numbers None with internal
+      line numbers and the lines None if absent, with DIFFON and DIFFOFF
+      around the changes; s2 is left out if it is the same as s1
+    - ``['[', text]`` for text from the diff shown as is
+    - ``['!', text]`` for the error ending truncated diffs
+    """
+
+    def __init__(self, print_func, css_url, directory, difference):
+        super().__init__(print_func, css_url, directory, difference)
+        self.chunk = []
+        self.chunks = 0
+        self.count = 0
+
+    def output(self):
+        return Job(self.output_chunks, ())
+
+    def output_chunks(self):
+        try:
+            for _ in self.rows:
+                pass
+        except DiffBlockLimitReached:
+            self.add_row(['!', self.limit_message()])
+        self.write_chunk()
+
+        return templates.UD_CHUNKS % {
+            'name': self.mainname,
+            'rows': self.count,
+            'chunk_rows': CHUNK_ROWS,
+        }
+
+    def add_row(self, row):
+        self.chunk.append(row)
+        self.count += 1
+        if len(self.chunk) >= CHUNK_ROWS:
+            self.write_chunk()
+
+    def write_chunk(self):
+        if not self.chunk:
+            return
+        directory, mainname, _ = self.rotation_params
+        filename = "%s-%d.js" % (mainname, self.chunks)
+        with file_printer(directory, filename) as print_func:
+            print_func(u"diffoscopeChunk(%s,%d,%s);\n" % (
+                json.dumps(mainname),
+                self.chunks,
+                json.dumps(self.chunk, separators=(',', ':')),
+            ))
+        self.chunk = []
+        self.chunks += 1
+
+    def write_hunk(self):
+        self.add_row(['@', self.hunk_off1, self.hunk_size1, self.hunk_off2, self.hunk_size2])
+
+    def write_text(self, l):
+        self.add_row(['[', l])
+
+    def write_line(self, type_name, s1, s2):
+        line1, line2 = self.line1, self.line2
+        if self.has_internal_linenos:
+            line1, line2 = None, None
+        row = [type_name[0], line1, s1 or None, line2]
+        if s2 != s1:
+            row.append(s2 or None)
+        self.add_row(row)
+        self.row_was_output()
+
+    def row_was_output(self):
+        # Rows are never split into child pages
+        self.spl_rows += 1
+        if self.spl_rows >= Config().max_diff_block_lines_html_dir_ratio * \
+                Config().max_diff_block_lines:
+            raise DiffBlockLimitReached()
 
-    if spl_current_page > 0:
-        noun = "pieces" if spl_current_page > 1 else "piece"
-        text = "load diff (%s %s%s)" % (spl_current_page, noun, (", truncated" if truncated else ""))
-        print_func(templates.UD_TABLE_FOOTER % {"filename": html.escape("%s-1.html" % mainname), "text": text}, force=True)
 
 def escape_anchor(val):
     """
@@ -438,11 +563,66 @@ def escape_anchor(val):
 
     return val
 
-def output_difference(difference, print_func, css_url, directory, parents):
-    logger.debug('html output for %s', difference.source1)
-    sources = parents + [difference.source1]
-    print_func(u'<div class="difference">')
-    try:
+class HTMLPresenter(Presenter):
+    """
+    Outputs a single HTML page or, given a directory, the index of an
+    --html-dir report whose large diff tables are put into files of their
+    own, or whose diffs all are if chunks is True.
+    """
+
+    def __init__(self, print_func, css_url=None, directory=None, jquery_url=None, chunks=False):
+        self.print_func = create_limited_print_func(
+            self.write,
+            Config().max_report_size,
+        )
+        self.output = print_func
+        self.css_url = css_url
+        self.directory = directory
+        self.jquery_url = jquery_url
+        self.chunks = chunks
+        self.sources = []
+        # Jobs writing child pages, with what was output after their table
+        self.jobs = collections.deque()
+
+        super().__init__()
+
+    def write(self, val):
+        # Keep the output in order until the tables of pending jobs are done
+        if self.jobs:
+            self.jobs[-1][1].append(val)
+            return
+        self.output(val)
+
+    def add_job(self, job):
+        """
+        Write the child pages of a table in a worker thread if there is a
+        free job slot, and in this one otherwise.
+        """
+
+        if ParallelManager().try_acquire():
+            job.start()
+        else:
+            job.run()
+        self.jobs.append((job, []))
+
+    def flush(self, wait=False):
+        while self.jobs and (wait or self.jobs[0][0].done()):
+            job, output = self.jobs.popleft()
+            self.output(job.result())
+            for x in output:
+                self.output(x)
+
+    def open(self):
+        output_header(self.css_url, self.print_func)
+
+    def enter(self, difference):
+        logger.debug('html output for %s', difference.source1)
+        self.flush()
+        self.sources.append(difference.source1)
+        print_func = self.print_func
+        print_func(u'<div class="difference">')
+        # Count the open <div>s, see stop
+        self.depth += 1
         print_func(u'<div class="diffheader">')
         if difference.source1 == difference.source2:
             print_func(u'<div class="diffcontrol">[−]</div>')
@@ -454,22 +634,43 @@ def output_difference(difference, print_func, css_url, directory, parents):
                        % html.escape(difference.source1))
             print_func(u'<div><span class="source">%s</span>'
                        % html.escape(difference.source2))
-        anchor = escape_anchor('/'.join(sources[1:]))
+        anchor = escape_anchor('/'.join(self.sources[1:]))
         print_func(u' <a class="anchor" href="#%s" name="%s">\xb6</a>' % (anchor, anchor))
         print_func(u"</div>")
         if difference.comments:
             print_func(u'<div class="comment">%s</div>'
                        % u'<br />'.join(map(html.escape, difference.comments)))
         print_func(u"</div>")
-        if difference.unified_diff:
-            output_unified_diff(print_func, css_url, directory, difference.unified_diff, difference.has_internal_linenos)
-        for detail in difference.details:
-            output_difference(detail, print_func, css_url, directory, sources)
-    except PrintLimitReached:
+        if difference.has_unified_diff:
+            klass = UnifiedDiffChunks if self.chunks else UnifiedDiffTable
+            job = klass(
+                print_func,
+                self.css_url,
+                self.directory,
+                difference,
+            ).output()
+            if job is not None:
+                self.add_job(job)
+
+    def leave(self, difference):
+        self.sources.pop()
+        self.depth -= 1
+        self.print_func(u"</div>", force=True)
+
+    def stop(self):
         logger.debug('print limit reached')
-        raise
-    finally:
-        print_func(u"</div>", force=True)
+        for _ in range(self.depth):
+            self.print_func(u"</div>", force=True)
+        self.print_func(u'<div class="error">Max output size reached.</div>',
+                        force=True)
+
+    def close(self):
+        if self.jquery_url:
+            self.print_func(templates.SCRIPTS % {'jquery_url': html.escape(self.jquery_url)}, force=True)
+        if self.chunks:
+            self.print_func(templates.VIEWER, force=True)
+        output_footer(self.print_func)
+        self.flush(wait=True)
 
 
 def output_header(css_url, print_func):
@@ -492,26 +693,22 @@ def output_html(difference, css_url=None, print_func=None):
     """
     if print_func is None:
         print_func = print
-    print_func = create_limited_print_func(print_func, Config().max_report_size)
-    try:
-        output_header(css_url, print_func)
-        output_difference(difference, print_func, css_url, None, [])
-    except PrintLimitReached:
-        logger.debug('print limit reached')
-        print_func(u'<div class="error">Max output size reached.</div>',
-                   force=True)
-    output_footer(print_func)
+    HTMLPresenter(print_func, css_url).start(difference)
 
 @contextlib.contextmanager
 def file_printer(directory, filename):
     with codecs.open(os.path.join(directory,filename), 'w', encoding='utf-8') as f:
         yield f.write
 
-def output_html_directory(directory, difference, css_url=None, jquery_url=None):
+@contextlib.contextmanager
+def html_directory_presenter(directory, css_url=None, jquery_url=None, chunks=False):
     """
     Multi-file presenter. Writes to a directory, and puts large diff tables
     into files of their own.
 
+    If chunks is True, all diffs are instead written as data shown by a
+    viewer of its own, which only renders the rows scrolled to.
+
     This uses jQuery. By default it uses /usr/share/javascript/jquery/jquery.js
     (symlinked, so that you can still share the result over HTTP).
     You can also pass --jquery URL to diffoscope to use a central jQuery copy.
@@ -541,14 +738,8 @@ def output_html_directory(directory, difference, css_url=None, jquery_url=None):
         jquery_url = None
 
     with file_printer(directory, "index.html") as print_func:
-        print_func = create_limited_print_func(print_func, Config().max_report_size)
-        try:
-            output_header(css_url, print_func)
-            output_difference(difference, print_func, css_url, directory, [])
-        except PrintLimitReached:
-            logger.debug('print limit reached')
-            print_func(u'<div class="error">Max output size reached.</div>',
-                       force=True)
-        if jquery_url:
-            print_func(templates.SCRIPTS % {'jquery_url': html.escape(jquery_url)}, force=True)
-        output_footer(print_func)
+        yield HTMLPresenter(print_func, css_url, directory, jquery_url, chunks)
+
+def output_html_directory(directory, difference, css_url=None, jquery_url=None, chunks=False):
+    with html_directory_presenter(directory, css_url, jquery_url, chunks) as presenter:
+        presenter.start(difference)
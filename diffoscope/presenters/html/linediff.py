@@ -18,77 +18,152 @@
 # along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
 
 
+# Lines are compared within a band of diagonals of the edit table, widened
+# until it holds the cheapest edit script, as long as it has at most this many
+# cells. Otherwise, only the common prefix and suffix are told apart.
+MAX_CELLS = 2 ** 18
+MIN_BAND = 16
+
+# Control characters other than tabs and newlines are shown as dots
+SANE = {x: '.' for x in range(32) if chr(x) not in '\t\n'}
+
+DIAGONAL, UP, LEFT = range(3)
+
+
 def sane(x):
-    r = ""
-    for i in x:
-        j = ord(i)
-        if i not in ['\t', '\n'] and (j < 32):
-            r = r + "."
-        else:
-            r = r + i
-    return r
+    return x.translate(SANE)
 
 
 def linediff(s, t, diffon, diffoff):
     '''
     Original line diff algorithm of diff2html. It's character based.
+
+    Only the cells of the edit table within ``band`` diagonals of the main
+    one are computed, which finds the same edit script as the whole table if
+    it needs at most ``band`` edits. The band is doubled until it does; if
+    it would grow too large, the part of the lines between their common
+    prefix and suffix is highlighted as a whole instead.
     '''
-    if len(s):
-        s = ''.join([ sane(c) for c in s ])
-    if len(t):
-        t = ''.join([ sane(c) for c in t ])
+    s = sane(s)
+    t = sane(t)
 
     m, n = len(s), len(t)
-    d = [[(0, 0) for i in range(n+1)] for i in range(m+1)]
-
-
-    d[0][0] = (0, (0, 0))
-    for i in range(m+1)[1:]:
-        d[i][0] = (i,(i-1, 0))
-    for j in range(n+1)[1:]:
-        d[0][j] = (j,(0, j-1))
+    band = min(max(abs(m - n), MIN_BAND), max(m, n))
 
-    for i in range(m+1)[1:]:
-        for j in range(n+1)[1:]:
-            if s[i-1] == t[j-1]:
-                cost = 0
-            else:
-                cost = 1
-            d[i][j] = min((d[i-1][j][0] + 1, (i-1, j)),
-                          (d[i][j-1][0] + 1, (i, j-1)),
-                          (d[i-1][j-1][0] + cost, (i-1, j-1)))
-
-    l = []
-    coord = (m, n)
-    while coord != (0, 0):
-        l.insert(0, coord)
-        x, y = coord
-        coord = d[x][y][1]
+    while True:
+        moves = edit_moves(s, t, band)
+        if moves is not None:
+            break
+        if band >= max(m, n) or (m + 1) * (4 * band + 1) > MAX_CELLS:
+            return highlight_middle(s, t, diffon, diffoff)
+        band = min(2 * band, max(m, n))
 
     l1 = []
     l2 = []
 
-    for coord in l:
-        cx, cy = coord
-        child_val = d[cx][cy][0]
-
-        father_coord = d[cx][cy][1]
-        fx, fy = father_coord
-        father_val = d[fx][fy][0]
-
-        diff = (cx-fx, cy-fy)
-
-        if diff == (0, 1):
+    i, j = m, n
+    while (i, j) != (0, 0):
+        move = moves[i * (2 * band + 1) + j - i + band]
+        if move == LEFT:
+            j -= 1
             l1.append("")
-            l2.append(diffon + t[fy] + diffoff)
-        elif diff == (1, 0):
-            l1.append(diffon + s[fx] + diffoff)
+            l2.append(diffon + t[j] + diffoff)
+        elif move == UP:
+            i -= 1
+            l1.append(diffon + s[i] + diffoff)
             l2.append("")
-        elif child_val-father_val == 1:
-            l1.append(diffon + s[fx] + diffoff)
-            l2.append(diffon + t[fy] + diffoff)
         else:
-            l1.append(s[fx])
-            l2.append(t[fy])
+            i -= 1
+            j -= 1
+            if s[i] != t[j]:
+                l1.append(diffon + s[i] + diffoff)
+                l2.append(diffon + t[j] + diffoff)
+            else:
+                l1.append(s[i])
+                l2.append(t[j])
+
+    l1.reverse()
+    l2.reverse()
 
     return ''.join(l1).replace(diffoff + diffon, ''), ''.join(l2).replace(diffoff + diffon, '')
+
+
+def edit_moves(s, t, band):
+    """
+    Compute the edit table of s and t within band diagonals of the main one,
+    returning the move leading to each of its cells, row by row, or None if
+    turning s into t takes more than band edits.
+
+    Ties are broken as in diff2html: substitutions or matches come first,
+    then deletions and insertions.
+    """
+
+    m, n = len(s), len(t)
+    if abs(m - n) > band:
+        return None
+
+    width = 2 * band + 1
+    infinity = m + n + 1
+    moves = bytearray(width * (m + 1))
+
+    # Cell (i, j) is at index j - i + band of row i
+    prev = [infinity] * (width + 1)
+    for j in range(min(n, band) + 1):
+        prev[j + band] = j
+        moves[j + band] = LEFT
+
+    for i in range(1, m + 1):
+        cur = [infinity] * (width + 1)
+        row = i * width
+        a = s[i - 1]
+        lo = max(0, i - band)
+        hi = min(n, i + band)
+
+        if lo == 0:
+            cur[band - i] = i
+            moves[row + band - i] = UP
+            lo = 1
+
+        for j in range(lo, hi + 1):
+            k = j - i + band
+            best = prev[k] + (a != t[j - 1])
+            move = DIAGONAL
+            up = prev[k + 1] + 1
+            if up < best:
+                best = up
+                move = UP
+            left = cur[k - 1] + 1
+            if left < best:
+                best = left
+                move = LEFT
+            cur[k] = best
+            moves[row + k] = move
+
+        prev = cur
+
+    if prev[n - m + band] > band:
+        return None
+
+    return moves
+
+
+def highlight_middle(s, t, diffon, diffoff):
+    prefix = 0
+    for x, y in zip(s, t):
+        if x != y:
+            break
+        prefix += 1
+
+    suffix = 0
+    for x, y in zip(reversed(s[prefix:]), reversed(t[prefix:])):
+        if x != y:
+            break
+        suffix += 1
+
+    def highlight(x):
+        middle = x[prefix:len(x) - suffix]
+        if middle:
+            middle = diffon + middle + diffoff
+        return x[:prefix] + middle + x[len(x) - suffix:]
+
+    return highlight(s), highlight(t)
@@ -204,3 +204,230 @@ UD_TABLE_FOOTER = u"""<tr class="ondemand"><td colspan="4">
 </td></tr>
 </table>
 """
+
+UD_CHUNKS = u"""<div class="diffchunks" data-name="%(name)s" data-rows="%(rows)d" data-chunk-rows="%(chunk_rows)d">
+%(rows)d rows, shown with JavaScript enabled
+</div>
+"""
+
+# Shows the rows written by UnifiedDiffChunks. Placeholders scroll over the
+# height of all of their rows, of which only those around the visible ones
+# are rendered, loading their chunks as needed. Chunks are loaded with
+# <script> elements, which unlike requests also work for local files.
+VIEWER = r"""
+<style type="text/css">
+  .diffoscope div.diffchunks {
+    position: relative;
+    overflow: auto;
+    max-height: 40em;
+  }
+  .diffoscope div.diffchunks table.diff {
+    position: absolute;
+    top: 0;
+  }
+  .diffoscope div.diffchunks tr {
+    height: 16px;
+  }
+  .diffoscope div.diffchunks td {
+    height: 16px;
+    line-height: 16px;
+    padding: 0;
+    white-space: nowrap;
+    overflow: hidden;
+    text-overflow: ellipsis;
+  }
+</style>
+<script type="text/javascript">
+(function() {
+  var ROW_HEIGHT = 16;
+  // Browsers do not support elements much higher than this
+  var MAX_HEIGHT = 1e7;
+  // Rows rendered above and below the visible ones
+  var MARGIN = 50;
+  var TYPES = {u: "unmodified", a: "added", d: "deleted", c: "changed"};
+  var WORDBREAK = " \t;.,/):-";
+  // Chunks and placeholders by name, identical diffs sharing them
+  var chunks = {};
+  var views = {};
+
+  window.diffoscopeChunk = function(name, index, rows) {
+    chunks[name][index] = rows;
+    views[name].forEach(function(view) { render(view, true); });
+  };
+
+  function escape(s) {
+    return s.replace(/&/g, "&amp;").replace(/</g, "&lt;").replace(/>/g, "&gt;");
+  }
+
+  function convert(s, tag) {
+    var out = [], col = 0;
+    for (var i = 0; i < s.length; i++) {
+      var c = s.charAt(i), code = s.charCodeAt(i);
+      if (c == "\x01") {
+        out.push("<" + tag + ">");
+      } else if (c == "\x02") {
+        out.push("</" + tag + ">");
+      } else if (c == "\t") {
+        out.push('<span class="diffponct">\xbb</span>' + new Array(8 - col % 8).join("\xa0"));
+      } else if (c == " ") {
+        out.push('<span class="diffponct">\xb7</span>');
+      } else if (c == "\n") {
+        out.push('<span class="diffponct">\\</span>');
+      } else if (code < 32) {
+        var conv = "\\x" + code.toString(16);
+        out.push("<em>" + conv + "</em>");
+        col += conv.length;
+      } else {
+        out.push(escape(c));
+        col++;
+      }
+      // As convert in html.py does for breaking lines
+      if (WORDBREAK.indexOf(c) != -1 || col > 20) {
+        col = 0;
+      }
+    }
+    return out.join("");
+  }
+
+  function cells(lineno, s, tag) {
+    if (!s) {
+      return '<td colspan="2">\xa0</td>';
+    }
+    if (lineno === null) {
+      return '<td colspan="2" class="diffpresent">' + convert(s, tag) + "</td>";
+    }
+    return '<td class="diffline">' + lineno + ' </td><td class="diffpresent">' + convert(s, tag) + "</td>";
+  }
+
+  function row(r) {
+    switch (r[0]) {
+    case "@":
+      return '<tr class="diffhunk"><td colspan="2">Offset ' + r[1] + ", " + r[2] + " lines modified</td>" +
+        '<td colspan="2">Offset ' + r[3] + ", " + r[4] + " lines modified</td></tr>";
+    case "[":
+      return '<tr><td colspan="4">' + escape(r[1]) + "</td></tr>";
+    case "!":
+      return '<tr class="error"><td colspan="4">' + escape(r[1]) + "</td></tr>";
+    }
+    var s2 = r.length > 4 ? r[4] : r[2];
+    return '<tr class="diff' + TYPES[r[0]] + '">' + cells(r[1], r[2], "del") + cells(r[3], s2, "ins") + "</tr>";
+  }
+
+  function load(view, index) {
+    if (index in chunks[view.name]) {
+      return;
+    }
+    chunks[view.name][index] = null;
+    var script = document.createElement("script");
+    script.src = view.name + "-" + index + ".js";
+    document.head.appendChild(script);
+  }
+
+  function render(view, force) {
+    if (!view.visible) {
+      return;
+    }
+    var el = view.el;
+    var top = el.scrollTop, visible = el.clientHeight;
+    // Map the scroll position onto all rows if they are too high to fit
+    var scale = 1;
+    if (view.height > visible) {
+      scale = (view.rows * ROW_HEIGHT - visible) / (view.height - visible);
+    }
+    var position = top * scale;
+    var first = Math.max(0, Math.floor(position / ROW_HEIGHT) - MARGIN);
+    var last = Math.min(view.rows, Math.ceil((position + visible) / ROW_HEIGHT) + MARGIN);
+    if (!force && first == view.first && last == view.last) {
+      return;
+    }
+    view.first = first;
+    view.last = last;
+
+    var html = [];
+    for (var i = first; i < last; i++) {
+      var index = Math.floor(i / view.chunkRows);
+      var rows = chunks[view.name][index];
+      if (rows) {
+        html.push(row(rows[i - index * view.chunkRows]));
+      } else {
+        load(view, index);
+        html.push('<tr><td colspan="4">... loading ...</td></tr>');
+      }
+    }
+    view.body.innerHTML = '<table class="diff"><colgroup><col class="colines"/><col class="coldiff"/>' +
+      '<col class="colines"/><col class="coldiff"/></colgroup>' + html.join("") + "</table>";
+    view.body.firstChild.style.top = Math.round(top + first * ROW_HEIGHT - position) + "px";
+  }
+
+  function init(el) {
+    var view = {
+      el: el,
+      name: el.getAttribute("data-name"),
+      rows: Number(el.getAttribute("data-rows")),
+      chunkRows: Number(el.getAttribute("data-chunk-rows")),
+      visible: false
+    };
+    view.height = Math.min(view.rows * ROW_HEIGHT, MAX_HEIGHT);
+    el.innerHTML = '<div style="height: ' + view.height + 'px"></div><div></div>';
+    view.body = el.lastChild;
+    if (!(view.name in chunks)) {
+      chunks[view.name] = {};
+      views[view.name] = [];
+    }
+    views[view.name].push(view);
+
+    var pending = false;
+    el.addEventListener("scroll", function() {
+      if (!pending) {
+        pending = true;
+        window.requestAnimationFrame(function() {
+          pending = false;
+          render(view);
+        });
+      }
+    });
+    return view;
+  }
+
+  function show(view) {
+    view.visible = true;
+    render(view, true);
+  }
+
+  var all = Array.prototype.map.call(document.querySelectorAll(".diffoscope div.diffchunks"), init);
+
+  // Show and hide placeholders along with the tables of --html-dir, once
+  // their controls were clicked
+  document.addEventListener("click", function(evt) {
+    if (!evt.target.classList || !evt.target.classList.contains("diffcontrol")) {
+      return;
+    }
+    all.forEach(function(view) {
+      var control = view.el.previousElementSibling.querySelector(".diffcontrol");
+      var hidden = control.textContent == "[+]";
+      if (hidden != (view.el.style.display == "none")) {
+        view.el.style.display = hidden ? "none" : "";
+        render(view, true);
+      }
+    });
+  });
+  if ("IntersectionObserver" in window) {
+    // Only render placeholders once they are about to be scrolled to
+    var observer = new IntersectionObserver(function(entries) {
+      entries.forEach(function(entry) {
+        if (entry.isIntersecting) {
+          observer.unobserve(entry.target);
+          show(all[entry.target.getAttribute("data-index")]);
+        }
+      });
+    }, {rootMargin: "100%"});
+    all.forEach(function(view, i) {
+      view.el.setAttribute("data-index", i);
+      observer.observe(view.el);
+    });
+  } else {
+    all.forEach(show);
+  }
+})();
+</script>
+"""
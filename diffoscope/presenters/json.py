@@ -23,25 +23,122 @@ from .utils import Presenter
 
 
 class JSONPresenter(Presenter):
+    """
+    Writes each difference as it is visited, formatted as ``json.dumps(...,
+    indent=2, sort_keys=True)`` would.
+
+    Each difference is nested in the previously visited one, so the keys
+    after ``differences`` can only be written once all of them have been
+    visited. Only their unified diffs are kept until then, by the
+    ``DiffStore``.
+    """
+
     def __init__(self, print_func):
-        self.root = []
-        self.current = self.root
+        self.stack = []
         self.print_func = print_func
 
         super().__init__()
 
-    def start(self, difference):
-        super().start(difference)
+    def close(self):
+        innermost = True
+        while self.stack:
+            source1, source2, unified_diff = self.stack.pop()
+            indent = '\n' + '    ' * len(self.stack)
+
+            if not innermost:
+                self.output(indent + '  ')
+            innermost = False
+
+            self.output('],{0}  "source1": {1},{0}  "source2": {2},{0}  "unified_diff": '.format(
+                indent,
+                json.dumps(source1),
+                json.dumps(source2),
+            ))
+            if isinstance(unified_diff, str) or unified_diff is None:
+                self.output(json.dumps(unified_diff))
+            else:
+                for x in dumps_blocks(unified_diff):
+                    self.output(x)
+            self.output(indent + '}')
 
-        self.print_func(json.dumps(self.root[0], indent=2, sort_keys=True))
+        self.print_func('')
 
     def visit_difference(self, difference):
-        self.current.append({
+        indent = '\n' + '    ' * len(self.stack)
+
+        if self.stack:
+            self.output(indent)
+
+        # Up to and including the opening bracket of "differences"
+        head = json.dumps({
+            'comments': [x for x in difference.comments],
+            'differences': [],
+        }, indent=2, sort_keys=True)[:-len(']\n}')]
+        self.output(head.replace('\n', indent))
+
+        if difference.has_unified_diff:
+            unified_diff = difference.iter_unified_diff()
+        else:
+            unified_diff = difference.unified_diff
+
+        self.stack.append((
+            difference.source1,
+            difference.source2,
+            unified_diff,
+        ))
+
+    def output(self, val):
+        self.print_func(val, end='')
+
+
+class NDJSONPresenter(Presenter):
+    """
+    Writes a JSON record on a line of its own for each difference, as soon
+    as it is visited. Records have the keys of the JSON output except for
+    ``differences``, and instead an ``id`` and the ``id`` of their
+    ``parent`` (``null`` for the first one). Parents come before their
+    details.
+    """
+
+    def __init__(self, print_func):
+        self.parents = []
+        self.count = 0
+        self.print_func = print_func
+
+        super().__init__()
+
+    def enter(self, difference):
+        record = json.dumps({
+            'id': self.count,
+            'parent': self.parents[-1] if self.parents else None,
             'source1': difference.source1,
             'source2': difference.source2,
             'comments': [x for x in difference.comments],
-            'differences': [],
-            'unified_diff': difference.unified_diff,
-        })
+        }, sort_keys=True)
+
+        self.parents.append(self.count)
+        self.count += 1
+
+        # "unified_diff" sorts last, so it is written block by block
+        self.print_func(record[:-1] + ', "unified_diff": ', end='')
+        if difference.has_unified_diff:
+            for x in dumps_blocks(difference.iter_unified_diff()):
+                self.print_func(x, end='')
+        else:
+            self.print_func(json.dumps(difference.unified_diff), end='')
+        self.print_func('}')
+
+    def leave(self, difference):
+        self.parents.pop()
+
+
+def dumps_blocks(blocks):
+    """
+    Yield the JSON string of the text of the given ``DiffBlock``s, in as
+    many pieces. Escaping is per character, so blocks can be encoded apart.
+    """
 
-        self.current = self.current[-1]['differences']
+    yield '"'
+    for x in blocks:
+        yield json.dumps(x.text)[1:-1]
+    yield '"'
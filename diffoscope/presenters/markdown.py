@@ -38,8 +38,10 @@ class MarkdownTextPresenter(Presenter):
             self.print_func(x)
             self.print_func()
 
-        if difference.unified_diff:
-            self.print_func(self.indent(difference.unified_diff, '    '))
+        if difference.has_unified_diff:
+            blocks = (x.text for x in difference.iter_unified_diff())
+            for x in self.indent_blocks(blocks, '    '):
+                self.print_func(x)
             self.print_func()
 
     def title(self, val):
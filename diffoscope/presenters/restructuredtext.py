@@ -40,10 +40,12 @@ class RestructuredTextPresenter(Presenter):
             self.print_func()
             self.print_func(x)
 
-        if difference.unified_diff:
+        if difference.has_unified_diff:
             self.print_func('::')
             self.print_func()
-            self.print_func(self.indent(difference.unified_diff, '    '))
+            blocks = (x.text for x in difference.iter_unified_diff())
+            for x in self.indent_blocks(blocks, '    '):
+                self.print_func(x)
             self.print_func()
 
     def title(self, val):
@@ -22,7 +22,7 @@ import re
 from diffoscope.diff import color_unified_diff
 from diffoscope.config import Config
 
-from .utils import Presenter, create_limited_print_func, PrintLimitReached
+from .utils import Presenter, create_limited_print_func
 
 
 class TextPresenter(Presenter):
@@ -38,11 +38,8 @@ class TextPresenter(Presenter):
 
         super().__init__()
 
-    def start(self, difference):
-        try:
-            super().start(difference)
-        except PrintLimitReached:
-            self.print_func("Max output size reached.", force=True)
+    def stop(self):
+        self.print_func("Max output size reached.", force=True)
 
     def visit_difference(self, difference):
         if self.depth == 0:
@@ -57,10 +54,13 @@ class TextPresenter(Presenter):
         for x in difference.comments:
             self.output(u"│┄ {}".format(x))
 
-        diff = difference.unified_diff
+        if self.color:
+            blocks = map(color_unified_diff, difference.iter_unified_diff())
+        else:
+            blocks = (x.text for x in difference.iter_unified_diff())
 
-        if diff:
-            self.output(color_unified_diff(diff) if self.color else diff, True)
+        for x in self.indent_blocks(blocks, self.PREFIX * self.depth):
+            self.print_func(x)
 
     def output(self, val, raw=False):
         self.print_func(
@@ -18,27 +18,51 @@
 # along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
 
 import sys
+import queue
 import codecs
+import functools
+import threading
 import contextlib
 
+from ..parallel import ParallelManager
+
+# Visits queued for presenters rendering in a worker thread, see present.
+# Bounds how far the traversal can get ahead of them.
+MAX_QUEUED_VISITS = 1000
+
 
 class Presenter(object):
+    """
+    Presenters are driven by ``present``: ``open`` is called first, then
+    ``enter`` and ``leave`` around the visit of the details of each
+    difference, depth first, and finally ``close``. If a print limit is
+    reached, ``stop`` is called instead of any further visits.
+    """
+
     def __init__(self):
         self.depth = 0
+        self.stopped = False
 
     def start(self, difference):
-        self.visit(difference)
+        present(difference, [self])
 
-    def visit(self, difference):
+    def open(self):
+        pass
+
+    def enter(self, difference):
         self.visit_difference(difference)
 
         self.depth += 1
 
-        for x in difference.details:
-            self.visit(x)
-
+    def leave(self, difference):
         self.depth -= 1
 
+    def stop(self):
+        pass
+
+    def close(self):
+        pass
+
     def visit_difference(self, difference):
         raise NotImplementedError()
 
@@ -51,9 +75,112 @@ class Presenter(object):
         # str.splitlines, etc.
         return prefix + val.rstrip().replace('\n', '\n{}'.format(prefix))
 
+    @classmethod
+    def indent_blocks(cls, blocks, prefix):
+        """
+        Like indent, for a string given as blocks of whole lines. Yields the
+        result in as many pieces.
+        """
+
+        previous = None
+        for block in blocks:
+            if previous is not None:
+                # Only the end of the whole string is stripped
+                yield prefix + previous[:-1].replace('\n', '\n{}'.format(prefix))
+            previous = block
+        if previous is not None:
+            yield cls.indent(previous, prefix)
+
 class PrintLimitReached(Exception):
     pass
 
+class PresenterThread(object):
+    """
+    Renders a presenter in a worker thread, in the order its visits are
+    queued.
+    """
+
+    def __init__(self, presenter):
+        self.presenter = presenter
+        self.queue = queue.Queue(MAX_QUEUED_VISITS)
+        self.exception = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def call(self, name, *args):
+        self.queue.put((name, args))
+
+    def run(self):
+        try:
+            for name, args in iter(self.queue.get, None):
+                # Keep consuming, so the traversal never blocks on us
+                if self.exception is None:
+                    try:
+                        call_presenter(self.presenter, name, *args)
+                    except BaseException as e:
+                        self.exception = e
+        finally:
+            ParallelManager().release()
+
+    def join(self):
+        self.queue.put(None)
+        self.thread.join()
+
+def call_presenter(presenter, name, *args):
+    # Once stopped, presenters are only closed
+    if presenter.stopped and name != 'close':
+        return
+    try:
+        getattr(presenter, name)(*args)
+    except PrintLimitReached:
+        presenter.stopped = True
+        presenter.stop()
+
+def present(difference, presenters):
+    """
+    Visit the differences once, passing each of them to all presenters.
+
+    Unless --jobs is 1, presenters are rendered in worker threads whilst
+    there are free job slots, so slower formats do not hold up the others.
+    """
+
+    targets = []
+    threads = []
+    for x in presenters:
+        if len(presenters) > 1 and ParallelManager().try_acquire():
+            x = PresenterThread(x)
+            threads.append(x)
+            targets.append(x.call)
+        else:
+            targets.append(functools.partial(call_presenter, x))
+
+    def visit(difference):
+        for fn in targets:
+            fn('enter', difference)
+
+        for detail in difference.iter_details():
+            # Don't compare any further details if nobody needs them
+            if all(x.stopped for x in presenters):
+                break
+            visit(detail)
+
+        for fn in targets:
+            fn('leave', difference)
+
+    try:
+        for fn in targets:
+            fn('open')
+        visit(difference)
+        for fn in targets:
+            fn('close')
+    finally:
+        for x in threads:
+            x.join()
+
+    for x in threads:
+        if x.exception is not None:
+            raise x.exception
+
 class DiffBlockLimitReached(Exception):
     pass
 
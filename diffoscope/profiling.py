@@ -19,6 +19,7 @@
 
 import sys
 import time
+import threading
 import contextlib
 import collections
 
@@ -33,6 +34,15 @@ def profile(namespace, key):
     if _ENABLED:
         ProfileManager().increment(start, namespace, key)
 
+def count(namespace, key, value=1):
+    """
+    Add value to a counter (eg. of bytes processed) that is reported
+    alongside the timings.
+    """
+
+    if _ENABLED:
+        ProfileManager().count(namespace, key, value)
+
 class ProfileManager(object):
     _singleton = {}
 
@@ -46,6 +56,10 @@ class ProfileManager(object):
                     'count': 0,
                 }),
             )
+            self.counters = collections.defaultdict(
+                lambda: collections.defaultdict(int),
+            )
+            self.lock = threading.Lock()
 
     def setup(self, parsed_args):
         global _ENABLED
@@ -58,8 +72,13 @@ class ProfileManager(object):
                 key.__class__.__name__,
             )
 
-        self.data[namespace][key]['time'] += time.time() - start
-        self.data[namespace][key]['count'] += 1
+        with self.lock:
+            self.data[namespace][key]['time'] += time.time() - start
+            self.data[namespace][key]['count'] += 1
+
+    def count(self, namespace, key, value):
+        with self.lock:
+            self.counters[namespace][key] += value
 
     def finish(self, parsed_args):
         from .presenters.utils import make_printer
@@ -76,7 +95,8 @@ class ProfileManager(object):
         print(title)
         print("=" * len(title))
 
-        for namespace, keys in sorted(self.data.items(), key=lambda x: x[0]):
+        for namespace in sorted(set(self.data) | set(self.counters)):
+            keys = self.data.get(namespace, {})
             subtitle = "{} (total time: {:.3f}s)".format(
                 namespace,
                 sum(x['time'] for x in keys.values()),
@@ -91,3 +111,6 @@ class ProfileManager(object):
                     ' ' if totals['count'] == 1 else 's',
                     value,
                 ))
+
+            for key, total in sorted(self.counters.get(namespace, {}).items()):
+                print("  {:11d} total          {}".format(total, key))
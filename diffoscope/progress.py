@@ -21,6 +21,7 @@ import os
 import sys
 import json
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
@@ -38,6 +39,8 @@ class ProgressManager(object):
         self.total = 0
         self.current = 0
         self.observers = []
+        # Members may be compared in parallel (see --jobs)
+        self.lock = threading.RLock()
 
     def setup(self, parsed_args):
         # Show progress bar if user explicitly asked for it, otherwise show if
@@ -62,16 +65,18 @@ class ProgressManager(object):
         self.observers.append(observer)
 
     def step(self, delta=1, msg=""):
-        delta = min(self.total - self.current, delta) # clamp
+        with self.lock:
+            delta = min(self.total - self.current, delta) # clamp
 
-        self.current += delta
-        for x in self.observers:
-            x.notify(self.current, self.total, msg)
+            self.current += delta
+            for x in self.observers:
+                x.notify(self.current, self.total, msg)
 
     def new_total(self, delta, msg):
-        self.total += delta
-        for x in self.observers:
-            x.notify(self.current, self.total, msg)
+        with self.lock:
+            self.total += delta
+            for x in self.observers:
+                x.notify(self.current, self.total, msg)
 
     def finish(self):
         for x in self.observers:
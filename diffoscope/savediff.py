@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+#
+# diffoscope: in-depth comparison of files, archives, and directories
+#
+# Copyright © 2026 agent <agent@local>
+#
+# diffoscope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# diffoscope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Saving the ``Difference`` tree to a file with --save-diff, so reports can
+be output again from it with --load-diff without comparing anything.
+
+A file starts with ``MAGIC`` and the format version, followed by a record
+for each difference in the order they are visited (parents before their
+details), the index and the trailer. All integers are little-endian.
+
+A record holds:
+
+- flags: 1 if there is a unified diff, 2 if it has internal line numbers
+- source1 and source2, then the number of comments and each of them, as
+  strings: their size (32 bits) and UTF-8 encoding
+- if there is a unified diff, its blocks of whole lines, each of them as
+  its size once compressed (32 bits), its length in characters (32 bits)
+  and its zlib compressed UTF-8 encoding; then a size and length of 0.
+
+The index holds the offset of the record of each difference and the number
+of differences in its subtree, itself included (64 bits each). The details
+of a difference are therefore the one following it, the one following the
+subtree of that one, and so on. The trailer holds the offset of the index
+and the number of differences (64 bits each), then ``MAGIC`` again.
+
+Unified diffs are read from the file as they are output, and differences
+when they are visited, so that any subtree can be loaded without reading
+the rest of the file.
+"""
+
+import os
+import zlib
+import array
+import struct
+import threading
+
+from .difference import Difference
+from .diffstore import UnifiedDiff
+from .presenters.utils import Presenter
+
+MAGIC = b'diffoscope-diff\n'
+VERSION = 1
+
+HEADER = struct.Struct('<%dsB' % len(MAGIC))
+TRAILER = struct.Struct('<QQ%ds' % len(MAGIC))
+FLAGS = struct.Struct('<B')
+SIZE = struct.Struct('<I')
+BLOCK = struct.Struct('<II')
+INDEX = struct.Struct('<QQ')
+
+FLAG_UNIFIED_DIFF = 1
+FLAG_INTERNAL_LINENOS = 2
+
+
+class DiffFileWriter(Presenter):
+    """
+    Writes each difference as it is visited to the binary file f, see the
+    module documentation.
+    """
+
+    def __init__(self, f):
+        self.f = f
+        self.offset = 0
+        self.offsets = array.array('Q')
+        self.sizes = array.array('Q')
+        self.parents = []
+
+        super().__init__()
+
+    def open(self):
+        self.write(HEADER.pack(MAGIC, VERSION))
+
+    def enter(self, difference):
+        self.parents.append(len(self.offsets))
+        self.offsets.append(self.offset)
+        self.sizes.append(0)
+
+        flags = 0
+        if difference.has_unified_diff:
+            flags |= FLAG_UNIFIED_DIFF
+        if difference.has_internal_linenos:
+            flags |= FLAG_INTERNAL_LINENOS
+
+        self.write(FLAGS.pack(flags))
+        self.write_string(difference.source1)
+        self.write_string(difference.source2)
+        self.write(SIZE.pack(len(difference.comments)))
+        for x in difference.comments:
+            self.write_string(x)
+
+        if flags & FLAG_UNIFIED_DIFF:
+            for block in difference.iter_unified_diff():
+                data = zlib.compress(encode(block.text))
+                self.write(BLOCK.pack(len(data), len(block)))
+                self.write(data)
+            self.write(BLOCK.pack(0, 0))
+
+    def leave(self, difference):
+        index = self.parents.pop()
+        self.sizes[index] = len(self.offsets) - index
+
+    def close(self):
+        index = self.offset
+        for x in zip(self.offsets, self.sizes):
+            self.write(INDEX.pack(*x))
+        self.write(TRAILER.pack(index, len(self.offsets), MAGIC))
+
+    def write(self, data):
+        # Output may not be seekable, eg. a pipe
+        self.f.write(data)
+        self.offset += len(data)
+
+    def write_string(self, val):
+        data = encode(val)
+        self.write(SIZE.pack(len(data)))
+        self.write(data)
+
+
+class DiffFile(object):
+    """
+    A file written by ``DiffFileWriter``, whose differences are numbered in
+    the order they were visited.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.f = open(path, 'rb')
+
+        magic, version = HEADER.unpack(self.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError("{}: not a file saved by --save-diff".format(path))
+        if version != VERSION:
+            raise ValueError("{}: unsupported version {}".format(path, version))
+
+        self.f.seek(-TRAILER.size, os.SEEK_END)
+        index, count, magic = TRAILER.unpack(self.read(TRAILER.size))
+        if magic != MAGIC:
+            raise ValueError("{}: truncated file".format(path))
+
+        self.f.seek(index)
+        self.offsets = array.array('Q')
+        self.sizes = array.array('Q')
+        for offset, size in INDEX.iter_unpack(self.read(count * INDEX.size)):
+            self.offsets.append(offset)
+            self.sizes.append(size)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def read(self, size):
+        data = self.f.read(size)
+        if len(data) != size:
+            raise ValueError("{}: truncated file".format(self.path))
+        return data
+
+    def get_details(self, index):
+        """
+        Yield the indexes of the details of the given difference.
+        """
+
+        end = index + self.sizes[index]
+        index += 1
+        while index < end:
+            yield index
+            index += self.sizes[index]
+
+    def get_difference(self, index=0):
+        """
+        Load the given difference; its details are only loaded once they are
+        visited, see ``Difference.add_lazy_details``.
+        """
+
+        with self.lock:
+            self.f.seek(self.offsets[index])
+            difference = self.read_difference()
+
+        difference.add_lazy_details(
+            self.get_difference(x) for x in self.get_details(index)
+        )
+
+        return difference
+
+    def read_difference(self):
+        flags, = FLAGS.unpack(self.read(FLAGS.size))
+        source1 = self.read_string()
+        source2 = self.read_string()
+        comments = [
+            self.read_string()
+            for _ in range(SIZE.unpack(self.read(SIZE.size))[0])
+        ]
+
+        unified_diff = None
+        if flags & FLAG_UNIFIED_DIFF:
+            blocks = []
+            length = 0
+            while True:
+                size, block_length = BLOCK.unpack(self.read(BLOCK.size))
+                if not size:
+                    break
+                # Blocks are read back as those stored by the DiffStore
+                blocks.append((self.f, self.f.tell(), size))
+                length += block_length
+                self.f.seek(size, os.SEEK_CUR)
+            unified_diff = UnifiedDiff(blocks, length)
+
+        return Difference(
+            unified_diff,
+            source1,
+            source2,
+            comment=comments,
+            has_internal_linenos=bool(flags & FLAG_INTERNAL_LINENOS),
+        )
+
+    def read_string(self):
+        size, = SIZE.unpack(self.read(SIZE.size))
+        return self.read(size).decode('utf-8', errors='surrogatepass')
+
+
+def encode(val):
+    return val.encode('utf-8', errors='surrogatepass')
+
+def load_diff(path):
+    """
+    Return the ``Difference`` tree saved in the file at path, or None if
+    there were no differences.
+    """
+
+    diff_file = DiffFile(path)
+    if not len(diff_file):
+        return None
+    return diff_file.get_difference()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# diffoscope: in-depth comparison of files, archives, and directories
+#
+# Copyright © 2026 agent <agent@local>
+#
+# diffoscope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# diffoscope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Compare the throughput of filtering objdump and readelf output with
+Command.filter_block against the per-line filters they replaced.
+
+Usage: tests/benchmarks/command_filters.py [MiB ...]
+"""
+
+import io
+import os
+import re
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from diffoscope.difference import make_feeder_from_raw_reader, \
+    make_feeder_from_raw_blocks
+from diffoscope.comparators.elf import ObjdumpDisassembleSection, \
+    ReadelfSymbols
+
+PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'test1.o')
+
+RE_SYMBOL_COMMENT = re.compile(rb'^( +[0-9a-f]+:[^#]+)# [0-9a-f]+ <[^>]+>$')
+RE_ARCHIVE = re.compile(r'^File: %s\(' % re.escape(PATH))
+
+
+def objdump_filter(line):
+    if line.startswith(PATH.encode('utf-8') + b':'):
+        return b''
+    if line.startswith(b'In archive'):
+        return b''
+    return RE_SYMBOL_COMMENT.sub(r'\1', line)
+
+def readelf_filter(line):
+    try:
+        line = RE_ARCHIVE.sub('File: lib.a(', line.decode('utf-8'))
+        return line.replace(PATH, '<elf>').encode('utf-8')
+    except UnicodeDecodeError:
+        return line
+
+def make_objdump_output(rnd, size):
+    lines = []
+    address = 0x400000
+    while size > 0:
+        if rnd.random() < 0.1:
+            line = '  {:x}:\te8 05 ff ff ff       \tcallq  4003e0 # {:x} <puts@plt>\n'.format(
+                address,
+                address + rnd.randrange(4096),
+            )
+        else:
+            line = '  {:x}:\t48 89 e5             \tmov    %rsp,%rbp\n'.format(address)
+        lines.append(line.encode('utf-8'))
+        address += rnd.randrange(1, 8)
+        size -= len(line)
+    return b''.join(lines)
+
+def make_readelf_output(rnd, size):
+    lines = []
+    while size > 0:
+        line = '  {:5d}: {:016x}    {:2d} FUNC    GLOBAL DEFAULT   13 sym_{:x}\n'.format(
+            len(lines),
+            rnd.getrandbits(32),
+            rnd.randrange(64),
+            rnd.getrandbits(24),
+        )
+        lines.append(line.encode('utf-8'))
+        size -= len(line)
+    return b''.join(lines)
+
+def make_command(klass, *args):
+    command = klass(PATH, *args)
+    command.stdout.read()
+    command.wait()
+    return command
+
+def timed(make_feeder, data):
+    out = io.BytesIO()
+    start = time.time()
+    make_feeder(io.BufferedReader(io.BytesIO(data)))(out)
+    return time.time() - start, out.getvalue()
+
+def main(sizes):
+    rnd = random.Random(0)
+
+    cases = (
+        (
+            'objdump',
+            make_objdump_output,
+            objdump_filter,
+            make_command(ObjdumpDisassembleSection, '.text').filter_block,
+        ),
+        (
+            'readelf',
+            make_readelf_output,
+            readelf_filter,
+            make_command(ReadelfSymbols).filter_block,
+        ),
+    )
+
+    print("{:>8} {:>6} {:>14} {:>14}".format("command", "MiB", "line (MiB/s)", "block (MiB/s)"))
+
+    for size in sizes:
+        for name, make_output, filter, filter_block in cases:
+            data = make_output(rnd, size * 2 ** 20)
+
+            t_line, expected = timed(
+                lambda f: make_feeder_from_raw_reader(f, filter),
+                data,
+            )
+            t_block, result = timed(
+                lambda f: make_feeder_from_raw_blocks(f, filter_block),
+                data,
+            )
+            assert result == expected
+
+            print("{:>8} {:6d} {:14.1f} {:14.1f}".format(
+                name,
+                size,
+                size / t_line,
+                size / t_block,
+            ))
+
+if __name__ == '__main__':
+    main([int(x) for x in sys.argv[1:]] or [10, 50])
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# diffoscope: in-depth comparison of files, archives, and directories
+#
+# Copyright © 2026 agent <agent@local>
+#
+# diffoscope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# diffoscope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Compare the time taken by perform_fuzzy_matching, which only scores pairs
+of members whose digest headers allow a match, against the naive all-pairs
+matching it replaced.
+
+Usage: tests/benchmarks/fuzzy_matching.py [N ...]
+"""
+
+import os
+import sys
+import time
+import random
+import operator
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+import tlsh
+
+from diffoscope.config import Config
+from diffoscope.comparators.utils.fuzzy import perform_fuzzy_matching
+
+# Beyond this the all-pairs matching takes too long to be worth waiting for
+MAX_NAIVE = 2000
+
+
+class Member(object):
+    def __init__(self, fuzzy_hash):
+        self.fuzzy_hash = fuzzy_hash
+
+    def is_directory(self):
+        return False
+
+
+def naive_fuzzy_matching(members1, members2):
+    already_compared = set()
+    for name1, file1 in members1.items():
+        comparisons = []
+        for name2, file2 in members2.items():
+            if name2 in already_compared:
+                continue
+            comparisons.append((tlsh.diff(file1.fuzzy_hash, file2.fuzzy_hash), name2))
+        if comparisons:
+            comparisons.sort(key=operator.itemgetter(0))
+            score, name2 = comparisons[0]
+            if score < Config().fuzzy_threshold:
+                yield name1, name2, score
+                already_compared.add(name2)
+
+def make_members(rnd, n):
+    """
+    Create two sets of n members of log-uniformly distributed sizes, where a
+    third of the second set are slightly modified copies of the first.
+    """
+
+    def content(size):
+        return rnd.getrandbits(size * 8).to_bytes(size, 'little')
+
+    def size():
+        return int(2 ** rnd.uniform(9, 18))
+
+    members1, members2 = {}, {}
+    for x in range(n):
+        data = content(size())
+        members1['a{}'.format(x)] = Member(tlsh.hash(data))
+
+        if x % 3 == 0:
+            data = bytearray(data)
+            for y in range(rnd.randint(1, 10)):
+                data[rnd.randrange(len(data))] = rnd.getrandbits(8)
+            data = bytes(data)
+        else:
+            data = content(size())
+        members2['b{}'.format(x)] = Member(tlsh.hash(data))
+
+    return members1, members2
+
+def timed(fn, *args):
+    start = time.time()
+    result = list(fn(*args))
+    return time.time() - start, result
+
+def main(sizes):
+    rnd = random.Random(0)
+
+    print("{:>8} {:>12} {:>12} {:>8}".format("members", "index (s)", "naive (s)", "matches"))
+
+    for n in sizes:
+        members1, members2 = make_members(rnd, n)
+
+        t_index, result = timed(perform_fuzzy_matching, members1, members2)
+
+        if n <= MAX_NAIVE:
+            t_naive, expected = timed(naive_fuzzy_matching, members1, members2)
+            assert result == expected
+            naive = "{:12.2f}".format(t_naive)
+        else:
+            naive = "{:>12}".format("-")
+
+        print("{:>8} {:12.2f} {} {:>8}".format(n, t_index, naive, len(result)))
+
+if __name__ == '__main__':
+    main([int(x) for x in sys.argv[1:]] or [500, 1000, 2000, 5000, 10000])
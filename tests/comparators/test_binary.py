@@ -52,6 +52,30 @@ def test_same_content(binary1):
 def test_not_same_content(binary1, binary2):
     assert binary1.has_same_content_as(binary2) is False
 
+def test_same_content_large_files(tmpdir, monkeypatch):
+    monkeypatch.setattr('diffoscope.comparators.utils.file.CMP_BLOCK_SIZE', 1024)
+    data = os.urandom(10 * 1024 + 1)
+    paths = []
+    for name, content in (
+        ('a', data),
+        ('b', data),
+        ('c', data[:-1] + b'x'),
+        ('d', data[:-1]),
+    ):
+        tmpdir.join(name).write_binary(content)
+        paths.append(str(tmpdir.join(name)))
+    a, b, c, d = (FilesystemFile(x) for x in paths)
+    assert a.has_same_content_as(b) is True
+    assert a.has_same_content_as(c) is False
+    assert a.has_same_content_as(d) is False
+
+def test_different_sizes_are_not_read(binary1, monkeypatch):
+    def same_contents(*args):
+        raise AssertionError("Should not be called")
+    monkeypatch.setattr('diffoscope.comparators.utils.file.same_contents', same_contents)
+    other = FilesystemFile(TEST_ASCII_PATH)
+    assert binary1.has_same_content_as(other) is False
+
 def test_guess_file_type():
     assert File.guess_file_type(TEST_FILE1_PATH) == 'data'
 
@@ -24,6 +24,7 @@ import pytest
 
 from diffoscope.comparators.binary import FilesystemFile
 from diffoscope.comparators.directory import compare_directories
+from diffoscope.comparators.utils import compare
 from diffoscope.comparators.utils.specialize import specialize
 
 from utils.data import data, get_data
@@ -100,3 +101,32 @@ def test_compare_to_dangling_symlink(tmpdir):
     b = specialize(FilesystemFile(path))
 
     assert a.compare(b).unified_diff == get_data('test_directory_symlink_diff')
+
+def test_members_compared_lazily(tmpdir, monkeypatch):
+    for x in 'ab':
+        for y in range(5):
+            tmpdir.join(x, 'file{}'.format(y)).write(x + '\n', ensure=True)
+            os.utime(str(tmpdir.join(x, 'file{}'.format(y))), (0, 0))
+        os.utime(str(tmpdir.join(x)), (0, 0))
+
+    compared = []
+
+    def compare_files(file1, file2, source=None):
+        compared.append(source)
+        return orig_compare_files(file1, file2, source)
+
+    orig_compare_files = compare.compare_files
+    monkeypatch.setattr(compare, 'compare_files', compare_files)
+
+    difference = compare_directories(str(tmpdir.join('a')), str(tmpdir.join('b')))
+
+    # Only up to the first difference, which may be in the metadata
+    assert len(compared) <= 1
+
+    members = []
+    for x in difference.iter_details():
+        if x.source1.startswith('file'):
+            members.append(x.source1)
+            assert compared == members
+
+    assert members == ['file{}'.format(x) for x in range(5)]
@@ -18,10 +18,12 @@
 # along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
 
 import pytest
+import shutil
 import os.path
 
 from diffoscope.config import Config
-from diffoscope.comparators.elf import ElfFile, StaticLibFile
+from diffoscope.comparators.elf import ElfFile, StaticLibFile, \
+    ObjdumpDisassembleSection, ReadelfFileHeader
 from diffoscope.comparators.binary import FilesystemFile
 from diffoscope.comparators.directory import FilesystemDirectory
 from diffoscope.comparators.missing_file import MissingFile
@@ -53,6 +55,38 @@ def test_obj_compare_non_existing(monkeypatch, obj1):
     assert difference.source2 == '/nonexisting'
     assert len(difference.details) > 0
 
+@skip_unless_tools_exist('objdump')
+def test_objdump_filter_block(obj1):
+    command = ObjdumpDisassembleSection(obj1.path, '.text')
+    command.stdout.read()
+    command.wait()
+
+    block = (
+        '{}:     file format elf64-x86-64\n'
+        '  4004d6:\tcallq  4003e0 # 4003e0 <puts@plt>\n'
+        '  4004db:\tmov    %eax,%ebx # not a symbol\n'
+        'In archive lib.a:\n'
+        ' # 4003e0 <puts@plt>'
+    ).format(obj1.path).encode('utf-8')
+
+    assert command.filter_block(block) == (
+        b'  4004d6:\tcallq  4003e0 \n'
+        b'  4004db:\tmov    %eax,%ebx # not a symbol\n'
+        b' # 4003e0 <puts@plt>'
+    )
+
+@skip_unless_tools_exist('readelf')
+def test_readelf_filter_block_undecodable_path(tmpdir):
+    path = os.path.join(str(tmpdir), os.fsdecode(b'test\xff.o'))
+    shutil.copy(data('test1.o'), path)
+    command = ReadelfFileHeader(path)
+    command.stdout.read()
+    command.wait()
+
+    block = b'File: ' + os.fsencode(path) + b'(test1.o)\n' + os.fsencode(path) + b'\n'
+
+    assert command.filter_block(block) == b'File: lib.a(test1.o)\n<elf>\n'
+
 @skip_unless_tools_exist('readelf')
 @skip_if_binutils_does_not_support_x86()
 def test_diff(obj_differences):
@@ -78,6 +112,19 @@ def test_lib_no_differences(lib1):
     difference = lib1.compare(lib1)
     assert difference is None
 
+@skip_unless_tools_exist('readelf', 'objdump')
+def test_lib_parallel_differences(monkeypatch):
+    def compare():
+        lib1 = specialize(FilesystemFile(TEST_LIB1_PATH))
+        lib2 = specialize(FilesystemFile(TEST_LIB2_PATH))
+        return [
+            (x.source1, x.unified_diff) for x in lib1.compare(lib2).details
+        ]
+
+    expected = compare()
+    monkeypatch.setattr(Config(), 'jobs', 4)
+    assert compare() == expected
+
 @pytest.fixture
 def lib_differences(lib1, lib2):
     return lib1.compare(lib2).details
@@ -17,11 +17,17 @@
 # You should have received a copy of the GNU General Public License
 # along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
 
+import io
 import pytest
+import tarfile
+import libarchive
+import collections
 
 from diffoscope.config import Config
 from diffoscope.comparators.tar import TarFile
+from diffoscope.comparators.binary import FilesystemFile
 from diffoscope.comparators.missing_file import MissingFile
+from diffoscope.comparators.utils.specialize import specialize
 
 from utils.data import load_fixture, get_data
 from utils.nonexisting import assert_non_existing
@@ -58,6 +64,65 @@ def test_text_file(differences):
     expected_diff = get_data('text_ascii_expected_diff')
     assert differences[1].unified_diff == expected_diff
 
+def test_archive_is_read_once(monkeypatch, tar1, tar2):
+    calls = collections.Counter()
+    file_reader = libarchive.file_reader
+
+    def counting_file_reader(path, *args, **kwargs):
+        calls[path] += 1
+        return file_reader(path, *args, **kwargs)
+    monkeypatch.setattr(libarchive, 'file_reader', counting_file_reader)
+
+    tar1.compare(tar2)
+
+    assert calls == {tar1.path: 1, tar2.path: 1}
+
+def make_tar(path, contents):
+    with tarfile.open(path, 'w') as tar:
+        for name, data in sorted(contents.items()):
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return specialize(FilesystemFile(path))
+
+def test_lazy_extraction(monkeypatch, tmpdir):
+    monkeypatch.setattr(Config(), 'lazy_extraction', True)
+
+    same = b'identical\n' * 100
+    lazy1 = make_tar(str(tmpdir.join('lazy1.tar')), {'same': same, 'changed': b'a\n'})
+    lazy2 = make_tar(str(tmpdir.join('lazy2.tar')), {'same': same, 'changed': b'b\n'})
+
+    difference = lazy1.compare(lazy2)
+
+    assert [x.source1 for x in difference.details] == ['changed']
+    for x in (lazy1, lazy2):
+        assert x.as_container._extracted == {'changed'}
+
+def test_lazy_extraction_output(monkeypatch, tar1, tar2):
+    expected = [(x.source1, x.unified_diff) for x in tar1.compare(tar2).details]
+
+    monkeypatch.setattr(Config(), 'lazy_extraction', True)
+    lazy1 = specialize(FilesystemFile(tar1.path))
+    lazy2 = specialize(FilesystemFile(tar2.path))
+
+    assert [(x.source1, x.unified_diff) for x in lazy1.compare(lazy2).details] == expected
+
+def test_digests_recorded_on_extraction(monkeypatch, tmpdir):
+    same = b'identical\n' * 100
+    tar1 = make_tar(str(tmpdir.join('tar1.tar')), {'same': same, 'changed': b'a\n'})
+    tar2 = make_tar(str(tmpdir.join('tar2.tar')), {'same': same, 'changed': b'b\n'})
+
+    def same_contents(*args):
+        raise AssertionError("Should not be called")
+    monkeypatch.setattr('diffoscope.comparators.utils.file.same_contents', same_contents)
+
+    member1 = tar1.as_container.get_member('same')
+    member2 = tar2.as_container.get_member('same')
+    assert member1.size == len(same)
+    assert member1.has_same_content_as(member2) is True
+    assert tar1.as_container.get_member('changed').has_same_content_as(
+        tar2.as_container.get_member('changed')) is False
+
 def test_compare_non_existing(monkeypatch, tar1):
     assert_non_existing(monkeypatch, tar1)
 
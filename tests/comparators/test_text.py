@@ -19,6 +19,8 @@
 
 import codecs
 
+from diffoscope.diffstore import DiffBlock
+from diffoscope.comparators.text import order_only_difference
 from diffoscope.comparators.binary import FilesystemFile
 from diffoscope.comparators.utils.specialize import specialize
 
@@ -75,3 +77,12 @@ def test_ordering_differences(text_order1, text_order2):
     difference = text_order1.compare(text_order2)
     assert difference.comments == ['ordering differences only']
     assert difference.unified_diff == get_data('text_order_expected_diff')
+
+def test_order_only_difference():
+    def blocks(*lines):
+        return [DiffBlock.from_lines(lines)]
+
+    assert order_only_difference(blocks('@@ -1,2 +1,2 @@', '-a', '-b', '+b', '+a'))
+    assert not order_only_difference(blocks('@@ -1,2 +1,2 @@', '-a', '-b', '+a', '+c'))
+    assert not order_only_difference(blocks('@@ -1,2 +1,2 @@', '-a', '-a', '+a', '+b'))
+    assert not order_only_difference(blocks('@@ -1,1 +1,1 @@', ' a', '-b', '+b'))
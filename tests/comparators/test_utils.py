@@ -17,12 +17,21 @@
 # You should have received a copy of the GNU General Public License
 # along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
 
+import time
 import codecs
+import random
 import pytest
+import operator
+import threading
 
+from diffoscope.exc import RequiredToolNotFound
+from diffoscope.tools import tool_required
 from diffoscope.config import Config
+from diffoscope.jobserver import JobServer
 from diffoscope.difference import Difference
-from diffoscope.comparators.utils.command import Command
+from diffoscope.comparators.utils.fuzzy import perform_fuzzy_matching
+from diffoscope.comparators.utils.command import Command, CommandManager, \
+    FEED_STDIN_THREADS, STDIN_BLOCK_SIZE
 
 from utils.data import data, load_fixture
 from utils.tools import tools_missing, skip_unless_tools_exist, \
@@ -90,6 +99,51 @@ def test_no_fuzzy_matching_new_file(monkeypatch, fuzzy_tar_in_tar1, fuzzy_tar_in
     assert difference.details[1].source2 == '/dev/null'
     assert difference.details[2].source1 == '/dev/null'
 
+class FuzzyMember(object):
+    def __init__(self, fuzzy_hash):
+        self.fuzzy_hash = fuzzy_hash
+
+    def is_directory(self):
+        return False
+
+def brute_force_fuzzy_matching(members1, members2):
+    import tlsh
+
+    already_compared = set()
+    for name1, file1 in members1.items():
+        comparisons = []
+        for name2, file2 in members2.items():
+            if name2 in already_compared:
+                continue
+            comparisons.append((tlsh.diff(file1.fuzzy_hash, file2.fuzzy_hash), name2))
+        if comparisons:
+            comparisons.sort(key=operator.itemgetter(0))
+            score, name2 = comparisons[0]
+            if score < Config().fuzzy_threshold:
+                yield name1, name2, score
+                already_compared.add(name2)
+
+@skip_unless_module_exists('tlsh')
+@pytest.mark.parametrize('threshold', (20, 60, 400))
+def test_fuzzy_matching_index(monkeypatch, threshold):
+    import tlsh
+
+    monkeypatch.setattr(Config(), 'fuzzy_threshold', threshold)
+
+    rnd = random.Random(0)
+    words = ['{:08x}'.format(rnd.getrandbits(32)) for x in range(200)]
+
+    def member():
+        vocabulary = words[:rnd.randint(5, len(words))]
+        text = ' '.join(rnd.choice(vocabulary) for x in range(rnd.randint(100, 3000)))
+        return FuzzyMember(tlsh.hash(text.encode('ascii')))
+
+    members1 = {'a{}'.format(x): member() for x in range(100)}
+    members2 = {'b{}'.format(x): member() for x in range(100)}
+
+    assert list(perform_fuzzy_matching(members1, members2)) == \
+        list(brute_force_fuzzy_matching(members1, members2))
+
 @skip_unless_tools_exist('tee')
 def test_trim_stderr_in_command():
     class FillStderr(Command):
@@ -101,3 +155,129 @@ def test_trim_stderr_in_command():
                 stdin.write('error {}\n'.format(self.path).encode('utf-8'))
     difference = Difference.from_command(FillStderr, 'dummy1', 'dummy2')
     assert '[ 1 lines ignored ]' in difference.comment
+
+class Cat(Command):
+    def cmdline(self):
+        return ['cat']
+
+    def feed_stdin(self, stdin):
+        stdin.write(self.path.encode('utf-8'))
+
+@skip_unless_tools_exist('cat')
+def test_commands_do_not_start_threads(monkeypatch):
+    monkeypatch.setattr(Config(), 'jobs', 5)
+    CommandManager().call_soon(lambda: None)
+    before = threading.active_count()
+
+    commands = [Cat(str(x)) for x in range(10)]
+    assert threading.active_count() <= before + FEED_STDIN_THREADS
+
+    for x, command in enumerate(commands):
+        assert command.stdout.read() == str(x).encode('utf-8')
+        assert command.wait() == 0
+
+@skip_unless_tools_exist('cat')
+def test_blocking_feed_stdin_does_not_stall_other_commands(monkeypatch):
+    monkeypatch.setattr(Config(), 'jobs', 2)
+    blocked = threading.Event()
+    timed_out = []
+
+    class Blocking(Cat):
+        def feed_stdin(self, stdin):
+            timed_out.append(not blocked.wait(5))
+            super().feed_stdin(stdin)
+
+    blocking = Blocking('1')
+    command = Cat('2')
+
+    # Only unblocked once the other command is done
+    assert command.stdout.read() == b'2'
+    assert command.wait() == 0
+    blocked.set()
+
+    assert blocking.stdout.read() == b'1'
+    assert blocking.wait() == 0
+    assert timed_out == [False]
+
+@skip_unless_tools_exist('cat')
+def test_feed_stdin_is_streamed():
+    received = threading.Event()
+    timed_out = []
+
+    class Streaming(Cat):
+        def feed_stdin(self, stdin):
+            stdin.write(b'x' * STDIN_BLOCK_SIZE)
+            timed_out.append(not received.wait(5))
+
+    command = Streaming('1')
+
+    # Read while feed_stdin has not returned yet
+    assert command.stdout.read(STDIN_BLOCK_SIZE) == b'x' * STDIN_BLOCK_SIZE
+    received.set()
+
+    assert command.stdout.read() == b''
+    assert command.wait() == 0
+    assert timed_out == [False]
+
+@skip_unless_tools_exist('cat')
+def test_feed_stdin_waits_for_the_command():
+    written = []
+
+    class Endless(Cat):
+        def feed_stdin(self, stdin):
+            for _ in range(1000):
+                stdin.write(b'x' * STDIN_BLOCK_SIZE)
+                written.append(1)
+
+    command = Endless('1')
+    time.sleep(0.5)
+
+    # Only what fits in the pipes is written until cat is read from
+    assert len(written) < 100
+
+    assert len(command.stdout.read()) == 1000 * STDIN_BLOCK_SIZE
+    assert command.wait() == 0
+    assert len(written) == 1000
+
+@skip_unless_tools_exist('cat')
+def test_running_commands_are_bounded(monkeypatch):
+    monkeypatch.setattr(Config(), 'jobs', 1)
+    commands = [Cat('1'), Cat('2')]
+    started = threading.Event()
+
+    def target():
+        commands.append(Cat('3'))
+        started.set()
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    assert not started.wait(0.2)
+
+    commands[0].close()
+    assert started.wait(5)
+    thread.join()
+
+    for command in commands:
+        command.close()
+
+def test_missing_tool_releases_slot(monkeypatch):
+    class Missing(Command):
+        @tool_required('/missing')
+        def cmdline(self):
+            return ['/missing']
+
+    monkeypatch.setattr(Config(), 'jobs', 1)
+    for _ in range(3):
+        with pytest.raises(RequiredToolNotFound):
+            Missing('dummy')
+    assert JobServer().acquire(block=False)
+
+def test_exact_matching(monkeypatch, fuzzy_tar_in_tar1, fuzzy_tar_in_tar2):
+    # Renamed identical files are paired even without tlsh
+    monkeypatch.setattr('diffoscope.comparators.utils.fuzzy.tlsh', None)
+    difference = fuzzy_tar_in_tar1.compare(fuzzy_tar_in_tar2)
+    assert len(difference.details) == 2
+    assert difference.details[1].source1 == 't/test1.tar'
+    assert difference.details[1].source2 == 't/test2.tar'
+    assert difference.details[1].comment == 'Files identical despite different names'
+    assert difference.details[1].details == []
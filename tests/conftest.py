@@ -19,8 +19,12 @@
 
 import pytest
 
+from diffoscope.config import Config
 from diffoscope.locale import set_locale
+from diffoscope.parallel import ParallelManager
 from diffoscope.progress import ProgressManager
+from diffoscope.jobserver import JobServer
+from diffoscope.diffstore import DiffStore
 from diffoscope.comparators import ComparatorManager
 
 
@@ -36,3 +40,21 @@ def reload_comparators():
 @pytest.fixture(autouse=True)
 def reset_progress():
     ProgressManager().reset()
+
+@pytest.fixture(autouse=True)
+def reset_jobserver():
+    JobServer().reset()
+
+@pytest.fixture(autouse=True)
+def reset_diffstore():
+    DiffStore().reset()
+
+@pytest.fixture(autouse=True)
+def reset_parallel():
+    ParallelManager().reset()
+
+@pytest.fixture(autouse=True)
+def restore_config(monkeypatch):
+    # main() keeps these options in Config() once it returns
+    for name in ('jobs', 'lazy_extraction', 'max_diff_memory'):
+        monkeypatch.setattr(Config(), name, getattr(Config(), name))
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+#
+# diffoscope: in-depth comparison of files, archives, and directories
+#
+# Copyright © 2026 agent <agent@local>
+#
+# diffoscope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# diffoscope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import pytest
+
+from diffoscope.cache import CacheManager, MISSING
+from diffoscope.comparators.binary import FilesystemFile
+
+from test_main import run, TEST_TAR1_PATH, TEST_TAR2_PATH
+
+
+@pytest.fixture(autouse=True)
+def reset_cache():
+    yield
+    CacheManager().reset()
+
+def test_disabled_by_default(capsys):
+    run(capsys, TEST_TAR1_PATH, TEST_TAR2_PATH)
+
+    assert not CacheManager().enabled
+
+def test_cached_result_is_reused(capsys, tmpdir, monkeypatch):
+    cache_dir = str(tmpdir.join('cache'))
+
+    ret, out, _ = run(capsys, '--cache-dir', cache_dir, TEST_TAR1_PATH, TEST_TAR2_PATH)
+    assert ret == 1
+    assert os.listdir(cache_dir)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("Cached result not used")
+    monkeypatch.setattr(
+        'diffoscope.comparators.utils.compare.specialize_and_compare_files',
+        fail,
+    )
+
+    ret_cached, out_cached, _ = run(capsys, '--cache-dir', cache_dir, TEST_TAR1_PATH, TEST_TAR2_PATH)
+    assert ret_cached == ret
+    assert out_cached == out
+
+def test_no_cache(capsys, tmpdir):
+    cache_dir = str(tmpdir.join('cache'))
+
+    run(capsys, '--cache-dir', cache_dir, '--no-cache', TEST_TAR1_PATH, TEST_TAR2_PATH)
+
+    assert not os.path.exists(cache_dir)
+
+def test_eviction(tmpdir):
+    manager = CacheManager()
+    manager.path = str(tmpdir)
+    manager.max_size = 1000
+
+    for x in range(10):
+        manager.set('{:064x}'.format(x), 'x' * 200)
+        # Ensure distinct modification times
+        os.utime(manager.filename('{:064x}'.format(x)), (x, x))
+
+    assert manager.get('{:064x}'.format(0)) is MISSING
+    assert manager.get('{:064x}'.format(9)) == 'x' * 200
+    assert sum(x[2] for x in manager.entries()) <= 1000
+
+def test_key_depends_on_python_modules(monkeypatch):
+    manager = CacheManager()
+    file1 = FilesystemFile(TEST_TAR1_PATH)
+    file2 = FilesystemFile(TEST_TAR2_PATH)
+
+    key = manager.key(file1, file2, None)
+    monkeypatch.setattr(manager, '_modules', 'numpy')
+
+    assert manager.key(file1, file2, None) != key
+
+def test_cache_dir_writable_by_others(capsys, tmpdir):
+    cache_dir = tmpdir.mkdir('cache')
+    cache_dir.chmod(0o777)
+
+    ret, _, err = run(capsys, '--cache-dir', str(cache_dir), TEST_TAR1_PATH, TEST_TAR2_PATH)
+
+    assert ret == 2
+    assert 'not writable by others' in err
+    assert not os.listdir(str(cache_dir))
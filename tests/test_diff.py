@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+#
+# diffoscope: in-depth comparison of files, archives, and directories
+#
+# Copyright © 2026 agent <agent@local>
+#
+# diffoscope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# diffoscope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
+
+import random
+import pytest
+import subprocess
+
+from diffoscope import diff, patience
+from diffoscope.diff import Spool
+from diffoscope.diffstore import DiffBlock
+from diffoscope.difference import make_feeder_from_text
+from diffoscope.tools import find_executable
+from diffoscope.myers import unified_diff, TooExpensive
+
+from comparators.utils.tools import skip_unless_module_exists
+
+
+def run_gnu_diff(tmpdir, content1, content2):
+    path1 = tmpdir.join('a')
+    path2 = tmpdir.join('b')
+    path1.write_binary(content1)
+    path2.write_binary(content2)
+
+    p = subprocess.Popen(
+        ('diff', '-aU7', str(path1), str(path2)),
+        stdout=subprocess.PIPE,
+    )
+    output = p.communicate()[0]
+
+    # Strip the ---/+++ headers
+    return b''.join(output.splitlines(True)[2:])
+
+def run_unified_diff(content1, content2):
+    return b''.join(unified_diff(
+        content1.splitlines(True),
+        content2.splitlines(True),
+    ))
+
+def random_contents(rnd):
+    vocabulary = [b'', b'{', b'}'] + \
+        [b'line %d' % x for x in range(rnd.choice((2, 5, 50)))]
+    lines1 = [rnd.choice(vocabulary) for _ in range(rnd.choice((0, 1, 10, 100, 500)))]
+    lines2 = list(lines1)
+
+    for _ in range(rnd.choice((0, 1, 5, 50))):
+        x = rnd.randint(0, len(lines2))
+        op = rnd.random()
+        if op < 0.4:
+            lines2.insert(x, rnd.choice(vocabulary))
+        elif lines2:
+            x = min(x, len(lines2) - 1)
+            if op < 0.8:
+                del lines2[x]
+            else:
+                lines2[x] = rnd.choice(vocabulary)
+
+    def join(lines):
+        if lines and rnd.random() < 0.8:
+            return b'\n'.join(lines) + b'\n'
+        return b'\n'.join(lines)
+
+    return join(lines1), join(lines2)
+
+@pytest.mark.skipif(not find_executable('diff'), reason="requires diff")
+@pytest.mark.parametrize('seed', range(10))
+def test_same_output_as_diff(tmpdir, seed):
+    rnd = random.Random(seed)
+    for _ in range(50):
+        content1, content2 = random_contents(rnd)
+        assert run_unified_diff(content1, content2) == \
+            run_gnu_diff(tmpdir, content1, content2)
+
+def test_no_newline_at_end_of_file():
+    assert run_unified_diff(b'a\nb', b'a\nb\n') == \
+        b'@@ -1,2 +1,2 @@\n a\n-b\n\\ No newline at end of file\n+b\n'
+
+def test_empty():
+    assert run_unified_diff(b'', b'') == b''
+    assert run_unified_diff(b'', b'a\n') == b'@@ -0,0 +1 @@\n+a\n'
+
+def test_budget():
+    lines = [b'%d\n' % x for x in range(1000)]
+    with pytest.raises(TooExpensive):
+        list(unified_diff(lines, lines[::-1], budget=100))
+
+def apply_unified_diff(content, diff):
+    lines = content.splitlines(True)
+    result = []
+    pos = 0
+    previous = b''
+
+    for line in diff.splitlines(True):
+        if line.startswith(b'@@'):
+            start = int(line.split()[1][1:].split(b',')[0])
+            # Empty ranges start after the given line
+            if line.split()[1].endswith(b',0'):
+                start += 1
+            result.extend(lines[pos:start - 1])
+            pos = start - 1
+        elif line.startswith(b' '):
+            result.append(lines[pos])
+            pos += 1
+        elif line.startswith(b'-'):
+            pos += 1
+        elif line.startswith(b'+'):
+            result.append(line[1:])
+        elif line.startswith(b'\\') and not previous.startswith(b'-'):
+            result[-1] = result[-1].rstrip(b'\n')
+        previous = line
+    result.extend(lines[pos:])
+
+    return b''.join(result)
+
+@skip_unless_module_exists('numpy')
+@pytest.mark.parametrize('seed', range(10))
+def test_patience(tmpdir, seed):
+    rnd = random.Random(seed)
+    path1 = str(tmpdir.join('a'))
+    path2 = str(tmpdir.join('b'))
+
+    for _ in range(50):
+        content1, content2 = random_contents(rnd)
+        with open(path1, 'wb') as f:
+            f.write(content1)
+        with open(path2, 'wb') as f:
+            f.write(content2)
+
+        diff = b''.join(patience.unified_diff(path1, path2))
+        assert (diff == b'') == (content1 == content2)
+        assert apply_unified_diff(content1, diff) == content2
+
+@skip_unless_module_exists('numpy')
+def test_patience_large_region(tmpdir, monkeypatch):
+    monkeypatch.setattr(patience, 'MYERS_MAX_LINES', 10)
+    tmpdir.join('a').write_binary(b'a\n' * 20 + b'x\n')
+    tmpdir.join('b').write_binary(b'b\n' * 20 + b'x\n')
+
+    assert b''.join(patience.unified_diff(
+        str(tmpdir.join('a')),
+        str(tmpdir.join('b')),
+    )) == b'@@ -1,21 +1,21 @@\n' + b'-a\n' * 20 + b'+b\n' * 20 + b' x\n'
+
+def test_spool(tmpdir):
+    path = str(tmpdir.join('spool'))
+
+    with Spool(path, max_size=10) as spool:
+        spool.write(b'0123456789')
+        assert spool.in_memory
+        assert spool.lines == 0
+        assert spool.getvalue() == b'0123456789'
+        spool.write(b'a\n')
+        assert not spool.in_memory
+        assert spool.lines == 1
+        assert open(spool.to_path(), 'rb').read() == b'0123456789a\n'
+
+    assert not tmpdir.join('spool').exists()
+
+def test_identical_inputs_are_not_compared(monkeypatch):
+    def fail(*args):
+        assert False, "identical inputs should not be compared"
+
+    monkeypatch.setattr(diff, 'run_diff', fail)
+    monkeypatch.setattr(diff, 'run_native_diff', fail)
+    monkeypatch.setattr(diff, 'run_patience_diff', fail)
+
+    content = 'line\n' * diff.SPOOL_MAX_SIZE
+    assert diff.diff(
+        make_feeder_from_text(content),
+        make_feeder_from_text(content),
+    ) is None
+
+def test_diff_block():
+    text = '@@ -1,2 +1,2 @@\n a\n-b\n\n+c\n\\ No newline at end of file\n'
+    block = DiffBlock.from_text(text)
+
+    assert block.text == text
+    assert block.tags == '@ -\n+\\'
+    assert list(block.ends) == [16, 19, 22, 23, 26, 54]
+    assert list(block)[1:3] == [(' ', ' a'), ('-', '-b')]
+    assert DiffBlock.from_text('+a\n-b').text == '+a\n-b'
+
+def test_reverse_unified_diff():
+    block = DiffBlock.from_text('@@ -1,2 +1 @@\n a\n-b\n+c\n')
+
+    assert diff.reverse_unified_diff(block).text == \
+        '@@ -1 +1,2 @@\n a\n+b\n-c\n'
+    assert diff.reverse_unified_diff(block).tags == '@ +-'
+
+def test_color_unified_diff():
+    block = DiffBlock.from_text('@@ -1 +1 @@\n a\n-b\n+c')
+
+    assert diff.color_unified_diff(block) == \
+        '\033[0;36m@@ -1 +1 @@\033[0m\n a\n' \
+        '\033[31m-b\033[0m\n\033[32m+c\033[0m'
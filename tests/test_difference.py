@@ -18,19 +18,58 @@
 # along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
 
 import io
+import re
+import pickle
+import random
 import pytest
 
+from diffoscope import patience, difference
 from diffoscope.config import Config
-from diffoscope.difference import Difference
+from diffoscope.difference import Difference, make_feeder_from_raw_reader, \
+    make_feeder_from_raw_blocks
+
+from comparators.utils.tools import skip_unless_module_exists
 
 
 def test_too_much_input_for_diff(monkeypatch):
     monkeypatch.setattr(Config(), 'max_diff_input_lines', 20)
+    monkeypatch.setattr(patience, 'numpy', None)
     too_long_text_a = io.StringIO("a\n" * 21)
     too_long_text_b = io.StringIO("b\n" * 21)
     difference = Difference.from_text_readers(too_long_text_a, too_long_text_b, 'a', 'b')
     assert '[ Too much input for diff ' in difference.unified_diff
 
+@skip_unless_module_exists('numpy')
+def test_large_input_for_diff(monkeypatch):
+    monkeypatch.setattr(Config(), 'max_diff_input_lines', 20)
+    text_a = io.StringIO("a\n" * 10 + "c\n" * 11)
+    text_b = io.StringIO("b\n" * 10 + "c\n" * 11)
+    difference = Difference.from_text_readers(text_a, text_b, 'a', 'b')
+    assert difference.unified_diff == \
+        '@@ -1,17 +1,17 @@\n' + '-a\n' * 10 + '+b\n' * 10 + ' c\n' * 7
+
+@pytest.mark.parametrize('max_lines', (1, 2, 5, 20, float('inf')))
+def test_raw_blocks_feeder(monkeypatch, max_lines):
+    monkeypatch.setattr(Config(), 'max_diff_input_lines', max_lines)
+    monkeypatch.setattr(patience, 'numpy', None)
+    monkeypatch.setattr(difference, 'READ_BLOCK_SIZE', 7)
+
+    def filter(line):
+        return b'' if line.startswith(b'a') else line
+
+    def filter_block(block):
+        return re.sub(rb'(?m)^a.*\n?', b'', block)
+
+    rnd = random.Random(max_lines)
+    for _ in range(50):
+        content = bytes(rnd.choice(b'ab\n') for _ in range(rnd.randint(0, 50)))
+        for args1, args2 in (((), ()), ((filter,), (filter_block,))):
+            by_line = io.BytesIO()
+            by_block = io.BytesIO()
+            make_feeder_from_raw_reader(io.BytesIO(content), *args1)(by_line)
+            make_feeder_from_raw_blocks(io.BytesIO(content), *args2)(by_block)
+            assert by_block.getvalue() == by_line.getvalue()
+
 def test_too_long_diff_block_lines(monkeypatch):
     monkeypatch.setattr(Config(), 'enforce_constraints', False)
     monkeypatch.setattr(Config(), 'max_diff_block_lines_saved', 10)
@@ -49,3 +88,66 @@ def test_non_str_arguments_to_source1_source2():
 
         with pytest.raises(TypeError):
             Difference.from_text_readers(a, b, *x)
+
+def test_diff_stored_on_disk(monkeypatch):
+    text_a = ''.join('{}\n'.format(x) for x in range(1000))
+    text_b = ''.join('{}\n'.format(x * 2) for x in range(1000))
+    expected = Difference.from_text(text_a, text_b, 'a', 'b')
+
+    monkeypatch.setattr('diffoscope.diffstore.BLOCK_SIZE', 100)
+    monkeypatch.setattr(Config(), 'max_diff_memory', 1000)
+    stored = Difference.from_text(text_a, text_b, 'a', 'b')
+
+    assert stored._unified_diff.on_disk
+    assert not expected._unified_diff.on_disk
+    assert stored.unified_diff == expected.unified_diff
+    assert all(x.text.endswith('\n') for x in stored.iter_unified_diff())
+    assert stored.get_reverse().unified_diff == \
+        expected.get_reverse().unified_diff
+    assert pickle.loads(pickle.dumps(stored)).unified_diff == \
+        expected.unified_diff
+
+    # Small diffs are still kept in memory
+    assert Difference.from_text('a', 'b', 'a', 'b').unified_diff == \
+        '@@ -1 +1 @@\n-a\n+b\n'
+
+def test_freed_diffs_do_not_count_towards_memory(monkeypatch):
+    text_a = ''.join('{}\n'.format(x) for x in range(1000))
+    text_b = ''.join('{}\n'.format(x * 2) for x in range(1000))
+    size = len(Difference.from_text(text_a, text_b, 'a', 'b').unified_diff)
+
+    monkeypatch.setattr(Config(), 'max_diff_memory', size)
+    kept = Difference.from_text(text_a, text_b, 'a', 'b')
+    assert not kept._unified_diff.on_disk
+    assert Difference.from_text(text_a, text_b, 'a', 'b')._unified_diff.on_disk
+
+    # Diffs are freed once output when streaming the report
+    del kept
+    assert not Difference.from_text(text_a, text_b, 'a', 'b')._unified_diff.on_disk
+
+def test_lazy_details():
+    computed = []
+
+    def details():
+        for x in ('b', 'c'):
+            computed.append(x)
+            yield Difference.from_text(x, x * 2, x, x)
+
+    def sources(differences):
+        return [x.source1 for x in differences]
+
+    difference = Difference(None, 'a', 'a')
+    difference.add_details([Difference.from_text('a', 'aa', 'a', 'a')])
+    difference.add_lazy_details(details())
+    difference.add_details([Difference.from_text('d', 'dd', 'd', 'd')])
+
+    assert computed == []
+    assert sources(difference.iter_details()) == ['a', 'b', 'c', 'd']
+    assert computed == ['b', 'c']
+    # Lazy details are not kept once iterated over
+    assert sources(difference.details) == ['a']
+
+    difference = Difference(None, 'a', 'a')
+    difference.add_lazy_details(details())
+    assert sources(pickle.loads(pickle.dumps(difference)).details) == ['b', 'c']
+    assert sources(difference.iter_details()) == ['b', 'c']
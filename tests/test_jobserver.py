@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+#
+# diffoscope: in-depth comparison of files, archives, and directories
+#
+# Copyright © 2026 agent <agent@local>
+#
+# diffoscope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# diffoscope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import pytest
+import threading
+
+from diffoscope.config import Config
+from diffoscope.jobserver import JobServer
+
+
+@pytest.fixture
+def make_jobserver(monkeypatch):
+    # As make -j3: two tokens in the pipe and diffoscope's implicit slot
+    rfd, wfd = os.pipe()
+    os.write(wfd, b'++')
+    monkeypatch.setenv('MAKEFLAGS', ' -j3 --jobserver-auth={},{}'.format(rfd, wfd))
+    yield rfd
+    os.close(rfd)
+    os.close(wfd)
+
+def tokens(rfd):
+    os.set_blocking(rfd, False)
+    try:
+        return os.read(rfd, 512)
+    except BlockingIOError:
+        return b''
+    finally:
+        os.set_blocking(rfd, True)
+
+def test_local_limit(monkeypatch):
+    monkeypatch.setattr(Config(), 'jobs', 2)
+    jobserver = JobServer()
+
+    for _ in range(4):
+        assert jobserver.acquire(block=False)
+    assert not jobserver.acquire(block=False)
+
+    jobserver.release()
+    assert jobserver.acquire(block=False)
+
+def test_blocks_until_released(monkeypatch):
+    monkeypatch.setattr(Config(), 'jobs', 1)
+    jobserver = JobServer()
+    jobserver.acquire()
+    jobserver.acquire()
+    acquired = threading.Event()
+
+    def target():
+        with jobserver.slot():
+            acquired.set()
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    assert not acquired.wait(0.1)
+
+    jobserver.release()
+    assert acquired.wait(5)
+    thread.join()
+
+def test_make_tokens(make_jobserver):
+    jobserver = JobServer()
+
+    for _ in range(3):
+        assert jobserver.acquire(block=False)
+    assert not jobserver.acquire(block=False)
+
+    for _ in range(3):
+        jobserver.release()
+    assert tokens(make_jobserver) == b'++'
+
+def test_make_implicit_slot_wakes_up_waiters(make_jobserver):
+    jobserver = JobServer()
+    # Other jobs of make hold both tokens
+    assert os.read(make_jobserver, 2) == b'++'
+    jobserver.acquire()
+    acquired = threading.Event()
+
+    def target():
+        with jobserver.slot():
+            acquired.set()
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    assert not acquired.wait(0.1)
+
+    jobserver.release()
+    assert acquired.wait(5)
+    thread.join()
+    assert tokens(make_jobserver) == b''
+
+def test_slot_does_not_block_when_held(monkeypatch):
+    monkeypatch.setattr(Config(), 'jobs', 1)
+    jobserver = JobServer()
+
+    with jobserver.slot(), jobserver.slot():
+        # No slot is free, but this thread already holds one
+        with jobserver.slot():
+            pass
+
+def test_invalid_jobserver_is_ignored(monkeypatch):
+    monkeypatch.setattr(Config(), 'jobs', 1)
+    monkeypatch.setenv('MAKEFLAGS', '--jobserver-auth=-1,-1')
+
+    assert JobServer().acquire(block=False)
+    assert JobServer().fds is None
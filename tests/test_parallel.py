@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+#
+# diffoscope: in-depth comparison of files, archives, and directories
+#
+# Copyright © 2026 agent <agent@local>
+#
+# diffoscope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# diffoscope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
+
+import time
+import pytest
+import threading
+
+from diffoscope.config import Config
+from diffoscope.parallel import parallel_starmap, ParallelManager
+
+from test_main import run, TEST_TAR1_PATH, TEST_TAR2_PATH
+
+
+@pytest.fixture
+def jobs(monkeypatch):
+    monkeypatch.setattr(Config(), 'jobs', 4)
+    ParallelManager().reset()
+
+def test_serial_by_default():
+    threads = set()
+
+    def fn(x):
+        threads.add(threading.current_thread())
+        return x
+
+    assert list(parallel_starmap(fn, ((x,) for x in range(10)))) == \
+        list(range(10))
+    assert threads == {threading.current_thread()}
+
+def test_order_is_preserved(jobs):
+    def fn(x):
+        # Make earlier jobs finish last
+        time.sleep((10 - x) / 1000)
+        return x * 2
+
+    result = list(parallel_starmap(fn, ((x,) for x in range(10))))
+
+    assert result == [x * 2 for x in range(10)]
+    assert ParallelManager().running == 0
+
+def test_nested_calls_do_not_deadlock(jobs):
+    def inner(x, y):
+        return x + y
+
+    def outer(x):
+        return list(parallel_starmap(inner, ((x, y) for y in range(5))))
+
+    result = list(parallel_starmap(outer, ((x,) for x in range(5))))
+
+    assert result == [[x + y for y in range(5)] for x in range(5)]
+
+def test_exception_is_raised(jobs):
+    def fn(x):
+        if x == 3:
+            raise ValueError(x)
+        return x
+
+    with pytest.raises(ValueError):
+        list(parallel_starmap(fn, ((x,) for x in range(10))))
+    assert ParallelManager().running == 0
+
+def test_jobs_output_is_identical(capsys, monkeypatch):
+    monkeypatch.setattr(Config(), 'jobs', 1)
+
+    ret1, out1, _ = run(capsys, TEST_TAR1_PATH, TEST_TAR2_PATH)
+    ret2, out2, _ = run(capsys, '--jobs=4', TEST_TAR1_PATH, TEST_TAR2_PATH)
+
+    assert ret1 == ret2 == 1
+    assert out1 == out2
+
+def test_results_are_yielded_early(jobs, monkeypatch):
+    monkeypatch.setattr(ParallelManager(), 'try_acquire', lambda: False)
+
+    calls = []
+
+    def fn(x):
+        calls.append(x)
+        return x
+
+    result = parallel_starmap(fn, ((x,) for x in range(10)))
+
+    assert next(result) == 0
+    assert calls == [0]
+    assert list(result) == list(range(1, 10))
@@ -19,9 +19,14 @@
 
 import os
 import re
+import json
 import pytest
 
-from diffoscope.main import main
+from diffoscope.main import main, create_parser
+from diffoscope.config import Config
+from diffoscope.diffstore import DiffStore
+from diffoscope.presenters.formats import can_stream
+from diffoscope.presenters.html.linediff import linediff
 
 re_html = re.compile(r'.*<body(?P<body>.*)<div class="footer">', re.MULTILINE | re.DOTALL)
 DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
@@ -101,6 +106,27 @@ def test_json(capsys):
 
     assert out == data('output.json')
 
+@pytest.mark.parametrize('on_disk', (False, True))
+def test_ndjson(capsys, monkeypatch, on_disk):
+    if on_disk:
+        monkeypatch.setattr('diffoscope.diffstore.BLOCK_SIZE', 64)
+        monkeypatch.setattr(Config(), 'max_diff_memory', 0)
+
+    out = run(capsys, '--ndjson', '-')
+
+    records = [json.loads(x) for x in out.splitlines()]
+
+    assert [(x['id'], x['parent'], x['source1']) for x in records] == [
+        (0, None, 'test1.tar'),
+        (1, 0, 'file list'),
+        (2, 0, 'dir/text'),
+        (3, 0, 'dir/link'),
+    ]
+    assert records[0]['unified_diff'] is None
+    assert records[3]['comments'] == ['symlink']
+    assert records[3]['unified_diff'] == \
+        '@@ -1 +1 @@\n-destination: broken\n+destination: really-broken\n'
+
 def test_no_report_option(capsys):
     out = run(capsys)
 
@@ -125,7 +151,147 @@ def test_htmldir_option(tmpdir, capsys):
     with open(os.path.join(html_dir, 'index.html'), 'r', encoding='utf-8') as f:
         assert extract_body(f.read()) == extract_body(data('index.html'))
 
+def test_htmldir_child_pages_written_in_parallel(tmpdir, capsys, monkeypatch):
+    monkeypatch.setattr(Config(), 'max_diff_block_lines_parent', 1)
+    monkeypatch.setattr(Config(), 'max_report_child_size', 1)
+
+    def output(jobs):
+        html_dir = str(tmpdir.join(jobs))
+        # main() sets it too, but monkeypatch restores it afterwards
+        monkeypatch.setattr(Config(), 'jobs', int(jobs))
+        run(capsys, '--jobs', jobs, '--html-dir', html_dir, '--jquery', 'disable')
+        result = {}
+        for name in os.listdir(html_dir):
+            with open(os.path.join(html_dir, name), encoding='utf-8') as f:
+                result[name] = f.read()
+        return result
+
+    expected = output('1')
+
+    assert len(expected) > 2
+    assert 'load diff (' in expected['index.html']
+    assert output('4') == expected
+
+def test_htmldir_chunks(tmpdir, capsys, monkeypatch):
+    monkeypatch.setattr('diffoscope.presenters.html.html.CHUNK_ROWS', 2)
+    html_dir = str(tmpdir.join('target'))
+
+    out = run(capsys, '--html-dir', html_dir, '--html-dir-chunks', '--jquery', 'disable')
+
+    assert out == ''
+    with open(os.path.join(html_dir, 'index.html'), encoding='utf-8') as f:
+        index = f.read()
+    assert '<table class="diff">' not in extract_body(index).split('<style')[0]
+
+    placeholders = re.findall(r'<div class="diffchunks" data-name="(\w+)" data-rows="(\d+)" data-chunk-rows="2">', index)
+    assert len(placeholders) == 3
+    for name, count in placeholders:
+        rows = []
+        for n in range((int(count) + 1) // 2):
+            with open(os.path.join(html_dir, '%s-%d.js' % (name, n)), encoding='utf-8') as f:
+                m = re.match(r'diffoscopeChunk\("(\w+)",(\d+),(.*)\);\n$', f.read())
+            assert m.group(1, 2) == (name, str(n))
+            rows.extend(json.loads(m.group(3)))
+        assert len(rows) == int(count)
+        assert rows[0][0] == '@'
+
+    assert rows[1] == ['c', 1, 'destination: broken', 1, 'destination: \x01really-\x02broken']
+
 def test_html_option_with_stdout(capsys):
     out = run(capsys, '--html', '-')
 
     assert extract_body(out) == extract_body(data('output.html'))
+
+@pytest.mark.parametrize('args,expected', (
+    (('--text', '-'), 'output.txt'),
+    (('--text-color=always',), 'output.colored.txt'),
+    (('--markdown', '-'), 'output.md'),
+    (('--restructured-text', '-'), 'output.rst'),
+    (('--json', '-'), 'output.json'),
+))
+def test_diffs_stored_on_disk(capsys, monkeypatch, args, expected):
+    monkeypatch.setattr('diffoscope.diffstore.BLOCK_SIZE', 64)
+    monkeypatch.setattr(Config(), 'max_diff_memory', 0)
+
+    out = run(capsys, *args)
+
+    assert DiffStore()._file is not None
+    assert out == data(expected)
+
+def test_html_diffs_stored_on_disk(capsys, monkeypatch):
+    monkeypatch.setattr('diffoscope.diffstore.BLOCK_SIZE', 64)
+    monkeypatch.setattr(Config(), 'max_diff_memory', 0)
+
+    out = run(capsys, '--html', '-')
+
+    assert extract_body(out) == extract_body(data('output.html'))
+
+@pytest.mark.parametrize('jobs', ('1', '4'))
+def test_all_formats_at_once(tmpdir, capsys, monkeypatch, jobs):
+    def read(filename):
+        with open(str(tmpdir.join(filename)), encoding='utf-8') as f:
+            return f.read()
+
+    # main() sets it too, but monkeypatch restores it afterwards
+    monkeypatch.setattr(Config(), 'jobs', int(jobs))
+    out = run(
+        capsys,
+        '--jobs', jobs,
+        '--text', str(tmpdir.join('report.txt')),
+        '--markdown', str(tmpdir.join('report.md')),
+        '--restructured-text', str(tmpdir.join('report.rst')),
+        '--json', str(tmpdir.join('report.json')),
+        '--html', str(tmpdir.join('report.html')),
+        '--html-dir', str(tmpdir.join('target')),
+        '--jquery', 'disable',
+    )
+
+    assert out == ''
+    assert read('report.txt') == data('output.txt')
+    assert read('report.md') == data('output.md')
+    assert read('report.rst') == data('output.rst')
+    assert read('report.json') == data('output.json')
+    assert extract_body(read('report.html')) == extract_body(data('output.html'))
+    assert extract_body(read('target/index.html')) == \
+        extract_body(data('index.html'))
+
+def test_print_limit_only_stops_its_format(tmpdir, capsys, monkeypatch):
+    monkeypatch.setattr(Config(), 'max_text_report_size', 100)
+    report_path = str(tmpdir.join('report.txt'))
+
+    out = run(capsys, '--text', report_path, '--json', '-')
+
+    assert out == data('output.json')
+    with open(report_path, encoding='utf-8') as f:
+        assert f.read().endswith('\nMax output size reached.\n')
+
+def test_formats_printed_to_stdout_in_turn(capsys):
+    out = run(capsys, '--text', '-', '--markdown', '-')
+
+    assert out == data('output.txt') + data('output.md')
+
+@pytest.mark.parametrize('args,expected', (
+    ((), True),
+    (('--text', 'report.txt'), True),
+    (('--json', '-'), True),
+    (('--ndjson', '-'), True),
+    (('--save-diff', 'saved'), True),
+    (('--html', '-'), False),
+    (('--markdown', '-'), False),
+    (('--text', '-', '--json', 'report.json'), False),
+))
+def test_can_stream(args, expected):
+    parsed_args = create_parser().parse_args(args + ('test1.tar', 'test2.tar'))
+
+    assert can_stream(parsed_args) == expected
+
+def test_linediff():
+    assert linediff('hello world\x01', 'hallo, world\x01', '[', ']') == \
+        ('h[e]llo world.', 'h[a]llo[,] world.')
+
+def test_linediff_too_different():
+    s = '0123456789abcdef' * 64
+    t = 'x' + s[::-1] + 'y'
+
+    assert linediff(s + 'z', t + 'z', '[', ']') == \
+        ('[' + s + ']z', '[' + t + ']z')
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+#
+# diffoscope: in-depth comparison of files, archives, and directories
+#
+# Copyright © 2026 agent <agent@local>
+#
+# diffoscope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# diffoscope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import pytest
+
+from diffoscope.main import main
+from diffoscope.config import Config
+from diffoscope.savediff import DiffFile, load_diff
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+
+
+def run(capsys, *args):
+    with pytest.raises(SystemExit) as exc:
+        prev = os.getcwd()
+        os.chdir(DATA_DIR)
+
+        try:
+            main(args)
+        finally:
+            os.chdir(prev)
+
+    out, err = capsys.readouterr()
+
+    assert err == ''
+
+    return exc.value.code, out
+
+def data(filename):
+    with open(os.path.join(DATA_DIR, filename), encoding='utf-8') as f:
+        return f.read()
+
+@pytest.fixture
+def saved(tmpdir, capsys):
+    path = str(tmpdir.join('saved'))
+
+    code, out = run(capsys, '--save-diff', path, 'test1.tar', 'test2.tar')
+
+    assert code == 1
+    assert out == ''
+
+    return path
+
+@pytest.mark.parametrize('args,expected', (
+    (('--text', '-'), 'output.txt'),
+    (('--json', '-'), 'output.json'),
+    (('--markdown', '-'), 'output.md'),
+))
+def test_load_diff(capsys, saved, args, expected):
+    code, out = run(capsys, '--load-diff', saved, *args)
+
+    assert code == 1
+    assert out == data(expected)
+
+def test_diffs_stored_on_disk(capsys, monkeypatch, tmpdir):
+    monkeypatch.setattr('diffoscope.diffstore.BLOCK_SIZE', 64)
+    monkeypatch.setattr(Config(), 'max_diff_memory', 0)
+    path = str(tmpdir.join('saved'))
+
+    run(capsys, '--save-diff', path, 'test1.tar', 'test2.tar')
+    code, out = run(capsys, '--load-diff', path)
+
+    assert code == 1
+    assert out == data('output.txt')
+
+def test_random_access(saved):
+    diff_file = DiffFile(saved)
+
+    assert len(diff_file) == 4
+    assert list(diff_file.get_details(0)) == [1, 2, 3]
+
+    difference = diff_file.get_difference(3)
+
+    assert difference.source1 == 'dir/link'
+    assert difference.comments == ['symlink']
+    assert difference.unified_diff == \
+        '@@ -1 +1 @@\n-destination: broken\n+destination: really-broken\n'
+    assert difference.details == []
+
+def test_no_differences(capsys, tmpdir):
+    path = str(tmpdir.join('saved'))
+
+    code, out = run(capsys, '--save-diff', path, '--output-empty', 'test1.tar', 'test1.tar')
+
+    assert code == 0
+    assert load_diff(path) is None
+
+def test_not_a_saved_diff():
+    with pytest.raises(SystemExit) as exc:
+        main(['--load-diff', os.path.join(DATA_DIR, 'test1.tar')])
+
+    assert exc.value.code == 2
+
+def test_paths_with_load_diff(capsys, saved):
+    with pytest.raises(SystemExit) as exc:
+        main(['--load-diff', saved, 'test1.tar', 'test2.tar'])
+
+    assert exc.value.code == 2
+    assert 'cannot be used' in capsys.readouterr()[1]